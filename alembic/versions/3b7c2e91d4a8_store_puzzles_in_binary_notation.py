@@ -0,0 +1,130 @@
+"""Store puzzles in binary notation
+
+Revision ID: 3b7c2e91d4a8
+Revises: 0e5a9198f6d9
+Create Date: 2026-10-17 23:58:12.481203
+
+"""
+from typing import Sequence, Union
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7c2e91d4a8'
+down_revision: Union[str, None] = '0e5a9198f6d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows converted per round trip.
+BATCH_SIZE = 1000
+
+
+def _convert(source: str, convert) -> None:
+    """
+    Fills the columns returned by CONVERT from the SOURCE column, a batch of
+    rows at a time, paging on the primary key.
+    """
+
+    connection = op.get_bind()
+    sudoku = sa.table(
+        'sudoku',
+        sa.column('id'),
+        sa.column('puzzle_data'),
+        sa.column('puzzle_bytes'),
+        sa.column('puzzle_text'),
+        sa.column('puzzle_hash'),
+    )
+
+    last_id = None
+    while True:
+        query = sa.select(sudoku.c.id, sudoku.c[source]).order_by(sudoku.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(sudoku.c.id > last_id)
+
+        rows = connection.execute(query).fetchall()
+        if not rows:
+            break
+
+        connection.execute(
+            sudoku.update().where(sudoku.c.id == sa.bindparam('_id')),
+            [dict(_id=row[0], **convert(row[1])) for row in rows],
+        )
+        last_id = rows[-1][0]
+
+
+# The notations and the hash as of this revision, copied from
+# app.libs.sudoku_grid so the migration does not change with it.
+
+def _linear_notation_to_bytes(linear: str) -> bytes:
+    """
+    Converts a grid from the linear notation to the binary notation: a byte
+    for the block size, followed by the cells row by row, packed on as few
+    bits as the values need.
+    """
+
+    block_size, values = linear.split(':', 1)
+    block_size = int(block_size)
+    grid_size = block_size * block_size
+    values = [int(value) for value in values.split(',')]
+    if len(values) != grid_size * grid_size or not all(0 <= value <= grid_size for value in values):
+        raise ValueError(f'Invalid puzzle {linear}')
+
+    cell_bits = grid_size.bit_length()
+    bits = ''.join(format(value, f'0{cell_bits}b') for value in values)
+    bits += '0' * (-len(bits) % 8)
+
+    return bytes([block_size]) + int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+def _bytes_to_linear_notation(data: bytes) -> str:
+    """
+    Converts a grid from the binary notation to the linear notation.
+    """
+
+    block_size = data[0]
+    grid_size = block_size * block_size
+    cell_bits = grid_size.bit_length()
+    bits = ''.join(format(byte, '08b') for byte in data[1:])
+    values = [int(bits[start:start + cell_bits], 2) for start in range(0, grid_size * grid_size * cell_bits, cell_bits)]
+
+    return f'{block_size}:' + ','.join(map(str, values))
+
+
+def _puzzle_hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _to_bytes(linear_notation: str) -> dict:
+    puzzle_data = _linear_notation_to_bytes(linear_notation)
+    return {'puzzle_bytes': puzzle_data, 'puzzle_hash': _puzzle_hash(puzzle_data)}
+
+
+def _to_linear_notation(puzzle_data: bytes) -> dict:
+    return {'puzzle_text': _bytes_to_linear_notation(bytes(puzzle_data))}
+
+
+def upgrade() -> None:
+    op.add_column('sudoku', sa.Column('puzzle_bytes', sa.LargeBinary(), nullable=True))
+    op.add_column('sudoku', sa.Column('puzzle_hash', sa.LargeBinary(16), nullable=True))
+
+    _convert('puzzle_data', _to_bytes)
+
+    op.drop_column('sudoku', 'puzzle_data')
+    op.alter_column('sudoku', 'puzzle_bytes', new_column_name='puzzle_data', nullable=False)
+    op.alter_column('sudoku', 'puzzle_hash', nullable=False)
+    op.create_index(op.f('ix_sudoku_puzzle_hash'), 'sudoku', ['puzzle_hash'], unique=True)
+
+
+def downgrade() -> None:
+    op.add_column('sudoku', sa.Column('puzzle_text', sa.VARCHAR(), nullable=True))
+
+    _convert('puzzle_data', _to_linear_notation)
+
+    op.drop_index(op.f('ix_sudoku_puzzle_hash'), table_name='sudoku')
+    op.drop_column('sudoku', 'puzzle_hash')
+    op.drop_column('sudoku', 'puzzle_data')
+    op.alter_column('sudoku', 'puzzle_text', new_column_name='puzzle_data', nullable=False)
+    op.create_unique_constraint('sudoku_puzzle_data_key', 'sudoku', ['puzzle_data'])
@@ -0,0 +1,202 @@
+"""Add canonical hash to sudoku
+
+Revision ID: 8d41f0c6a2e7
+Revises: 3b7c2e91d4a8
+Create Date: 2026-10-18 00:41:37.906114
+
+"""
+from typing import Sequence, Union
+import hashlib
+import itertools
+
+from alembic import op
+import numpy
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f0c6a2e7'
+down_revision: Union[str, None] = '3b7c2e91d4a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows hashed per round trip.
+BATCH_SIZE = 1000
+
+# The canonical hash as of this revision, copied from app.libs.sudoku_grid so
+# the migration does not change with it, see SudokuGrid.canonical_form.
+
+# Grids up to this block size are canonicalized under the whole symmetry
+# group, the larger ones only under transposition and relabeling.
+CANONICAL_MAX_BLOCK_SIZE = 3
+
+
+def _from_bytes(data: bytes) -> numpy.ndarray:
+    """
+    Returns the cells of a grid in binary notation, see SudokuGrid.to_bytes.
+    """
+
+    block_size = data[0]
+    grid_size = block_size * block_size
+    cell_bits = grid_size.bit_length()
+    cell_count = grid_size * grid_size
+
+    bits = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8, offset=1))[:cell_count * cell_bits]
+    weights = numpy.left_shift(1, numpy.arange(cell_bits - 1, -1, -1))
+
+    return (bits.reshape(cell_count, cell_bits) @ weights).reshape(grid_size, grid_size)
+
+
+def _to_bytes(array: numpy.ndarray, block_size: int) -> bytes:
+    cell_bits = (block_size * block_size).bit_length()
+    shifts = numpy.arange(cell_bits - 1, -1, -1, dtype=numpy.uint8)
+    bits = (array.reshape(-1, 1) >> shifts) & 1
+
+    return bytes([block_size]) + numpy.packbits(bits.ravel()).tobytes()
+
+
+def _line_permutations(block_size: int) -> numpy.ndarray:
+    """
+    Returns the permutations of the columns that keep a grid valid, one per
+    row.
+    """
+
+    block_perms = list(itertools.permutations(range(block_size)))
+
+    return numpy.array([
+        [stack * block_size + inner[stack_no][offset]
+         for stack_no, stack in enumerate(stacks)
+         for offset in range(block_size)]
+        for stacks in block_perms
+        for inner in itertools.product(block_perms, repeat=block_size)
+    ], dtype=numpy.intp)
+
+
+def _relabel(values: numpy.ndarray, labels: numpy.ndarray, next_labels: numpy.ndarray) -> numpy.ndarray:
+    """
+    Relabels the digits of many rows at once, in the order they first
+    appear, updating LABELS and NEXT_LABELS in place.
+    """
+
+    index = numpy.arange(len(values))
+    result = numpy.empty_like(values)
+
+    for col_no in range(values.shape[1]):
+        digits = values[:, col_no]
+        new = (digits > 0) & (labels[index, digits] == 0)
+        labels[index[new], digits[new]] = next_labels[new]
+        next_labels[new] += 1
+        result[:, col_no] = labels[index, digits]
+
+    return result
+
+
+def _canonical_form(array: numpy.ndarray, block_size: int) -> numpy.ndarray:
+    """
+    Returns the cells of the grid with the lexicographically smallest rows
+    among the isomorphic ones, choosing the rows one at a time.
+    """
+
+    grid_size = block_size * block_size
+    grids = numpy.stack([array, array.T])
+
+    if block_size > CANONICAL_MAX_BLOCK_SIZE:
+        flat = grids.reshape(2, -1)
+        labels = _relabel(flat, numpy.zeros((2, grid_size + 1), dtype=flat.dtype), numpy.ones(2, dtype=flat.dtype))
+        best = min(range(2), key=lambda transposed: labels[transposed].tolist())
+        return labels[best].reshape(grid_size, grid_size)
+
+    col_perms = _line_permutations(block_size)
+    band_of = numpy.arange(grid_size) // block_size
+
+    transposed = numpy.repeat(numpy.arange(2), len(col_perms))
+    col_perm = numpy.tile(numpy.arange(len(col_perms)), 2)
+    used_rows = numpy.zeros(len(col_perm), dtype=numpy.int64)
+    used_bands = numpy.zeros(len(col_perm), dtype=numpy.int64)
+    last_band = numpy.zeros(len(col_perm), dtype=numpy.intp)
+    labels = numpy.zeros((len(col_perm), grid_size + 1), dtype=array.dtype)
+    next_labels = numpy.ones(len(col_perm), dtype=array.dtype)
+
+    result = numpy.empty((grid_size, grid_size), dtype=array.dtype)
+
+    for row_no in range(grid_size):
+        choices = []
+        for source_row in range(grid_size):
+            if row_no % block_size == 0:
+                allowed = (used_bands >> band_of[source_row]) & 1 == 0
+            else:
+                allowed = (last_band == band_of[source_row]) & ((used_rows >> source_row) & 1 == 0)
+
+            choices.append(numpy.nonzero(allowed)[0])
+
+        parents = numpy.concatenate(choices)
+        rows = numpy.repeat(numpy.arange(grid_size), [len(choice) for choice in choices])
+
+        values = numpy.take_along_axis(grids[transposed[parents], rows], col_perms[col_perm[parents]], axis=1)
+        row_labels = labels[parents]
+        row_next_labels = next_labels[parents]
+        values = _relabel(values, row_labels, row_next_labels)
+
+        keys = numpy.zeros(len(values), dtype=numpy.int64)
+        for col_no in range(grid_size):
+            keys = keys * (grid_size + 1) + values[:, col_no]
+        best = numpy.nonzero(keys == keys.min())[0]
+
+        result[row_no] = values[best[0]]
+
+        rows = rows[best]
+        parents = parents[best]
+        transposed = transposed[parents]
+        col_perm = col_perm[parents]
+        used_rows = used_rows[parents] | (1 << rows)
+        used_bands = used_bands[parents] | (1 << band_of[rows])
+        last_band = band_of[rows]
+        labels = row_labels[best]
+        next_labels = row_next_labels[best]
+
+    return result
+
+
+def _canonical_hash(puzzle_data: bytes) -> bytes:
+    block_size = puzzle_data[0]
+    canonical_data = _to_bytes(_canonical_form(_from_bytes(puzzle_data), block_size), block_size)
+
+    return hashlib.blake2b(canonical_data, digest_size=16).digest()
+
+
+def upgrade() -> None:
+    op.add_column('sudoku', sa.Column('canonical_hash', sa.LargeBinary(16), nullable=True))
+
+    connection = op.get_bind()
+    sudoku = sa.table('sudoku', sa.column('id'), sa.column('puzzle_data'), sa.column('canonical_hash'))
+
+    # The rows isomorphic to an earlier one keep a NULL hash, they can not be
+    # removed as they may have been played.
+    seen = set()
+    last_id = None
+    while True:
+        query = sa.select(sudoku.c.id, sudoku.c.puzzle_data).order_by(sudoku.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(sudoku.c.id > last_id)
+
+        rows = connection.execute(query).fetchall()
+        if not rows:
+            break
+
+        values = []
+        for row_id, puzzle_data in rows:
+            canonical_hash = _canonical_hash(bytes(puzzle_data))
+            if canonical_hash not in seen:
+                seen.add(canonical_hash)
+                values.append({'_id': row_id, 'canonical_hash': canonical_hash})
+
+        if values:
+            connection.execute(sudoku.update().where(sudoku.c.id == sa.bindparam('_id')), values)
+        last_id = rows[-1][0]
+
+    op.create_index(op.f('ix_sudoku_canonical_hash'), 'sudoku', ['canonical_hash'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sudoku_canonical_hash'), table_name='sudoku')
+    op.drop_column('sudoku', 'canonical_hash')
@@ -0,0 +1,48 @@
+"""Index hot queries
+
+Revision ID: a9c3e5f7b214
+Revises: f7b1a3c5d902
+Create Date: 2026-10-18 03:26:09.541377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e5f7b214'
+down_revision: Union[str, None] = 'f7b1a3c5d902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The indexes, as (name, table, columns, options). The sudoku table is
+# already indexed on its difficulty by ix_sudoku_difficulty_sequence_no.
+INDEXES = (
+    ('ix_sudoku_registry_user_id_is_applicable_solving_time', 'sudoku_registry', ['user_id', 'is_applicable', 'solving_time'], {}),
+    ('ix_sudoku_registry_sudoku_id', 'sudoku_registry', ['sudoku_id'], {}),
+    ('ix_sudoku_registry_applicable_solving_time', 'sudoku_registry', ['solving_time'], {
+        'postgresql_include': ['sudoku_id'],
+        'postgresql_where': sa.text('is_applicable'),
+    }),
+    ('ix_sudoku_registry_applicable_created_at', 'sudoku_registry', ['created_at'], {
+        'postgresql_where': sa.text('is_applicable'),
+    }),
+    ('ix_sudoku_leaderboard_period', 'sudoku_leaderboard', ['period', 'period_start'], {}),
+    ('ix_sudoku_leaderboard_sudoku_registry_id', 'sudoku_leaderboard', ['sudoku_registry_id'], {}),
+)
+
+
+def upgrade() -> None:
+    # Built without locking the writes to the tables, which can not be done
+    # in a transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, **options)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
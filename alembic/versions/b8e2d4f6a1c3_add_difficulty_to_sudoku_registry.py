@@ -0,0 +1,55 @@
+"""Add difficulty to sudoku registry
+
+Revision ID: b8e2d4f6a1c3
+Revises: a9c3e5f7b214
+Create Date: 2026-10-18 14:12:47.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2d4f6a1c3'
+down_revision: Union[str, None] = 'a9c3e5f7b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sudoku_registry', sa.Column('difficulty', sa.Integer(), nullable=True))
+
+    # The existing entries take the difficulty of their puzzle.
+    op.execute(
+        'UPDATE sudoku_registry SET difficulty = sudoku.difficulty '
+        'FROM sudoku WHERE sudoku.id = sudoku_registry.sudoku_id'
+    )
+    op.alter_column('sudoku_registry', 'difficulty', nullable=False)
+
+    # The places are counted on the entries of a difficulty, of all time or
+    # since the start of a period, see
+    # SudokuRegistryRepository.__get_user_place.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sudoku_registry_applicable_difficulty_solving_time', 'sudoku_registry', ['difficulty', 'solving_time'],
+            postgresql_where=sa.text('is_applicable'), postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_sudoku_registry_applicable_difficulty_created_at', 'sudoku_registry', ['difficulty', 'created_at'],
+            postgresql_include=['solving_time'], postgresql_where=sa.text('is_applicable'), postgresql_concurrently=True,
+        )
+        op.drop_index('ix_sudoku_registry_applicable_solving_time', table_name='sudoku_registry', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sudoku_registry_applicable_solving_time', 'sudoku_registry', ['solving_time'],
+            postgresql_include=['sudoku_id'], postgresql_where=sa.text('is_applicable'), postgresql_concurrently=True,
+        )
+        op.drop_index('ix_sudoku_registry_applicable_difficulty_created_at', table_name='sudoku_registry', postgresql_concurrently=True)
+        op.drop_index('ix_sudoku_registry_applicable_difficulty_solving_time', table_name='sudoku_registry', postgresql_concurrently=True)
+
+    op.drop_column('sudoku_registry', 'difficulty')
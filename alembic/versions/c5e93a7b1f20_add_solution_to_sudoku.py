@@ -0,0 +1,138 @@
+"""Add solution to sudoku
+
+Revision ID: c5e93a7b1f20
+Revises: 8d41f0c6a2e7
+Create Date: 2026-10-18 01:12:50.338791
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e93a7b1f20'
+down_revision: Union[str, None] = '8d41f0c6a2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows solved per round trip.
+BATCH_SIZE = 1000
+
+# The binary notation and a solver, copied from app.libs.sudoku_grid in a
+# simpler form so the migration does not change with it.
+
+def _from_bytes(data: bytes) -> tuple[int, list[int]]:
+    """
+    Returns the block size and the cells, row by row, of a grid in binary
+    notation, see SudokuGrid.to_bytes.
+    """
+
+    block_size = data[0]
+    grid_size = block_size * block_size
+    cell_bits = grid_size.bit_length()
+    bits = ''.join(format(byte, '08b') for byte in data[1:])
+
+    return block_size, [int(bits[start:start + cell_bits], 2) for start in range(0, grid_size * grid_size * cell_bits, cell_bits)]
+
+
+def _to_bytes(block_size: int, cells: list[int]) -> bytes:
+    cell_bits = (block_size * block_size).bit_length()
+    bits = ''.join(format(value, f'0{cell_bits}b') for value in cells)
+    bits += '0' * (-len(bits) % 8)
+
+    return bytes([block_size]) + int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+def _solve(block_size: int, cells: list[int]) -> None | list[int]:
+    """
+    Solves a grid by backtracking, filling the empty cell with the fewest
+    candidates first. Returns the first solution found, or None if there is
+    none.
+    """
+
+    grid_size = block_size * block_size
+    full_mask = (1 << grid_size) - 1
+    units = [
+        (index // grid_size, grid_size + index % grid_size, 2 * grid_size + index // grid_size // block_size * block_size + index % grid_size // block_size)
+        for index in range(grid_size * grid_size)
+    ]
+
+    # The digits used by every row, column and block.
+    masks = [0] * (3 * grid_size)
+    for index, value in enumerate(cells):
+        if value:
+            bit = 1 << (value - 1)
+            if any(masks[unit] & bit for unit in units[index]):
+                return None
+            for unit in units[index]:
+                masks[unit] |= bit
+
+    cells = list(cells)
+    empty = [index for index, value in enumerate(cells) if not value]
+
+    def search(remaining: int) -> bool:
+        if not remaining:
+            return True
+
+        best, best_candidates, best_count = None, 0, grid_size + 1
+        for index in empty:
+            if cells[index]:
+                continue
+            row, col, block = units[index]
+            candidates = full_mask & ~(masks[row] | masks[col] | masks[block])
+            count = candidates.bit_count()
+            if count < best_count:
+                best, best_candidates, best_count = index, candidates, count
+                if count <= 1:
+                    break
+
+        while best_candidates:
+            bit = best_candidates & -best_candidates
+            best_candidates ^= bit
+
+            cells[best] = bit.bit_length()
+            for unit in units[best]:
+                masks[unit] |= bit
+            if search(remaining - 1):
+                return True
+            for unit in units[best]:
+                masks[unit] ^= bit
+            cells[best] = 0
+
+        return False
+
+    return cells if search(len(empty)) else None
+
+
+def upgrade() -> None:
+    op.add_column('sudoku', sa.Column('solution_data', sa.LargeBinary(), nullable=True))
+
+    connection = op.get_bind()
+    sudoku = sa.table('sudoku', sa.column('id'), sa.column('puzzle_data'), sa.column('solution_data'))
+
+    last_id = None
+    while True:
+        query = sa.select(sudoku.c.id, sudoku.c.puzzle_data).order_by(sudoku.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(sudoku.c.id > last_id)
+
+        rows = connection.execute(query).fetchall()
+        if not rows:
+            break
+
+        values = []
+        for row_id, puzzle_data in rows:
+            block_size, cells = _from_bytes(bytes(puzzle_data))
+            solution = _solve(block_size, cells)
+            if solution is not None:
+                values.append({'_id': row_id, 'solution_data': _to_bytes(block_size, solution)})
+
+        if values:
+            connection.execute(sudoku.update().where(sudoku.c.id == sa.bindparam('_id')), values)
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_column('sudoku', 'solution_data')
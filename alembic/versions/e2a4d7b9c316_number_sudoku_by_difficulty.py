@@ -0,0 +1,48 @@
+"""Number sudoku by difficulty
+
+Revision ID: e2a4d7b9c316
+Revises: c5e93a7b1f20
+Create Date: 2026-10-18 02:05:14.620481
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a4d7b9c316'
+down_revision: Union[str, None] = 'c5e93a7b1f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sudoku_sequence',
+        sa.Column('difficulty', sa.Integer(), nullable=False),
+        sa.Column('last_sequence_no', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('difficulty'),
+    )
+    op.add_column('sudoku', sa.Column('sequence_no', sa.Integer(), nullable=True))
+
+    # The existing puzzles are numbered in the order they were created.
+    op.execute(
+        'UPDATE sudoku SET sequence_no = numbered.sequence_no '
+        'FROM (SELECT id, row_number() OVER (PARTITION BY difficulty ORDER BY created_at, id) AS sequence_no '
+        'FROM sudoku) AS numbered '
+        'WHERE sudoku.id = numbered.id'
+    )
+    op.execute(
+        'INSERT INTO sudoku_sequence (difficulty, last_sequence_no) '
+        'SELECT difficulty, max(sequence_no) FROM sudoku GROUP BY difficulty'
+    )
+
+    op.create_index('ix_sudoku_difficulty_sequence_no', 'sudoku', ['difficulty', 'sequence_no'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sudoku_difficulty_sequence_no', table_name='sudoku')
+    op.drop_column('sudoku', 'sequence_no')
+    op.drop_table('sudoku_sequence')
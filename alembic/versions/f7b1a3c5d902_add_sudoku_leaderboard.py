@@ -0,0 +1,121 @@
+"""Add sudoku leaderboard
+
+Revision ID: f7b1a3c5d902
+Revises: e2a4d7b9c316
+Create Date: 2026-10-18 02:48:31.172906
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b1a3c5d902'
+down_revision: Union[str, None] = 'e2a4d7b9c316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The periods and the size of the leaderboards as of this revision, copied
+# from app.entities.SudokuLeaderboard so the migration does not change with
+# it.
+PERIOD_TODAY = 'today'
+PERIOD_WEEK = 'week'
+PERIOD_MONTH = 'month'
+PERIOD_ALL_TIME = 'alltime'
+
+PERIODS = (PERIOD_TODAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_ALL_TIME)
+
+LEADERBOARD_SIZE = 20
+
+ALL_TIME_START = datetime(1970, 1, 1)
+
+
+def get_period_start(period: str, now: datetime) -> datetime:
+    """
+    Returns the start of the period NOW is in: the day, the week starting on
+    Monday, the month, or ALL_TIME_START.
+    """
+
+    if period == PERIOD_ALL_TIME:
+        return ALL_TIME_START
+
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == PERIOD_WEEK:
+        return start - timedelta(days=start.weekday())
+    if period == PERIOD_MONTH:
+        return start.replace(day=1)
+    return start
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sudoku_leaderboard',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('difficulty', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('sudoku_registry_id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('solving_time', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['sudoku_registry_id'], ['sudoku_registry.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_sudoku_leaderboard_key', 'sudoku_leaderboard', ['difficulty', 'period', 'period_start', 'solving_time']
+    )
+
+    # Fill the leaderboards of the current periods from the registry.
+    connection = op.get_bind()
+    sudoku = sa.table('sudoku', sa.column('id', sa.UUID()), sa.column('difficulty'))
+    registry = sa.table(
+        'sudoku_registry',
+        sa.column('id', sa.UUID()), sa.column('sudoku_id', sa.UUID()), sa.column('user_id', sa.UUID()),
+        sa.column('solving_time'), sa.column('is_applicable'), sa.column('created_at', sa.DateTime()),
+    )
+    leaderboard = sa.table(
+        'sudoku_leaderboard',
+        sa.column('id', sa.UUID()), sa.column('difficulty', sa.Integer()), sa.column('period', sa.String()),
+        sa.column('period_start', sa.DateTime()), sa.column('sudoku_registry_id', sa.UUID()),
+        sa.column('user_id', sa.UUID()), sa.column('solving_time', sa.Float()),
+    )
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    difficulties = connection.execute(sa.select(sudoku.c.difficulty).distinct()).scalars().all()
+
+    for difficulty in difficulties:
+        for period in PERIODS:
+            period_start = get_period_start(period, now)
+            query = (
+                sa.select(registry.c.id, registry.c.user_id, registry.c.solving_time)
+                .join(sudoku, sudoku.c.id == registry.c.sudoku_id)
+                .where(sudoku.c.difficulty == difficulty, registry.c.is_applicable == sa.true())
+                .order_by(registry.c.solving_time, registry.c.created_at)
+                .limit(LEADERBOARD_SIZE)
+            )
+            if period != PERIOD_ALL_TIME:
+                query = query.where(registry.c.created_at >= period_start)
+
+            values = [
+                {
+                    'id': uuid.uuid4(),
+                    'difficulty': difficulty,
+                    'period': period,
+                    'period_start': period_start,
+                    'sudoku_registry_id': registry_id,
+                    'user_id': user_id,
+                    'solving_time': solving_time,
+                }
+                for registry_id, user_id, solving_time in connection.execute(query)
+            ]
+            if values:
+                connection.execute(leaderboard.insert(), values)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sudoku_leaderboard_key', table_name='sudoku_leaderboard')
+    op.drop_table('sudoku_leaderboard')
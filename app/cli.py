@@ -0,0 +1,82 @@
+"""
+Command line tools for the puzzle database.
+
+  python -m app.cli import puzzles.txt [--workers N]
+  python -m app.cli export puzzles.txt [--format line] [--difficulty 2]
+  python -m app.cli regrade [--workers N]
+
+Files hold one puzzle a line, in the linear notation or in the common 81
+character format. Use - for stdin or stdout.
+
+regrade grades the stored puzzles again with the current grading, moves the
+ones whose difficulty changed and numbers the puzzles again. Run it with the
+servers stopped: the puzzles are renumbered, and the servers keep the
+difficulties in their puzzle caches and leaderboard indexes until restarted.
+"""
+
+import argparse
+import sys
+
+from app.core.database import SessionLocal
+from app.libs.puzzle_io import FORMATS, FORMAT_LINEAR
+from app.services.PuzzleTransferService import get_puzzle_transfer_service
+
+
+def import_command(args: argparse.Namespace) -> None:
+  file = sys.stdin if args.file == "-" else open(args.file)
+
+  with file:
+    result = get_puzzle_transfer_service().import_puzzles(file, args.workers)
+
+  print(
+    f"Read {result.read} puzzles, inserted {result.inserted} in {result.seconds:.1f}s "
+    f"({result.puzzles_per_second:.0f}/s), {result.duplicates} duplicates, errors: {result.errors}, "
+    f"difficulties: {result.difficulties}",
+    file=sys.stderr,
+  )
+
+
+def export_command(args: argparse.Namespace) -> None:
+  file = sys.stdout if args.file == "-" else open(args.file, "w")
+
+  with file:
+    file.writelines(get_puzzle_transfer_service().export_puzzles(args.format, args.difficulty))
+
+
+def regrade_command(args: argparse.Namespace) -> None:
+  graded, moved = get_puzzle_transfer_service().regrade_puzzles(args.workers)
+
+  print(f"Graded {graded} puzzles, moved {sum(moved.values())}", file=sys.stderr)
+  for (old_difficulty, difficulty), count in sorted(moved.items()):
+    print(f"  {old_difficulty} -> {difficulty}: {count}", file=sys.stderr)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(prog="python -m app.cli", description="Import, export and regrade puzzles.")
+  commands = parser.add_subparsers(required=True)
+
+  import_parser = commands.add_parser("import", help="load a puzzle file into the database")
+  import_parser.add_argument("file")
+  import_parser.add_argument("--workers", type=int, default=None, help="processes to check the puzzles on")
+  import_parser.set_defaults(command=import_command)
+
+  export_parser = commands.add_parser("export", help="dump the puzzles of the database into a file")
+  export_parser.add_argument("file")
+  export_parser.add_argument("--format", choices=FORMATS, default=FORMAT_LINEAR)
+  export_parser.add_argument("--difficulty", type=int, default=None)
+  export_parser.set_defaults(command=export_command)
+
+  regrade_parser = commands.add_parser("regrade", help="grade the stored puzzles again and renumber them")
+  regrade_parser.add_argument("--workers", type=int, default=None, help="processes to grade the puzzles on")
+  regrade_parser.set_defaults(command=regrade_command)
+
+  args = parser.parse_args()
+
+  try:
+    args.command(args)
+  finally:
+    SessionLocal.remove()
+
+
+if __name__ == "__main__":
+  main()
@@ -1,4 +1,7 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 
@@ -18,4 +21,55 @@ def get_database():
   try:
     yield db
   finally:
-    db.close()
\ No newline at end of file
+    db.close()
+
+
+def get_async_database_url(url: str) -> str:
+  """
+  Returns the URL of the async driver of a database, asyncpg for PostgreSQL
+  and aiosqlite for SQLite.
+  """
+  for prefix, async_prefix in (
+    ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+    ("postgresql://", "postgresql+asyncpg://"),
+    ("postgres://", "postgresql+asyncpg://"),
+    ("sqlite://", "sqlite+aiosqlite://"),
+  ):
+    if url.startswith(prefix):
+      return async_prefix + url[len(prefix):]
+  return url
+
+async_engine = create_async_engine(get_async_database_url(DATABASE_URL))
+
+# The objects stay loaded after a commit, they can not be lazy loaded
+# outside of the session.
+AsyncSessionFactory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# The async sessions are scoped to a request, see async_session_scope. Unlike
+# the current task, a context variable is inherited by the tasks the request
+# starts, like the ones of the middlewares.
+session_scope: ContextVar[object] = ContextVar("session_scope", default=None)
+AsyncSessionLocal = async_scoped_session(AsyncSessionFactory, scopefunc=session_scope.get)
+
+@asynccontextmanager
+async def async_session_scope():
+  """
+  Gives the code run inside its own AsyncSessionLocal session, closed on the
+  way out.
+  """
+  token = session_scope.set(object())
+  try:
+    yield
+  finally:
+    await AsyncSessionLocal.remove()
+    session_scope.reset(token)
+
+def get_async_session(db) -> AsyncSession:
+  """
+  Returns DB if it is a session, or the session of the current request if it
+  is AsyncSessionLocal, which does not pass every method through.
+  """
+  return db if isinstance(db, AsyncSession) else db()
+
+async def get_async_database():
+  yield AsyncSessionLocal()
@@ -20,4 +20,29 @@ class Settings(BaseSettings):
 
   MAIL_SENDER: str = os.environ.get("MAIL_SENDER")
 
+  # Puzzle generation and import. The server runs them on the solver
+  # executor, GENERATOR_WORKERS only sizes the process pool of app.cli, 0
+  # workers uses every core.
+  GENERATOR_WORKERS: int = os.environ.get("GENERATOR_WORKERS", 0)
+  GENERATOR_BATCH_SIZE: int = os.environ.get("GENERATOR_BATCH_SIZE", 100)
+  GENERATOR_RESERVE_SIZE: int = os.environ.get("GENERATOR_RESERVE_SIZE", 1000)
+
+  # The shared executors, see ExecutorService: the thread pool of the
+  # blocking calls and the process pool of the solver, 0 solver workers uses
+  # every core. The QUEUE_SIZE tasks past the busy workers wait, the next
+  # ones are turned away.
+  BLOCKING_WORKERS: int = os.environ.get("BLOCKING_WORKERS", 16)
+  BLOCKING_QUEUE_SIZE: int = os.environ.get("BLOCKING_QUEUE_SIZE", 256)
+  SOLVER_WORKERS: int = os.environ.get("SOLVER_WORKERS", 0)
+  SOLVER_QUEUE_SIZE: int = os.environ.get("SOLVER_QUEUE_SIZE", 64)
+
+  # Puzzles kept in memory, with their solutions to check the submissions
+  # against.
+  PUZZLE_CACHE_SIZE: int = os.environ.get("PUZZLE_CACHE_SIZE", 10000)
+
+  # Leaderboards kept in memory, checked against the database every
+  # LEADERBOARD_INDEX_CHECK_INTERVAL seconds.
+  LEADERBOARD_INDEX: bool = os.environ.get("LEADERBOARD_INDEX", 1) == 1
+  LEADERBOARD_INDEX_CHECK_INTERVAL: int = os.environ.get("LEADERBOARD_INDEX_CHECK_INTERVAL", 60)
+
 settings = Settings()
@@ -1,6 +1,7 @@
 from fastapi import Depends
 from typing import Annotated
 
-from app.core.database import get_database, SessionLocal
+from app.core.database import get_database, get_async_database, SessionLocal, AsyncSessionLocal
 
 database = Annotated[SessionLocal, Depends(get_database)]
+async_database = Annotated[AsyncSessionLocal, Depends(get_async_database)]
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, DateTime, UniqueConstraint, UUID, Integer
+from sqlalchemy import Column, LargeBinary, DateTime, UUID, Integer, Index
 from app.core.database import Base
+from app.libs.sudoku_grid import SudokuGrid, bytes_to_linear_notation, puzzle_hash
 from datetime import datetime
 import uuid
 
@@ -8,9 +9,44 @@ class Sudoku(Base):
 
   id = Column(UUID, primary_key=True, index=True, default=uuid.uuid4)
   difficulty = Column(Integer, nullable=False)
-  puzzle_data = Column(String, nullable=False)
+  # The binary notation of the puzzle, see SudokuGrid.to_bytes
+  puzzle_data = Column(LargeBinary, nullable=False)
+  puzzle_hash = Column(LargeBinary(16), nullable=False, unique=True, index=True)
+  # The hash of the canonical form, the same for isomorphic puzzles, see
+  # SudokuGrid.canonical_hash. NULL for the rows that were already isomorphic
+  # to an other one when the column was added.
+  canonical_hash = Column(LargeBinary(16), nullable=True, unique=True, index=True)
+  # The binary notation of the solution, submissions are checked against it.
+  solution_data = Column(LargeBinary, nullable=True)
+  # The number of the puzzle among the ones of its difficulty, from 1 to
+  # SudokuSequence.last_sequence_no without gaps, so a random puzzle is a
+  # random number and an index lookup away.
+  sequence_no = Column(Integer, nullable=True)
   created_at = Column(DateTime, default=datetime.now())
 
   __table_args__ = (
-    UniqueConstraint('puzzle_data'),
-  )
\ No newline at end of file
+    Index("ix_sudoku_difficulty_sequence_no", "difficulty", "sequence_no", unique=True),
+  )
+
+  @staticmethod
+  def from_linear_notation(
+    difficulty: int, linear_notation: str, canonical_hash: bytes = None, solution_data: bytes = None
+  ) -> "Sudoku":
+    grid = SudokuGrid.from_linear_notation(linear_notation)
+    puzzle_data = grid.to_bytes()
+
+    if solution_data is None:
+      solution = grid.try_solve()
+      solution_data = solution.to_bytes() if solution is not None else None
+
+    return Sudoku(
+      difficulty=difficulty,
+      puzzle_data=puzzle_data,
+      puzzle_hash=puzzle_hash(puzzle_data),
+      canonical_hash=canonical_hash or grid.canonical_hash(),
+      solution_data=solution_data,
+    )
+
+  @property
+  def linear_notation(self) -> str:
+    return bytes_to_linear_notation(self.puzzle_data)
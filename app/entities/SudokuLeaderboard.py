@@ -0,0 +1,61 @@
+from sqlalchemy import Column, Index, Integer, String, UUID, DateTime, Float, ForeignKey
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from datetime import datetime, timedelta
+from typing import Optional
+import uuid
+
+# The leaderboard periods, see get_period_start.
+PERIOD_TODAY = "today"
+PERIOD_WEEK = "week"
+PERIOD_MONTH = "month"
+PERIOD_ALL_TIME = "alltime"
+
+PERIODS = (PERIOD_TODAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_ALL_TIME)
+
+# The entries kept per leaderboard.
+LEADERBOARD_SIZE = 20
+
+# The start of the all time leaderboard.
+ALL_TIME_START = datetime(1970, 1, 1)
+
+
+def get_period_start(period: str, now: datetime) -> datetime:
+  """
+  Returns the start of the period NOW is in: the day, the week starting on
+  Monday, the month, or ALL_TIME_START. NOW is a naive UTC time, like the
+  stored ones.
+  """
+  if period == PERIOD_ALL_TIME:
+    return ALL_TIME_START
+
+  start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+  if period == PERIOD_WEEK:
+    return start - timedelta(days=start.weekday())
+  if period == PERIOD_MONTH:
+    return start.replace(day=1)
+  return start
+
+
+# The best applicable entries of sudoku_registry of a difficulty in a period,
+# at most LEADERBOARD_SIZE of them, kept up to date as the entries are
+# submitted so the leaderboards are read without going through the registry.
+# The rows of the past periods are dropped as new ones start.
+class SudokuLeaderboard(Base):
+  __tablename__ = "sudoku_leaderboard"
+
+  id = Column(UUID, primary_key=True, default=uuid.uuid4)
+  difficulty = Column(Integer, nullable=False)
+  period = Column(String, nullable=False)
+  period_start = Column(DateTime, nullable=False)
+  sudoku_registry_id = Column(UUID, ForeignKey("sudoku_registry.id", ondelete="CASCADE"), nullable=False)
+  user_id = Column(UUID, ForeignKey("users.id"), nullable=False)
+  solving_time = Column(Float, nullable=False)
+
+  user = relationship("User", foreign_keys=[user_id])
+
+  __table_args__ = (
+    Index("ix_sudoku_leaderboard_key", "difficulty", "period", "period_start", "solving_time"),
+    Index("ix_sudoku_leaderboard_period", "period", "period_start"),
+    Index("ix_sudoku_leaderboard_sudoku_registry_id", "sudoku_registry_id"),
+  )
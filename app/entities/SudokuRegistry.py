@@ -1,7 +1,7 @@
-from sqlalchemy import Column, UniqueConstraint, UUID, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Index, UniqueConstraint, UUID, DateTime, Float, Boolean, Integer, ForeignKey, text
 from sqlalchemy.orm import relationship, backref
 from app.core.database import Base
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
 class SudokuRegistry(Base):
@@ -10,9 +10,26 @@ class SudokuRegistry(Base):
   id = Column(UUID, primary_key=True, index=True, default=uuid.uuid4)
   sudoku_id = Column(UUID, ForeignKey("sudoku.id"), nullable=False)
   user_id = Column(UUID, ForeignKey("users.id"), nullable=False)
+  # The difficulty of the puzzle, copied so the leaderboard queries do not
+  # join sudoku.
+  difficulty = Column(Integer, nullable=False)
   solving_time = Column(Float, nullable=False)
   is_applicable = Column(Boolean, nullable=False)
-  created_at = Column(DateTime, default=datetime.now())
+  # A naive UTC time, like the periods of the leaderboards.
+  created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
 
   user = relationship("User", foreign_keys=[user_id])
   sudoku = relationship("Sudoku", foreign_keys=[sudoku_id])
+
+  # The leaderboard and records queries filter on the applicable entries and
+  # sort by solving time.
+  __table_args__ = (
+    Index("ix_sudoku_registry_user_id_is_applicable_solving_time", "user_id", "is_applicable", "solving_time"),
+    Index("ix_sudoku_registry_sudoku_id", "sudoku_id"),
+    Index("ix_sudoku_registry_applicable_difficulty_solving_time", "difficulty", "solving_time", postgresql_where=text("is_applicable")),
+    Index(
+      "ix_sudoku_registry_applicable_difficulty_created_at", "difficulty", "created_at",
+      postgresql_include=["solving_time"], postgresql_where=text("is_applicable"),
+    ),
+    Index("ix_sudoku_registry_applicable_created_at", "created_at", postgresql_where=text("is_applicable")),
+  )
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer
+from app.core.database import Base
+
+class SudokuSequence(Base):
+  __tablename__ = "sudoku_sequence"
+
+  # The puzzles of a difficulty are numbered 1 to LAST_SEQUENCE_NO without
+  # gaps, see Sudoku.sequence_no.
+  difficulty = Column(Integer, primary_key=True)
+  last_sequence_no = Column(Integer, nullable=False, default=0)
@@ -1,3 +1,5 @@
 from .User import User
 from .Sudoku import Sudoku
 from .SudokuRegistry import SudokuRegistry
+from .SudokuSequence import SudokuSequence
+from .SudokuLeaderboard import SudokuLeaderboard
@@ -0,0 +1,167 @@
+import asyncio
+import concurrent.futures
+import threading
+import traceback
+import typing
+
+
+class ExecutorFull(Exception):
+    """
+    Raised when a task is submitted to a BoundedExecutor whose queue is full.
+    """
+
+
+class ExecutorStats:
+    name: str
+    max_workers: int
+    max_queue: int
+    in_flight: int
+    queued: int
+    max_queued: int
+    submitted: int
+    completed: int
+    failed: int
+    rejected: int
+
+    """
+    A snapshot of the counters of a BoundedExecutor.
+
+    IN_FLIGHT counts the tasks submitted and not finished, QUEUED those of
+    them waiting for a worker, MAX_QUEUED the most that ever waited at once.
+    FAILED counts the tasks that raised, REJECTED those turned away with
+    ExecutorFull.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> typing.Self:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def __repr__(self) -> str:
+        return f'<ExecutorStats {self.name} in_flight={self.in_flight} queued={self.queued} rejected={self.rejected}>'
+
+
+class BoundedExecutor:
+    name: str
+    max_workers: int
+    max_queue: int
+
+    """
+    Runs tasks on MAX_WORKERS workers of an executor made by FACTORY, with at
+    most MAX_QUEUE tasks waiting for a worker, so a burst of slow tasks holds
+    a bounded number of callers instead of piling up. Past that, submit
+    raises ExecutorFull, or waits for a slot if asked to.
+
+    The executor is only made on the first task, a process pool spawns its
+    workers then, and made again if it breaks, like a process pool whose
+    worker was killed. Can be shared between threads.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            factory: typing.Callable[[int], concurrent.futures.Executor],
+            max_workers: int,
+            max_queue: int) -> typing.Self:
+
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.__factory = factory
+        self.__executor = None
+        self.__stats = ExecutorStats(name, max_workers, max_queue)
+        self.__slots = threading.Condition()
+
+    def __repr__(self) -> str:
+        return f'<BoundedExecutor {self.name} workers={self.max_workers} queue={self.max_queue}>'
+
+    def __done(self, future: concurrent.futures.Future) -> None:
+        with self.__slots:
+            stats = self.__stats
+            stats.in_flight -= 1
+            stats.queued = max(0, stats.in_flight - self.max_workers)
+
+            if future.cancelled() or future.exception() is not None:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+
+            self.__slots.notify()
+
+    def submit(self, fn: typing.Callable, *args: typing.Any, block: bool = False) -> concurrent.futures.Future:
+        """
+        Runs FN with ARGS on a worker and returns its future. If the queue is
+        full, raises ExecutorFull, or waits for a slot if BLOCK is True,
+        which is only meant for the background threads.
+        """
+
+        with self.__slots:
+            stats = self.__stats
+
+            while stats.in_flight >= self.max_workers + self.max_queue:
+                if not block:
+                    stats.rejected += 1
+                    raise ExecutorFull(f'The {self.name} executor is full, {stats.queued} tasks are waiting')
+
+                self.__slots.wait()
+
+            if self.__executor is None:
+                self.__executor = self.__factory(self.max_workers)
+
+            try:
+                future = self.__executor.submit(fn, *args)
+            except concurrent.futures.BrokenExecutor:
+                # The tasks of the broken executor have already failed.
+                self.__executor.shutdown(wait=False)
+                self.__executor = self.__factory(self.max_workers)
+                future = self.__executor.submit(fn, *args)
+
+            stats.submitted += 1
+            stats.in_flight += 1
+            stats.queued = max(0, stats.in_flight - self.max_workers)
+            stats.max_queued = max(stats.max_queued, stats.queued)
+
+        future.add_done_callback(self.__done)
+        return future
+
+    async def run(self, fn: typing.Callable, *args: typing.Any) -> typing.Any:
+        """
+        Runs FN with ARGS on a worker, and waits for its result without
+        blocking the event loop.
+        """
+
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def spawn(self, fn: typing.Callable, *args: typing.Any) -> concurrent.futures.Future:
+        """
+        Runs FN with ARGS on a worker without waiting for it, the exception it
+        raises, if any, is printed.
+        """
+
+        def report(future: concurrent.futures.Future) -> None:
+            if not future.cancelled() and future.exception() is not None:
+                traceback.print_exception(future.exception())
+
+        future = self.submit(fn, *args)
+        future.add_done_callback(report)
+        return future
+
+    def stats(self) -> ExecutorStats:
+        with self.__slots:
+            stats = ExecutorStats(self.name, self.max_workers, self.max_queue)
+            stats.__dict__.update(self.__stats.__dict__)
+            return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self.__slots:
+            executor, self.__executor = self.__executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
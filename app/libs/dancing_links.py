@@ -0,0 +1,234 @@
+import typing
+
+
+class DancingLinks:
+    column_count: int
+    row_count: int
+    left: list[int]
+    right: list[int]
+    up: list[int]
+    down: list[int]
+    column: list[int]
+    size: list[int]
+    row_of: list[int]
+
+    """
+    Solves exact cover problems using Knuth's Algorithm X with dancing links.
+
+    The matrix is stored as circular doubly linked lists in flat integer
+    lists. Node 0 is the root, nodes 1-column_count are the column headers
+    and the remaining nodes are the ones of the matrix. A column is
+    identified by its header node, a row by its index in ROWS.
+
+    Searching does not alter the matrix, so an object can be searched many
+    times.
+    """
+
+    def __init__(self, column_count: int, rows: list[list[int]]) -> typing.Self:
+        """
+        Build the matrix. Every row is the list of the columns it covers,
+        numbered from 0.
+        """
+
+        self.column_count = column_count
+        self.row_count = len(rows)
+
+        headers = range(column_count + 1)
+        left = [header - 1 for header in headers]
+        right = [header + 1 for header in headers]
+        left[0] = column_count
+        right[column_count] = 0
+        up = list(headers)
+        down = list(headers)
+        column = list(headers)
+        size = [0] * (column_count + 1)
+        row_of = [-1] * (column_count + 1)
+
+        for row_id, columns in enumerate(rows):
+            first = len(column)
+            last = first + len(columns) - 1
+
+            left.append(last)
+            left.extend(range(first, last))
+            right.extend(range(first + 1, last + 1))
+            right.append(first)
+            row_of.extend([row_id] * len(columns))
+
+            for node, header in enumerate(columns, first):
+                header += 1
+
+                up.append(up[header])
+                down.append(header)
+                column.append(header)
+
+                down[up[header]] = node
+                up[header] = node
+                size[header] += 1
+
+        self.left = left
+        self.right = right
+        self.up = up
+        self.down = down
+        self.column = column
+        self.size = size
+        self.row_of = row_of
+
+    # -- ~*~Magic~*~ methods --
+    def __repr__(self) -> str:
+        return f'<DancingLinks columns={self.column_count} rows={self.row_count}>'
+
+    # -- Private methods --
+    def _cover(self, header: int) -> None:
+        """
+        Removes a column from the header list and all of the rows that
+        intersect it from the other columns.
+        """
+
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+
+        row = down[header]
+        while row != header:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                size[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def _uncover(self, header: int) -> None:
+        """
+        Reverts a call to _cover. Calls should be made in the reverse order.
+        """
+
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+
+        row = up[header]
+        while row != header:
+            node = left[row]
+            while node != row:
+                size[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def _uncover_row(self, row: int) -> None:
+        """
+        Uncovers the columns of a chosen row, except the one it was chosen
+        for, in the reverse order they were covered.
+        """
+
+        node = self.left[row]
+        while node != row:
+            self._uncover(self.column[node])
+            node = self.left[node]
+
+    def _choose_column(self) -> int:
+        """
+        Returns the uncovered column with the fewest rows, or 0 if all of the
+        columns are covered.
+        """
+
+        right, size = self.right, self.size
+
+        best = 0
+        best_size = self.row_count + 1
+
+        header = right[0]
+        while header != 0:
+            if size[header] < best_size:
+                best = header
+                best_size = size[header]
+                if best_size <= 1:
+                    break
+            header = right[header]
+
+        return best
+
+    # -- Public methods --
+    def enumerate(self) -> typing.Generator[list[int], None, None]:
+        """
+        Yields every solution as the list of its row ids.
+        Uses an explicit stack, so the depth of the search is not limited by
+        the recursion limit. The matrix must not be altered while iterating.
+        """
+
+        right, down, column, row_of = self.right, self.down, self.column, self.row_of
+
+        header = self._choose_column()
+        if header == 0:
+            yield []
+            return
+
+        if self.size[header] == 0:
+            return
+
+        chosen = []
+        self._cover(header)
+        row = down[header]
+
+        try:
+            while True:
+                if row != column[row]:
+                    # Try the row: take it and cover the rest of its columns.
+                    chosen.append(row)
+                    node = right[row]
+                    while node != row:
+                        self._cover(column[node])
+                        node = right[node]
+
+                    header = self._choose_column()
+                    if header == 0:
+                        yield [row_of[node] for node in chosen]
+                    elif self.size[header] > 0:
+                        self._cover(header)
+                        row = down[header]
+                        continue
+                else:
+                    # All of the rows of this column were tried, go up one
+                    # level.
+                    self._uncover(row)
+                    if not chosen:
+                        return
+
+                # Undo the last chosen row and move on to the next one.
+                row = chosen.pop()
+                self._uncover_row(row)
+                row = down[row]
+        finally:
+            # If the caller stops iterating early, restore the matrix.
+            while chosen:
+                row = chosen.pop()
+                self._uncover_row(row)
+                self._uncover(column[row])
+
+    def find_first(self) -> None | list[int]:
+        """
+        Returns the first solution found, or None if there are none.
+        """
+
+        for solution in self.enumerate():
+            return solution
+
+        return None
+
+    def count(self, limit: int = -1) -> int:
+        """
+        Counts the solutions. Stops at LIMIT solutions, unless it is -1.
+        """
+
+        total = 0
+
+        for _ in self.enumerate():
+            total += 1
+            if total == limit:
+                break
+
+        return total
@@ -0,0 +1,283 @@
+import datetime
+import threading
+import typing
+import uuid
+
+from sortedcontainers import SortedList
+
+
+# A leaderboard entry, as its solving time, its creation time, its registry
+# id and its user id. Entries sort by time, the earlier one first on a tie.
+Entry = tuple[float, datetime.datetime, uuid.UUID, uuid.UUID]
+
+
+def make_entry(
+        solving_time: float,
+        created_at: None | datetime.datetime,
+        registry_id: uuid.UUID,
+        user_id: uuid.UUID) -> Entry:
+
+    """
+    Builds an entry, the rows created before their time was stored sort
+    first on a tie.
+    """
+
+    return (solving_time, created_at or datetime.datetime.min, registry_id, user_id)
+
+
+class Leaderboard:
+    start: datetime.datetime
+    entries: SortedList
+    users: dict[uuid.UUID, SortedList]
+
+    """
+    The entries of a difficulty since START, in a sorted list that gives the
+    rank of an entry in O(log n), with the entries of every user, the best
+    one first.
+    """
+
+    def __init__(self, start: datetime.datetime, entries: typing.Iterable[Entry] = ()) -> typing.Self:
+        self.start = start
+        self.entries = SortedList()
+        self.users = {}
+
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return f'<Leaderboard start={self.start} size={len(self)}>'
+
+    def add(self, entry: Entry) -> None:
+        self.entries.add(entry)
+        self.users.setdefault(entry[3], SortedList()).add(entry)
+
+    def remove(self, entry: Entry) -> None:
+        if entry not in self.entries:
+            return
+
+        self.entries.remove(entry)
+
+        user_entries = self.users[entry[3]]
+        user_entries.remove(entry)
+        if not user_entries:
+            del self.users[entry[3]]
+
+    def top(self, count: int) -> list[Entry]:
+        return list(self.entries.islice(0, count))
+
+    def place(self, user_id: uuid.UUID) -> None | tuple[Entry, int]:
+        """
+        Returns the best entry of a user with its place, 1 plus the number of
+        entries with a better time, or None if the user has no entry.
+        """
+
+        user_entries = self.users.get(user_id)
+        if not user_entries:
+            return None
+
+        entry = user_entries[0]
+        return entry, self.entries.bisect_left((entry[0],)) + 1
+
+
+class LeaderboardIndex:
+    loaded: bool
+    usernames: dict[uuid.UUID, str]
+
+    """
+    The leaderboards of every difficulty and period in memory.
+
+    The all time leaderboard of a difficulty holds every entry, the one of a
+    period the entries created since its start. The entries added or removed
+    go to every leaderboard, and the leaderboards of a period are replaced
+    when it rolls over, see replace_period, so only the current periods are
+    kept. An entry already in the index is skipped.
+    Can be shared between threads.
+    """
+
+    def __init__(self) -> typing.Self:
+        self.loaded = False
+        self.usernames = {}
+        self.__all_time = {}
+        self.__periods = {}
+        self.__entries = {}
+        self.__pending = None
+        self.__lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'<LeaderboardIndex loaded={self.loaded} sizes={self.sizes()}>'
+
+    def __add(self, difficulty: int, entry: Entry) -> bool:
+        if entry[2] in self.__entries:
+            return False
+
+        self.__entries[entry[2]] = (difficulty, entry)
+        self.__all_time.setdefault(difficulty, Leaderboard(datetime.datetime.min)).add(entry)
+
+        for start, boards in self.__periods.values():
+            if entry[1] >= start:
+                boards.setdefault(difficulty, Leaderboard(start)).add(entry)
+
+        return True
+
+    def __remove(self, registry_id: uuid.UUID) -> bool:
+        if registry_id not in self.__entries:
+            return False
+
+        difficulty, entry = self.__entries.pop(registry_id)
+        self.__all_time[difficulty].remove(entry)
+
+        for _, boards in self.__periods.values():
+            if difficulty in boards:
+                boards[difficulty].remove(entry)
+
+        return True
+
+    def add(self, difficulty: int, entry: Entry, username: None | str = None) -> bool:
+        """
+        Adds an entry, returns False if it was already in the index.
+        """
+
+        with self.__lock:
+            if username is not None:
+                self.usernames[entry[3]] = username
+
+            if self.__pending is not None:
+                self.__pending.append((difficulty, entry, username))
+
+            return self.__add(difficulty, entry)
+
+    def remove(self, registry_id: uuid.UUID) -> bool:
+        """
+        Removes the entry of a registry id, returns False if it was not in
+        the index.
+        """
+
+        with self.__lock:
+            if self.__pending is not None:
+                self.__pending.append((None, registry_id, None))
+
+            return self.__remove(registry_id)
+
+    def rename(self, user_id: uuid.UUID, username: str) -> None:
+        with self.__lock:
+            if user_id in self.usernames:
+                self.usernames[user_id] = username
+
+    def sizes(self) -> dict[int, int]:
+        with self.__lock:
+            return {difficulty: len(board) for difficulty, board in self.__all_time.items()}
+
+    def has_period(self, period: str, start: datetime.datetime) -> bool:
+        """
+        Checks if the leaderboards of PERIOD are built from START.
+        """
+
+        with self.__lock:
+            return period in self.__periods and self.__periods[period][0] == start
+
+    def _board(self, difficulty: int, period: str, start: None | datetime.datetime = None) -> Leaderboard:
+        """
+        Returns the leaderboard of the entries of a difficulty created since
+        START, or of all of them if START is None. Raises LookupError if the
+        leaderboards of PERIOD are not built from START, see has_period.
+        The leaderboard must only be read while no entry is added, see
+        read.
+        """
+
+        if start is None:
+            return self.__all_time.get(difficulty) or Leaderboard(datetime.datetime.min)
+
+        if period not in self.__periods or self.__periods[period][0] != start:
+            raise LookupError(f'The {period} leaderboards are not built from {start}')
+
+        return self.__periods[period][1].get(difficulty) or Leaderboard(start)
+
+    def read(self, difficulty: int, period: str, start: None | datetime.datetime, read: typing.Callable[[Leaderboard], typing.Any]) -> typing.Any:
+        """
+        Calls READ with a leaderboard, see _board, while no entry is added.
+        """
+
+        with self.__lock:
+            return read(self._board(difficulty, period, start))
+
+    def __collect(self, entries: typing.Iterable[tuple[int, Entry, str]]) -> tuple[dict, dict]:
+        # Reads ENTRIES without holding the lock, the entries added or
+        # removed meanwhile are kept aside to be replayed, see __replay.
+        with self.__lock:
+            self.__pending = []
+
+        collected = {}
+        usernames = {}
+
+        for difficulty, entry, username in entries:
+            if entry[2] not in collected:
+                collected[entry[2]] = (difficulty, entry)
+                usernames[entry[3]] = username
+
+        return collected, usernames
+
+    def __replay(self, collected: dict, add: typing.Callable[[int, Entry], None], remove: typing.Callable[[int, Entry], None]) -> None:
+        for difficulty, entry, _ in self.__pending:
+            if difficulty is None:
+                # A removal, ENTRY is the registry id.
+                if entry in collected:
+                    remove(*collected.pop(entry))
+            elif entry[2] not in collected:
+                collected[entry[2]] = (difficulty, entry)
+                add(difficulty, entry)
+
+        self.__pending = None
+
+    def replace(self, entries: typing.Iterable[tuple[int, Entry, str]]) -> None:
+        """
+        Replaces every entry with ENTRIES, (difficulty, entry, username)
+        tuples. ENTRIES may be read from the database while entries are
+        added or removed, those changes are kept. The leaderboards of the
+        periods are kept as they are, see replace_period.
+        """
+
+        collected, usernames = self.__collect(entries)
+
+        all_time = {}
+        for difficulty, entry in collected.values():
+            all_time.setdefault(difficulty, Leaderboard(datetime.datetime.min)).add(entry)
+
+        with self.__lock:
+            for _, entry, username in self.__pending:
+                if username is not None:
+                    usernames[entry[3]] = username
+
+            self.__replay(
+                collected,
+                lambda difficulty, entry: all_time.setdefault(difficulty, Leaderboard(datetime.datetime.min)).add(entry),
+                lambda difficulty, entry: all_time[difficulty].remove(entry),
+            )
+
+            self.__all_time = all_time
+            self.__entries = collected
+            self.usernames = usernames
+            self.loaded = True
+
+    def replace_period(self, period: str, start: datetime.datetime, entries: typing.Iterable[tuple[int, Entry, str]]) -> None:
+        """
+        Replaces the leaderboards of PERIOD with the ones of the entries
+        created since START, read from ENTRIES like replace, so the entries
+        of the index are not scanned while the lock is held.
+        """
+
+        collected, _ = self.__collect(entry for entry in entries if entry[1][1] >= start)
+
+        boards = {}
+        for difficulty, entry in collected.values():
+            boards.setdefault(difficulty, Leaderboard(start)).add(entry)
+
+        def add(difficulty: int, entry: Entry) -> None:
+            if entry[1] >= start:
+                boards.setdefault(difficulty, Leaderboard(start)).add(entry)
+
+        with self.__lock:
+            self.__replay(collected, add, lambda difficulty, entry: boards[difficulty].remove(entry))
+            self.__periods[period] = (start, boards)
@@ -0,0 +1,354 @@
+import itertools
+import typing
+
+from app.libs.sudoku_grid import SudokuGrid
+
+
+# The grades of the techniques, see LogicalSolver.
+GRADE_EASY = 0
+GRADE_MEDIUM = 1
+GRADE_HARD = 2
+GRADE_GUESSING = 3
+
+# The techniques in the order they are tried, easiest first, with their
+# grades.
+TECHNIQUES = (
+    ('hidden_single', GRADE_EASY),
+    ('naked_single', GRADE_EASY),
+    ('pointing', GRADE_MEDIUM),
+    ('box_line_reduction', GRADE_MEDIUM),
+    ('naked_pair', GRADE_MEDIUM),
+    ('hidden_pair', GRADE_MEDIUM),
+    ('naked_triple', GRADE_HARD),
+    ('hidden_triple', GRADE_HARD),
+    ('x_wing', GRADE_HARD),
+    ('swordfish', GRADE_HARD),
+    ('naked_quad', GRADE_HARD),
+    ('hidden_quad', GRADE_HARD),
+)
+
+
+def _bits(mask: int) -> typing.Generator[int, None, None]:
+    """
+    Yields the positions of the bits set in a mask, in increasing order.
+    """
+
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class Rating:
+    grade: int
+    techniques: list[str]
+    solved: bool
+
+    """
+    The result of solving a grid with LogicalSolver.
+
+    GRADE is the grade of the hardest technique needed, or GRADE_GUESSING if
+    the techniques were not enough to solve the grid.
+    TECHNIQUES lists the names of the techniques used, in the order they
+    were first used.
+    """
+
+    def __init__(self, grade: int, techniques: list[str], solved: bool) -> typing.Self:
+        self.grade = grade
+        self.techniques = techniques
+        self.solved = solved
+
+    def __repr__(self) -> str:
+        return f'<Rating grade={self.grade} solved={self.solved} techniques={self.techniques}>'
+
+
+class LogicalSolver:
+    grid_size: int
+    values: list[int]
+    candidates: list[int]
+    units: list[list[int]]
+    peers: list[list[int]]
+    cell_units: list[list[int]]
+
+    """
+    Solves a grid the way a person would, with the techniques of TECHNIQUES.
+
+    After every step the easiest technique is tried again, so a puzzle is
+    graded by the hardest technique it can not be solved without. Cells and
+    units are always scanned in the same order and nothing is random, so a
+    grid always gets the same rating.
+
+    Cells are indexed by their flat index and candidates are bitmasks, bit
+    (d - 1) standing for the digit d, like in SudokuGrid.
+    """
+
+    def __init__(self, grid: SudokuGrid) -> typing.Self:
+        grid = grid.copy()
+        grid.generate_candidates()
+
+        self.grid_size = grid.grid_size
+        self.values = grid.array.ravel().tolist()
+        self.candidates = grid.candidates.ravel().tolist()
+        self.units = grid.tables.units.tolist()
+        self.peers = grid.tables.peers.tolist()
+        self.cell_units = grid.tables.cell_units.tolist()
+
+    # -- Private methods --
+    def _place(self, index: int, digit: int) -> None:
+        """
+        Fills a cell and removes the digit from the candidates of its peers.
+        """
+
+        bit = 1 << (digit - 1)
+
+        self.values[index] = digit
+        self.candidates[index] = 0
+
+        for peer in self.peers[index]:
+            self.candidates[peer] &= ~bit
+
+    def _eliminate(self, cells: typing.Iterable[int], mask: int) -> bool:
+        """
+        Removes the digits of MASK from the candidates of CELLS.
+        Returns True if anything was removed.
+        """
+
+        progress = False
+
+        for index in cells:
+            if self.candidates[index] & mask:
+                self.candidates[index] &= ~mask
+                progress = True
+
+        return progress
+
+    def _positions(self, unit: list[int], bit: int) -> list[int]:
+        """
+        Returns the cells of a unit that have a candidate.
+        """
+
+        return [index for index in unit if self.candidates[index] & bit]
+
+    def _hidden_single(self) -> bool:
+        for unit in self.units:
+            for digit in range(1, self.grid_size + 1):
+                positions = self._positions(unit, 1 << (digit - 1))
+
+                if len(positions) == 1:
+                    self._place(positions[0], digit)
+                    return True
+
+        return False
+
+    def _naked_single(self) -> bool:
+        for index, available in enumerate(self.candidates):
+            if available and available & (available - 1) == 0:
+                self._place(index, available.bit_length())
+                return True
+
+        return False
+
+    def _intersection(self, base_units: list[list[int]], cover_offsets: tuple[int, ...]) -> bool:
+        """
+        If the candidates of a digit in a base unit all lie in one other unit,
+        the digit is removed from the rest of that unit.
+        COVER_OFFSETS selects the kinds of units to look at, 0 for the rows,
+        1 for the columns and 2 for the blocks.
+        """
+
+        for unit in base_units:
+            for digit in range(1, self.grid_size + 1):
+                bit = 1 << (digit - 1)
+                positions = self._positions(unit, bit)
+
+                if len(positions) < 2:
+                    continue
+
+                for offset in cover_offsets:
+                    cover = self.cell_units[positions[0]][offset]
+
+                    if any(self.cell_units[index][offset] != cover for index in positions):
+                        continue
+
+                    if self._eliminate((index for index in self.units[cover] if index not in unit), bit):
+                        return True
+
+        return False
+
+    def _pointing(self) -> bool:
+        return self._intersection(self.units[2 * self.grid_size:], (0, 1))
+
+    def _box_line_reduction(self) -> bool:
+        return self._intersection(self.units[:2 * self.grid_size], (2,))
+
+    def _naked_subset(self, size: int) -> bool:
+        """
+        If SIZE cells of a unit have only SIZE digits between them, the
+        digits are removed from the other cells of the unit.
+        """
+
+        for unit in self.units:
+            cells = [index for index in unit if 2 <= self.candidates[index].bit_count() <= size]
+
+            for subset in itertools.combinations(cells, size):
+                mask = 0
+                for index in subset:
+                    mask |= self.candidates[index]
+
+                if mask.bit_count() != size:
+                    continue
+
+                if self._eliminate((index for index in unit if index not in subset), mask):
+                    return True
+
+        return False
+
+    def _hidden_subset(self, size: int) -> bool:
+        """
+        If SIZE digits of a unit can only go in the same SIZE cells, the
+        other digits are removed from those cells.
+        """
+
+        for unit in self.units:
+            # The cells a digit can go in, as a mask over the unit.
+            positions = {}
+            for digit in range(1, self.grid_size + 1):
+                bit = 1 << (digit - 1)
+                mask = sum(1 << offset for offset, index in enumerate(unit) if self.candidates[index] & bit)
+
+                if 2 <= mask.bit_count() <= size:
+                    positions[digit] = mask
+
+            for digits in itertools.combinations(positions, size):
+                mask = 0
+                for digit in digits:
+                    mask |= positions[digit]
+
+                if mask.bit_count() != size:
+                    continue
+
+                keep = sum(1 << (digit - 1) for digit in digits)
+                if self._eliminate((unit[offset] for offset in _bits(mask)), ~keep):
+                    return True
+
+        return False
+
+    def _fish(self, size: int) -> bool:
+        """
+        If the candidates of a digit in SIZE rows lie in the same SIZE
+        columns, the digit is removed from the rest of those columns. The
+        same goes for the columns and rows swapped.
+        """
+
+        grid_size = self.grid_size
+
+        for digit in range(1, grid_size + 1):
+            bit = 1 << (digit - 1)
+
+            for base_units, cover_units in ((self.units[:grid_size], self.units[grid_size:2 * grid_size]),
+                                            (self.units[grid_size:2 * grid_size], self.units[:grid_size])):
+                # The positions of the digit in a base unit, as a mask of
+                # cover unit numbers.
+                positions = {}
+                for base_no, unit in enumerate(base_units):
+                    mask = sum(1 << offset for offset, index in enumerate(unit) if self.candidates[index] & bit)
+
+                    if 2 <= mask.bit_count() <= size:
+                        positions[base_no] = mask
+
+                for bases in itertools.combinations(positions, size):
+                    mask = 0
+                    for base_no in bases:
+                        mask |= positions[base_no]
+
+                    if mask.bit_count() != size:
+                        continue
+
+                    cells = (
+                        index
+                        for cover_no in _bits(mask)
+                        for base_no, index in enumerate(cover_units[cover_no])
+                        if base_no not in bases
+                    )
+                    if self._eliminate(cells, bit):
+                        return True
+
+        return False
+
+    def _naked_pair(self) -> bool:
+        return self._naked_subset(2)
+
+    def _hidden_pair(self) -> bool:
+        return self._hidden_subset(2)
+
+    def _naked_triple(self) -> bool:
+        return self._naked_subset(3)
+
+    def _hidden_triple(self) -> bool:
+        return self._hidden_subset(3)
+
+    def _x_wing(self) -> bool:
+        return self._fish(2)
+
+    def _swordfish(self) -> bool:
+        return self._fish(3)
+
+    def _naked_quad(self) -> bool:
+        return self._naked_subset(4)
+
+    def _hidden_quad(self) -> bool:
+        return self._hidden_subset(4)
+
+    # -- Public methods --
+    def is_solved(self) -> bool:
+        """
+        Checks if every cell is filled.
+        """
+
+        return all(self.values)
+
+    def is_broken(self) -> bool:
+        """
+        Checks if an empty cell ran out of candidates.
+        """
+
+        return any(not value and not available for value, available in zip(self.values, self.candidates))
+
+    def solve(self) -> Rating:
+        """
+        Applies the techniques until the grid is solved or none of them make
+        progress, and rates the grid.
+        """
+
+        used = {}
+
+        while not self.is_solved() and not self.is_broken():
+            for name, grade in TECHNIQUES:
+                if getattr(self, f'_{name}')():
+                    used.setdefault(name, grade)
+                    break
+            else:
+                break
+
+        solved = self.is_solved()
+        grade = max(used.values(), default=GRADE_EASY) if solved else GRADE_GUESSING
+
+        return Rating(grade, list(used), solved)
+
+
+def rate(grid: SudokuGrid) -> Rating:
+    """
+    Solves a grid with a LogicalSolver and returns its rating.
+    """
+
+    return LogicalSolver(grid).solve()
+
+
+def get_difficulty(grid: SudokuGrid) -> int:
+    """
+    Returns the difficulty of a grid, as stored with the puzzles. The rating
+    is deterministic, the hardest technique needed decides the difficulty.
+    Puzzles that need guessing are counted as hard.
+    """
+
+    return min(rate(grid).grade, GRADE_HARD)
@@ -0,0 +1,67 @@
+import collections
+import threading
+import typing
+
+
+class LRUCache:
+    maxsize: int
+    hits: int
+    misses: int
+
+    """
+    A size bounded mapping that drops the least recently used entries first,
+    for values that are expensive to get and never change, like the puzzles.
+    Counts its hits and misses. Can be shared between threads.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> typing.Self:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __repr__(self) -> str:
+        return f'<LRUCache size={len(self)}/{self.maxsize} hits={self.hits} misses={self.misses}>'
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """
+        Returns the value of a key and marks it as recently used, or DEFAULT
+        if the key is not cached.
+        """
+
+        with self.__lock:
+            if key not in self.__entries:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            return self.__entries[key]
+
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        """
+        Caches a value, dropping the least recently used one if full.
+        """
+
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+
+            if len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+
+    def pop(self, key: typing.Hashable) -> None:
+        """
+        Drops a key, if it is cached.
+        """
+
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
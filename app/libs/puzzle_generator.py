@@ -0,0 +1,322 @@
+import concurrent.futures
+import multiprocessing
+import numpy
+import os
+import threading
+import typing
+
+from app.libs.bounded_executor import BoundedExecutor
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.libs.logical_solver import get_difficulty
+
+
+# A generated puzzle, as its linear notation, its canonical hash, see
+# SudokuGrid.canonical_hash, and its solution in binary notation.
+Puzzle = tuple[str, bytes, bytes]
+
+# How many other clues generate_targeted_puzzles tries to give back when the
+# next one skips the difficulty.
+BOUNDARY_TRIES = 8
+
+
+class GenerationStats:
+    generated: int
+    accepted: int
+    duplicates: int
+    unsolvable: int
+    rejected: dict[int, int]
+    reserved: int
+    from_reserve: int
+
+    """
+    Counts what happened to the puzzles generated by generate_puzzles.
+
+    REJECTED counts the puzzles of an other difficulty, by their difficulty.
+    RESERVED counts those of them that were kept in the reserve and
+    FROM_RESERVE the accepted puzzles that were taken from it.
+    """
+
+    def __init__(self) -> typing.Self:
+        self.generated = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.unsolvable = 0
+        self.rejected = {}
+        self.reserved = 0
+        self.from_reserve = 0
+
+    def __repr__(self) -> str:
+        return f'<GenerationStats generated={self.generated} accepted={self.accepted} rejected={self.rejected}>'
+
+
+class PuzzleReserve:
+    capacity: int
+    puzzles: dict[int, list[Puzzle]]
+
+    """
+    Keeps the puzzles generated for an other difficulty, by difficulty, so
+    that a later generation of that difficulty can use them. Keeps at most
+    CAPACITY puzzles of a difficulty.
+    Can be shared between threads.
+    """
+
+    def __init__(self, capacity: int = 1000) -> typing.Self:
+        self.capacity = capacity
+        self.puzzles = {}
+        self.__lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'<PuzzleReserve sizes={self.sizes()}>'
+
+    def sizes(self) -> dict[int, int]:
+        with self.__lock:
+            return {difficulty: len(puzzles) for difficulty, puzzles in self.puzzles.items()}
+
+    def put(self, difficulty: int, puzzle: Puzzle) -> bool:
+        """
+        Adds a puzzle, returns False if the reserve of the difficulty is full.
+        """
+
+        with self.__lock:
+            puzzles = self.puzzles.setdefault(difficulty, [])
+
+            if len(puzzles) >= self.capacity:
+                return False
+
+            puzzles.append(puzzle)
+            return True
+
+    def take(self, difficulty: int, count: int) -> list[Puzzle]:
+        """
+        Removes and returns at most COUNT puzzles of a difficulty.
+        """
+
+        with self.__lock:
+            puzzles = self.puzzles.get(difficulty, [])
+            taken = puzzles[len(puzzles) - min(count, len(puzzles)):]
+            del puzzles[len(puzzles) - len(taken):]
+            return taken
+
+
+def generate_targeted_puzzles(
+        difficulty: int,
+        seed: int,
+        block_size: int = 3) -> list[tuple[None | int, Puzzle]]:
+
+    """
+    Generates puzzles from SEED, steering toward DIFFICULTY.
+    Returns the difficulties of the puzzles with the puzzles, at most one
+    puzzle per difficulty, or a single puzzle with None as the difficulty,
+    and as its hash and solution, if it could not be solved.
+
+    The generated puzzle has as few clues as possible, so it is the hardest
+    the filled grid gives. If it is too hard, clues of the solution are given
+    back in a random order, and the fewest clues that bring the rating down
+    to DIFFICULTY are found with a binary search. Giving back every clue
+    solves the grid, so any difficulty below the one of the generated puzzle
+    is reached in a few ratings. If the next clue skips DIFFICULTY, a few
+    other clues are tried in its place. The puzzles rated along the way are
+    returned too, for the reserve.
+
+    Runs in the worker processes of generate_puzzles, so it only takes and
+    returns plain values.
+    """
+
+    rng = get_random(seed)
+    grid = SudokuGrid.generate_unique_puzzle(block_size, rng=rng)
+    solution = grid.try_solve()
+
+    if solution is None:
+        return [(None, (grid.linear_notation, None, None))]
+
+    rows, cols = numpy.nonzero(grid.array == 0)
+    order = numpy.array(rng.sample(range(len(rows)), len(rows)), dtype=numpy.intp)
+    rows, cols = rows[order], cols[order]
+
+    # The puzzle with the fewest clues of every difficulty met, by
+    # difficulty.
+    found = {}
+
+    def grade_with(given: int, extra: None | int = None) -> int:
+        """
+        Rates the puzzle with the first GIVEN clues given back, and the one
+        at EXTRA in the order.
+        """
+
+        puzzle = grid.copy()
+        puzzle.array[rows[:given], cols[:given]] = solution.array[rows[:given], cols[:given]]
+        if extra is not None:
+            puzzle.array[rows[extra], cols[extra]] = solution.array[rows[extra], cols[extra]]
+            given += 1
+
+        grade = get_difficulty(puzzle)
+
+        if grade not in found or found[grade][0] > given:
+            found[grade] = (given, puzzle)
+
+        return grade
+
+    if grade_with(0) > difficulty:
+        # Invariant: the puzzle with LOW clues given back is too hard, the one
+        # with HIGH clues given back is not.
+        low, high = 0, len(rows)
+
+        while high - low > 1:
+            middle = (low + high) // 2
+
+            if grade_with(middle) > difficulty:
+                low = middle
+            else:
+                high = middle
+
+        # Giving back the next clue skipped DIFFICULTY, try giving back an
+        # other one instead.
+        for extra in range(high, min(high + BOUNDARY_TRIES, len(rows))):
+            if difficulty in found or high == len(rows):
+                break
+
+            grade_with(low, extra)
+
+    # The puzzles only differ in the clues given back, they share the solution.
+    solution_data = solution.to_bytes()
+
+    return [
+        (grade, (puzzle.linear_notation, puzzle.canonical_hash(), solution_data))
+        for grade, (_, puzzle) in found.items()
+    ]
+
+
+def generate_puzzles(
+        difficulty: int,
+        count: int,
+        workers: None | int = None,
+        batch_size: int = 100,
+        block_size: int = 3,
+        seed: None | int = None,
+        stats: None | GenerationStats = None,
+        stop: None | threading.Event = None,
+        reserve: None | PuzzleReserve = None,
+        executor: None | BoundedExecutor = None) -> typing.Generator[list[Puzzle], None, None]:
+
+    """
+    Generates COUNT unique puzzles of DIFFICULTY on WORKERS processes, every
+    core by default. Yields the puzzles in batches of BATCH_SIZE as they are
+    completed, the last batch may be smaller. Puzzles isomorphic to one
+    already accepted are left out.
+
+    The puzzles are generated with generate_targeted_puzzles. If RESERVE is
+    given, its puzzles of DIFFICULTY are used first, and the puzzles of the
+    other difficulties are kept in it instead of being thrown away.
+
+    Every puzzle gets its own seed, derived from SEED, so the same SEED always
+    draws from the same puzzles, although they are accepted in the order
+    they are completed. Closing the generator cancels the pending work.
+
+    STATS is updated as the puzzles are completed. Setting STOP stops the
+    generation early, the puzzles accepted so far are still yielded. If the
+    generation fails, the puzzles accepted and not yielded go to RESERVE.
+
+    If EXECUTOR is given, a BoundedExecutor of processes shared with other
+    work, the puzzles are generated on it instead, with at most WORKERS
+    tasks on it at once, the share of its workers the generation may take.
+    """
+
+    stats = stats or GenerationStats()
+    workers = workers or os.cpu_count() or 1
+    seed_sequence = numpy.random.SeedSequence(seed)
+
+    # Keep a few tasks per worker in flight, so that the workers never wait
+    # for the results to be collected, but not so many that a lot of work is
+    # thrown away when enough puzzles are found. On a shared executor, the
+    # queue is left to the other work.
+    in_flight = 2 * workers if executor is None else workers
+
+    seen = set()
+    batch = []
+
+    def accept(puzzle: Puzzle) -> bool:
+        nonlocal count
+
+        if puzzle[1] in seen:
+            stats.duplicates += 1
+            return False
+
+        seen.add(puzzle[1])
+        stats.accepted += 1
+        batch.append(puzzle)
+        count -= 1
+        return True
+
+    def flush() -> list[Puzzle]:
+        # The batch is the caller's once yielded, see the end.
+        nonlocal batch
+        flushed, batch = batch, []
+        return flushed
+
+    if reserve is not None:
+        for puzzle in reserve.take(difficulty, count):
+            if accept(puzzle):
+                stats.from_reserve += 1
+
+            if len(batch) == batch_size:
+                yield flush()
+
+    owned = None
+    if executor is None:
+        # The workers are spawned instead of forked, a fork of the server
+        # would inherit its threads and database connections.
+        owned = executor = BoundedExecutor(
+            'generator',
+            lambda workers: concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context('spawn')),
+            workers,
+            in_flight,
+        )
+
+    try:
+        pending = set()
+
+        try:
+            while count > 0 and not (stop is not None and stop.is_set()):
+                while len(pending) < in_flight:
+                    puzzle_seed = int(seed_sequence.spawn(1)[0].generate_state(1, numpy.uint64)[0])
+                    pending.add(executor.submit(generate_targeted_puzzles, difficulty, puzzle_seed, block_size, block=True))
+
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    for grade, puzzle in future.result():
+                        stats.generated += 1
+
+                        if grade is None:
+                            print(".try_solve returned None, ignoring...")
+                            print(f"Linear notation: '{puzzle[0]}'")
+                            stats.unsolvable += 1
+                            continue
+
+                        if grade != difficulty or count == 0:
+                            stats.rejected[grade] = stats.rejected.get(grade, 0) + 1
+
+                            if reserve is not None and reserve.put(grade, puzzle):
+                                stats.reserved += 1
+
+                            continue
+
+                        if accept(puzzle) and len(batch) == batch_size:
+                            yield flush()
+
+            if batch:
+                yield flush()
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    finally:
+        if owned is not None:
+            owned.shutdown()
+
+        # Stopped by an error, the puzzles accepted and not yielded yet,
+        # maybe taken from the reserve, are given back to it.
+        if reserve is not None:
+            for puzzle in batch:
+                reserve.put(difficulty, puzzle)
@@ -0,0 +1,301 @@
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import typing
+
+from app.libs.bounded_executor import BoundedExecutor
+from app.libs.sudoku_grid import SudokuGrid, CANONICAL_MAX_BLOCK_SIZE
+from app.libs.logical_solver import get_difficulty
+
+
+FORMAT_LINEAR = 'linear'
+FORMAT_LINE = 'line'
+
+FORMATS = (FORMAT_LINEAR, FORMAT_LINE)
+
+# The reasons a line is not imported, see check_line.
+ERROR_FORMAT = 'format'
+ERROR_INVALID = 'invalid'
+ERROR_NOT_UNIQUE = 'not_unique'
+
+
+class ImportStats:
+    read: int
+    inserted: int
+    duplicates: int
+    errors: dict[str, int]
+    difficulties: dict[int, int]
+
+    """
+    Counts what happened to the lines read by import_puzzles.
+
+    ERRORS counts the lines that were skipped, by reason. DIFFICULTIES counts
+    the valid puzzles by difficulty, INSERTED and DUPLICATES are counted by
+    the caller, as the puzzles are stored.
+    """
+
+    def __init__(self) -> typing.Self:
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = {}
+        self.difficulties = {}
+
+    def __repr__(self) -> str:
+        return f'<ImportStats read={self.read} inserted={self.inserted} errors={self.errors}>'
+
+
+def parse_line(line: str) -> None | SudokuGrid:
+    """
+    Parses a puzzle in the linear notation, or in the common 81 character
+    format with the empty cells as 0 or '.'.
+    Returns None for the blank lines and the comments starting with '#'.
+    Raises ValueError if the line is neither, or if its blocks are larger
+    than CANONICAL_MAX_BLOCK_SIZE.
+    """
+
+    line = line.strip()
+
+    if not line or line.startswith('#'):
+        return None
+
+    if ':' in line:
+        grid = SudokuGrid.from_linear_notation(line)
+        if grid.block_size > CANONICAL_MAX_BLOCK_SIZE:
+            raise ValueError(f'Blocks larger than {CANONICAL_MAX_BLOCK_SIZE} can not be imported')
+        return grid
+
+    if len(line) != 81:
+        raise ValueError(f'Expected 81 characters, got {len(line)}')
+
+    return SudokuGrid.from_linear_notation('3:' + ','.join('0' if char == '.' else char for char in line))
+
+
+def format_line(grid: SudokuGrid, format: str = FORMAT_LINEAR) -> str:
+    """
+    Formats a puzzle for export, see parse_line. The 81 character format
+    only fits 9x9 grids and writes the empty cells as '.'.
+    """
+
+    if format == FORMAT_LINEAR:
+        return grid.linear_notation
+
+    if grid.block_size != 3:
+        raise ValueError('Only 9x9 grids fit in the 81 character format')
+
+    return ''.join(str(value) if value else '.' for value in grid.array.ravel().tolist())
+
+
+# A checked puzzle, as its linear notation, its difficulty, its canonical
+# hash, see SudokuGrid.canonical_hash, and its solution in binary notation.
+CheckedPuzzle = tuple[str, int, bytes, bytes]
+
+
+def check_line(line: str) -> tuple[None | CheckedPuzzle, None | str]:
+    """
+    Parses, validates and grades a puzzle, see parse_line.
+    Returns the puzzle and None, or None and the reason the puzzle was
+    rejected. Blank lines give None, None.
+    """
+
+    try:
+        grid = parse_line(line)
+    except ValueError:
+        return None, ERROR_FORMAT
+
+    if grid is None:
+        return None, None
+
+    if not grid.is_solved(only_valid=True):
+        return None, ERROR_INVALID
+
+    # A single search finds the solution and checks that it is unique.
+    solutions = list(itertools.islice(grid.generate_solutions(), 2))
+    if len(solutions) != 1:
+        return None, ERROR_NOT_UNIQUE
+
+    return (grid.linear_notation, get_difficulty(grid), grid.canonical_hash(), solutions[0].to_bytes()), None
+
+
+def check_lines(lines: list[str]) -> list[tuple[None | CheckedPuzzle, None | str]]:
+    """
+    Runs check_line on a chunk of lines, in the worker processes of
+    import_puzzles.
+    """
+
+    return [check_line(line) for line in lines]
+
+
+def read_chunks(lines: typing.Iterable[str | bytes], chunk_size: int) -> typing.Generator[list[str], None, None]:
+    """
+    Groups the lines of a file in chunks of CHUNK_SIZE, decoding them if
+    needed.
+    """
+
+    chunk = []
+
+    for line in lines:
+        chunk.append(line.decode() if isinstance(line, bytes) else line)
+
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def import_puzzles(
+        lines: typing.Iterable[str | bytes],
+        workers: None | int = None,
+        chunk_size: int = 1000,
+        stats: None | ImportStats = None,
+        executor: None | BoundedExecutor = None) -> typing.Generator[list[CheckedPuzzle], None, None]:
+
+    """
+    Checks the puzzles of LINES on WORKERS processes, every core by default,
+    see check_line. The lines are read a chunk of CHUNK_SIZE at a time, so
+    the file is never fully in memory. Yields the valid puzzles a chunk at a
+    time, as the chunks are completed. The puzzles isomorphic to one already
+    seen in the file are left out.
+
+    STATS is updated as the chunks are completed. EXECUTOR is a shared
+    BoundedExecutor of processes to check the chunks on, like the one of
+    generate_puzzles.
+    """
+
+    stats = stats or ImportStats()
+    workers = workers or os.cpu_count() or 1
+    chunks = read_chunks(lines, chunk_size)
+    in_flight = 2 * workers if executor is None else workers
+
+    seen = set()
+
+    owned = None
+    if executor is None:
+        # The workers are spawned instead of forked, see generate_puzzles.
+        owned = executor = BoundedExecutor(
+            'import',
+            lambda workers: concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context('spawn')),
+            workers,
+            in_flight,
+        )
+
+    try:
+        pending = set()
+
+        try:
+            while True:
+                for chunk in chunks:
+                    pending.add(executor.submit(check_lines, chunk, block=True))
+                    if len(pending) >= in_flight:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    puzzles = []
+
+                    for puzzle, error in future.result():
+                        if error is not None:
+                            stats.read += 1
+                            stats.errors[error] = stats.errors.get(error, 0) + 1
+                            continue
+
+                        if puzzle is None:
+                            continue
+
+                        stats.read += 1
+                        _, difficulty, canonical_hash, _ = puzzle
+
+                        if canonical_hash in seen:
+                            stats.duplicates += 1
+                            continue
+
+                        seen.add(canonical_hash)
+                        stats.difficulties[difficulty] = stats.difficulties.get(difficulty, 0) + 1
+                        puzzles.append(puzzle)
+
+                    if puzzles:
+                        yield puzzles
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    finally:
+        if owned is not None:
+            owned.shutdown()
+
+
+# A stored puzzle to grade again, as its id, its stored difficulty and its
+# binary notation, see SudokuGrid.to_bytes.
+StoredPuzzle = tuple[typing.Any, int, bytes]
+
+
+def grade_stored(puzzles: list[StoredPuzzle]) -> list[tuple[typing.Any, int, int]]:
+    """
+    Grades a chunk of stored puzzles with get_difficulty, in the worker
+    processes of regrade_puzzles. Returns the id, the stored difficulty and
+    the new one of every puzzle.
+    """
+
+    return [
+        (puzzle_id, difficulty, get_difficulty(SudokuGrid.from_bytes(bytes(puzzle_data))))
+        for puzzle_id, difficulty, puzzle_data in puzzles
+    ]
+
+
+def regrade_puzzles(
+        puzzles: typing.Iterable[StoredPuzzle],
+        workers: None | int = None,
+        chunk_size: int = 1000) -> typing.Generator[list[tuple[typing.Any, int, int]], None, None]:
+
+    """
+    Grades the stored PUZZLES again on WORKERS processes, every core by
+    default, see grade_stored. Like import_puzzles, only a few chunks of
+    CHUNK_SIZE puzzles are in flight at a time. Yields the graded chunks as
+    they are completed, not in order.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    puzzles = iter(puzzles)
+    chunks = iter(lambda: list(itertools.islice(puzzles, chunk_size)), [])
+    in_flight = 2 * workers
+
+    # The workers are spawned instead of forked, see generate_puzzles.
+    executor = BoundedExecutor(
+        'regrade',
+        lambda workers: concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context('spawn')),
+        workers,
+        in_flight,
+    )
+
+    try:
+        pending = set()
+
+        try:
+            while True:
+                for chunk in chunks:
+                    pending.add(executor.submit(grade_stored, chunk, block=True))
+                    if len(pending) >= in_flight:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    yield future.result()
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    finally:
+        executor.shutdown()
@@ -1,13 +1,272 @@
+import functools
+import hashlib
+import itertools
+import math
 import numpy
 import typing
 import random
 
+from app.libs.dancing_links import DancingLinks
+
+
+ENGINE_BACKTRACK = 'backtrack'
+ENGINE_DLX = 'dlx'
+
+# The engine used when none is given, by block size. Chosen by benchmarking
+# both engines on generated puzzles, sizes that are not listed use DLX.
+DEFAULT_ENGINES = {
+    2: ENGINE_BACKTRACK,
+}
+
+
+# The largest block size a grid can have, the candidates of a cell are held
+# in 32 bits.
+MAX_BLOCK_SIZE = 5
+
+
+def _mask_dtype(grid_size: int) -> str:
+    """
+    Returns the smallest unsigned integer dtype that can hold one bit per
+    digit of a grid.
+    """
+
+    return 'uint16' if grid_size <= 16 else 'uint32'
+
+
+def _digits(mask: int) -> typing.Generator[int, None, None]:
+    """
+    Yields the digits whose bits are set in a candidate mask, in increasing
+    order.
+    """
+
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length()
+        mask ^= lowest
+
+
+class GridTables:
+    block_size: int
+    grid_size: int
+    squares: tuple[tuple[int, int], ...]
+    block_of: numpy.ndarray
+    block_grid: numpy.ndarray
+    digit_bits: numpy.ndarray
+    units: numpy.ndarray
+    unit_squares: tuple[tuple[tuple[int, int], ...], ...]
+    cell_units: numpy.ndarray
+    peers: numpy.ndarray
+    peer_squares: dict[tuple[int, int], tuple[tuple[int, int], ...]]
+
+    """
+    Precomputed index tables of a grid size. Cells are indexed both by their
+    (row, col) square and by their flat index, row * grid_size + col.
+
+    BLOCK_OF maps a flat index to its block number, BLOCK_GRID is the same
+    table shaped as a grid.
+    DIGIT_BITS maps a cell value to its bit in a candidate mask, 0 to 0.
+    UNITS lists the flat indices of every row, then every column, then every
+    block, so unit u is row u, column u - grid_size or block
+    u - 2 * grid_size.
+    CELL_UNITS maps a flat index to its row, column and block unit numbers.
+    PEERS maps a flat index to the flat indices of every other cell sharing
+    a unit with it, without duplicates. PEER_SQUARES is the same table keyed
+    and valued by squares.
+
+    Use get_grid_tables to get the shared instance for a block size.
+    """
+
+    def __init__(self, block_size: int) -> typing.Self:
+        self.block_size = block_size
+        self.grid_size = block_size * block_size
+
+        grid_size = self.grid_size
+        flat = numpy.arange(grid_size * grid_size).reshape(grid_size, grid_size)
+        blocks = flat.reshape(block_size, block_size, block_size, block_size).transpose(0, 2, 1, 3).reshape(grid_size, grid_size)
+
+        self.squares = tuple((row_no, col_no) for row_no in range(grid_size) for col_no in range(grid_size))
+
+        self.block_of = numpy.empty(grid_size * grid_size, dtype='intp')
+        for block_no in range(grid_size):
+            self.block_of[blocks[block_no]] = block_no
+        self.block_grid = self.block_of.reshape(grid_size, grid_size)
+
+        self.digit_bits = numpy.zeros(grid_size + 1, dtype=_mask_dtype(grid_size))
+        self.digit_bits[1:] = 1 << numpy.arange(grid_size)
+
+        self.units = numpy.concatenate((flat, flat.T, blocks))
+        self.unit_squares = tuple(tuple(self.squares[index] for index in unit) for unit in self.units)
+
+        self.cell_units = numpy.stack((
+            flat.ravel() // grid_size,
+            grid_size + flat.ravel() % grid_size,
+            2 * grid_size + self.block_of,
+        ), axis=1)
+
+        self.peers = numpy.empty((grid_size * grid_size, 3 * grid_size - 2 * block_size - 1), dtype='intp')
+        for index in range(grid_size * grid_size):
+            peers = numpy.unique(self.units[self.cell_units[index]])
+            self.peers[index] = peers[peers != index]
+
+        self.peer_squares = {
+            self.squares[index]: tuple(self.squares[peer] for peer in self.peers[index])
+            for index in range(grid_size * grid_size)
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def get_grid_tables(block_size: int) -> GridTables:
+    """
+    Returns the index tables of a block size. The tables are built once and
+    shared by every grid of that size.
+    """
+
+    return GridTables(block_size)
+
+
+def get_random(rng: None | int | random.Random | numpy.random.Generator = None) -> random.Random:
+    """
+    Returns the random number generator to use for RNG.
+
+    None uses the state of the global random module, an int seeds a new
+    generator, a random.Random is used as it is and a numpy Generator seeds a
+    new generator from its stream.
+    """
+
+    # The module level functions of random are the methods of a hidden
+    # random.Random instance, so the module can stand in for one.
+    if rng is None or rng is random:
+        return random
+
+    if isinstance(rng, random.Random):
+        return rng
+
+    if isinstance(rng, numpy.random.Generator):
+        return random.Random(int(rng.integers(2 ** 63)))
+
+    return random.Random(rng)
+
+
+def spawn_seeds(seed: int, count: int) -> list[int]:
+    """
+    Derives COUNT independent seeds from SEED. The same SEED always gives
+    the same seeds, and the streams seeded with them are not correlated, so
+    they can be handed out to parallel workers.
+    """
+
+    return [int(child.generate_state(1, numpy.uint64)[0]) for child in numpy.random.SeedSequence(seed).spawn(count)]
+
+
+def _cell_bits(grid_size: int) -> int:
+    """
+    Returns the number of bits a cell takes in the binary notation, enough
+    for the values 0-grid_size. 4 bits for 9x9 grids.
+    """
+
+    return grid_size.bit_length()
+
+
+def puzzle_hash(data: bytes) -> bytes:
+    """
+    Returns the fixed length hash of a grid in binary notation, see
+    SudokuGrid.to_bytes. Used to keep the stored puzzles unique.
+    """
+
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+@functools.lru_cache(maxsize=4096)
+def bytes_to_linear_notation(data: bytes) -> str:
+    """
+    Converts a grid from the binary notation to the linear notation.
+    Cached, the same puzzles are served many times.
+    """
+
+    return SudokuGrid.from_bytes(data).linear_notation
+
+
+def linear_notation_to_bytes(linear: str) -> bytes:
+    """
+    Converts a grid from the linear notation to the binary notation.
+    """
+
+    return SudokuGrid.from_linear_notation(linear).to_bytes()
+
+
+def solve_bytes(data: bytes) -> None | bytes:
+    """
+    Solves a grid in binary notation, returns its solution in binary
+    notation, or None if it can not be solved. Only takes and returns plain
+    values, so it can run in a process pool.
+    """
+
+    solution = SudokuGrid.from_bytes(data).try_solve()
+    return None if solution is None else solution.to_bytes()
+
+
+# Grids up to this block size are canonicalized under the whole symmetry
+# group, see SudokuGrid.canonical_form.
+CANONICAL_MAX_BLOCK_SIZE = 3
+
+
+@functools.lru_cache(maxsize=None)
+def get_line_permutations(block_size: int) -> numpy.ndarray:
+    """
+    Returns the permutations of the columns, or the rows, that keep a grid
+    valid: the stacks are permuted and the columns inside every stack are
+    permuted. One permutation per row, block_size! ** (block_size + 1) rows.
+    """
+
+    block_perms = list(itertools.permutations(range(block_size)))
+
+    return numpy.array([
+        [stack * block_size + inner[stack_no][offset]
+         for stack_no, stack in enumerate(stacks)
+         for offset in range(block_size)]
+        for stacks in block_perms
+        for inner in itertools.product(block_perms, repeat=block_size)
+    ], dtype=numpy.intp)
+
+
+def _relabel(values: numpy.ndarray, labels: numpy.ndarray, next_labels: numpy.ndarray) -> numpy.ndarray:
+    """
+    Relabels the digits of many rows at once, giving the digits that were not
+    seen before the next free labels in the order they appear. LABELS maps
+    the digits of every row to their labels, 0 if they have none yet, and is
+    updated in place like NEXT_LABELS. Empty cells stay 0.
+    """
+
+    index = numpy.arange(len(values))
+    result = numpy.empty_like(values)
+
+    for col_no in range(values.shape[1]):
+        digits = values[:, col_no]
+        new = (digits > 0) & (labels[index, digits] == 0)
+        labels[index[new], digits[new]] = next_labels[new]
+        next_labels[new] += 1
+        result[:, col_no] = labels[index, digits]
+
+    return result
+
+
+def get_default_engine(block_size: int) -> str:
+    """
+    Returns the solver engine used for a block size when none is given.
+    """
+
+    return DEFAULT_ENGINES.get(block_size, ENGINE_DLX)
+
 
 class SudokuGrid:
     array: numpy.ndarray
     candidates: numpy.ndarray
+    row_masks: numpy.ndarray
+    col_masks: numpy.ndarray
+    block_masks: numpy.ndarray
     block_size: int
     grid_size: int
+    full_mask: int
+    tables: GridTables
 
     """
     Contains functions to manipulate a Sudoku grid.
@@ -15,6 +274,14 @@ class SudokuGrid:
     1-self.grid_size.
 
     grid_size = block_size * block_size
+
+    Digits are tracked as bitmasks, bit (d - 1) standing for the digit d.
+    ROW_MASKS, COL_MASKS and BLOCK_MASKS hold the digits used by every unit
+    and CANDIDATES holds the digits still available for every empty cell.
+    The masks are updated incrementally by _place and _clear. If ARRAY is
+    modified directly, generate_candidates should be called to resync them
+    before using the masks. The solve and count methods do not trust them:
+    they search a copy whose masks are rebuilt from ARRAY.
     """
 
     def __init__(self, block_size=3) -> typing.Self:
@@ -24,53 +291,106 @@ class SudokuGrid:
 
         self.block_size = block_size
         self.grid_size = self.block_size * self.block_size
+        self.tables = get_grid_tables(block_size)
+        self.full_mask = (1 << self.grid_size) - 1
         self.array = numpy.zeros((self.grid_size, self.grid_size), dtype='uint8')
-        self.candidates = numpy.zeros((self.grid_size, self.grid_size, self.grid_size), dtype='bool')
+
+        dtype = _mask_dtype(self.grid_size)
+        self.candidates = numpy.full((self.grid_size, self.grid_size), self.full_mask, dtype=dtype)
+        self.row_masks = numpy.zeros(self.grid_size, dtype=dtype)
+        self.col_masks = numpy.zeros(self.grid_size, dtype=dtype)
+        self.block_masks = numpy.zeros(self.grid_size, dtype=dtype)
 
     # -- Static methods --
     @staticmethod
-    def generate_filled(block_size: int = 3) -> typing.Self:
+    def generate_filled(
+            block_size: int = 3,
+            rng: None | int | random.Random | numpy.random.Generator = None) -> typing.Self:
+
         """
         Generate a filled valid grid.
         Can be used to generate shuffled grids or test functions.
+
+        RNG is a seed or a random number generator, see get_random.
         """
 
         grid_size = block_size * block_size
 
         numbers = list(range(grid_size))
-        random.shuffle(numbers)
+        get_random(rng).shuffle(numbers)
 
         grid = SudokuGrid(block_size)
         for row_no in range(grid_size):
             for col_no in range(grid_size):
                 grid.array[row_no, col_no] = numbers[(block_size * row_no + row_no // block_size + col_no) % grid_size] + 1
 
+        grid.generate_candidates()
+
         return grid
 
+    @staticmethod
+    def generate_random_filled(
+            block_size: int = 3,
+            rng: None | int | random.Random | numpy.random.Generator = None) -> typing.Self:
+
+        """
+        Generate a filled valid grid drawn from all of the solutions, unlike
+        generate_filled whose grids are all relabelings of the same one.
+        The blocks on the diagonal do not share a row or a column, so they are
+        filled with random permutations and the rest is solved. Gives puzzles
+        of more varied difficulty.
+
+        RNG is a seed or a random number generator, see get_random.
+        """
+
+        rng = get_random(rng)
+        grid_size = block_size * block_size
+
+        while True:
+            grid = SudokuGrid(block_size)
+
+            for block_no in range(block_size):
+                start = block_no * block_size
+                numbers = rng.sample(range(1, grid_size + 1), grid_size)
+                grid.array[start:start + block_size, start:start + block_size] = \
+                    numpy.array(numbers, dtype=grid.array.dtype).reshape(block_size, block_size)
+
+            grid.generate_candidates()
+
+            # Some of the diagonals can not be completed, for small grids.
+            solution = grid.try_solve()
+            if solution is not None:
+                return solution
+
     @staticmethod
     def generate_non_unique_puzzle(
             block_size: int = 3,
-            empty: int = 40) -> typing.Self:
+            empty: int = 40,
+            rng: None | int | random.Random | numpy.random.Generator = None) -> typing.Self:
 
         """
         Generate an unsolved grid that may or may not have a unique solution.
 
         EMPTY determines how many empty squares should the grid have.
+        RNG is a seed or a random number generator, see get_random.
         """
 
-        grid = SudokuGrid.generate_filled(block_size)
+        rng = get_random(rng)
+        grid = SudokuGrid.generate_filled(block_size, rng)
 
         # Select the first EMPTY items of the random squares list and clear the
         # squares.
-        for square in SudokuGrid.generate_shuffled_squares(block_size)[:empty]:
-            grid.array[square] = 0
+        for square in SudokuGrid.generate_shuffled_squares(block_size, rng)[:empty]:
+            grid._clear(square)
 
         return grid
 
     @staticmethod
     def generate_unique_puzzle(
             block_size: int = 3,
-            max_empty: int = -1) -> typing.Self:
+            max_empty: int = -1,
+            engine: None | str = None,
+            rng: None | int | random.Random | numpy.random.Generator = None) -> typing.Self:
 
         """
         Generate an unsolved grid that has a single unique solution.
@@ -79,100 +399,162 @@ class SudokuGrid:
         This argument can be used to make sure than the algorithm does not take
         ages to generate a board. Using -1 will cause the generate to generate
         as much empty cells as possible.
+
+        ENGINE is the solver engine used to check the uniqueness, see
+        try_solve.
+        RNG is a seed or a random number generator, see get_random. The same
+        seed always generates the same puzzle.
         """
 
-        grid = SudokuGrid.generate_filled(block_size)
+        rng = get_random(rng)
+        grid = SudokuGrid.generate_random_filled(block_size, rng)
 
-        squares = SudokuGrid.generate_shuffled_squares(block_size)
+        squares = SudokuGrid.generate_shuffled_squares(block_size, rng)
 
         for square in squares:
             if max_empty == 0:
                 break
 
-            old_value = grid.array[square]
+            old_value = int(grid.array[square])
 
             # Remove a square and check if the puzzle still has a unique
-            # solution.
-            grid.array[square] = 0
-            grid.generate_candidates()
-            solutions = grid.try_solve_ms()
-
-            # If there are no solutions, we know something went terribly wrong.
-            assert solutions != 0, 'no solutions found?'
-
-            if solutions == 2:
-                grid.array[square] = old_value
+            # solution. The puzzle had a unique solution before, the filled
+            # grid, so any other solution has to put another value on the
+            # removed square. The masks are kept up to date by _clear and
+            # _place, so nothing is regenerated between the squares.
+            grid._clear(square)
+
+            if grid._has_other_solution(square, old_value, engine):
+                grid._place(square, old_value)
             else:
                 max_empty -= 1
 
-        grid.generate_candidates()
-
         return grid
 
+    @staticmethod
+    def generate_batch(
+            seed: int,
+            count: int,
+            block_size: int = 3,
+            max_empty: int = -1,
+            engine: None | str = None) -> list[typing.Self]:
+
+        """
+        Generate COUNT unique puzzles, see generate_unique_puzzle.
+        The same SEED always generates the same puzzles. Every puzzle is
+        generated from its own seed, derived with spawn_seeds, so a batch can
+        be split between workers and still give the same puzzles.
+        """
+
+        return [
+            SudokuGrid.generate_unique_puzzle(block_size, max_empty, engine, puzzle_seed)
+            for puzzle_seed in spawn_seeds(seed, count)
+        ]
+
     @staticmethod
     def generate_squares(block_size: int = 3) -> [(int, int)]:
         """
         Generate a list of squares in increasing order.
         """
 
-        grid_size = block_size * block_size
-        return ((row_no, col_no) for row_no in range(grid_size) for col_no in range(grid_size))
+        return iter(get_grid_tables(block_size).squares)
 
     @staticmethod
-    def generate_shuffled_squares(block_size: int = 3) -> [(int, int)]:
+    def generate_shuffled_squares(
+            block_size: int = 3,
+            rng: None | int | random.Random | numpy.random.Generator = None) -> [(int, int)]:
+
         """
         Generate a list of squares in random order.
+        RNG is a seed or a random number generator, see get_random.
         """
 
         squares = list(SudokuGrid.generate_squares(block_size))
-        random.shuffle(squares)
+        get_random(rng).shuffle(squares)
         return squares
 
     @staticmethod
     def from_linear_notation(linear: str) -> typing.Self:
         """
-        Generate a Grid object from a linear notation string
+        Generate a Grid object from a linear notation string.
+        Raises ValueError if the block size or a value is out of range.
         """
 
         block_size, linear = linear.split(":", 1)
         block_size = int(block_size)
-        grid_size = block_size * block_size
-        linear = linear.split(",")
+        if not 1 <= block_size <= MAX_BLOCK_SIZE:
+            raise ValueError(f'Block size {block_size} is not between 1 and {MAX_BLOCK_SIZE}')
 
-        grid = SudokuGrid(int(block_size))
+        grid_size = block_size * block_size
+        values = numpy.array(linear.split(","), dtype=numpy.int64)
+        if values.size != grid_size * grid_size:
+            raise ValueError(f'Expected {grid_size * grid_size} values, got {values.size}')
+        if values.min() < 0 or values.max() > grid_size:
+            raise ValueError(f'Values must be between 0 and {grid_size}')
 
-        for row_no in range(grid.grid_size):
-            for col_no in range(grid.grid_size):
-                grid.array[row_no, col_no] = int(linear[row_no * grid_size + col_no])
+        grid = SudokuGrid(block_size)
+        grid.array[:] = values.reshape(grid_size, grid_size)
+        grid.generate_candidates()
 
         return grid
 
     @staticmethod
-    def get_adjacent_squares(
-            square: (int, int),
-            block_size: int) -> typing.Generator[tuple[int, int], None, None]:
-
+    def from_bytes(data: bytes) -> typing.Self:
         """
-        Return the list of adjacent squares.
+        Generate a Grid object from the binary notation, see to_bytes.
         """
 
+        block_size = data[0]
         grid_size = block_size * block_size
-        row_no, col_no = square
+        cell_bits = _cell_bits(grid_size)
+        cell_count = grid_size * grid_size
+
+        bits = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8, offset=1))[:cell_count * cell_bits]
+        weights = numpy.left_shift(1, numpy.arange(cell_bits - 1, -1, -1))
+
+        grid = SudokuGrid(block_size)
+        grid.array[:] = (bits.reshape(cell_count, cell_bits) @ weights).reshape(grid_size, grid_size)
+        grid.generate_candidates()
+
+        return grid
+
+    @staticmethod
+    def is_solved_batch(arrays: numpy.ndarray, only_valid: bool = False) -> numpy.ndarray:
+        """
+        Checks if many grids of the same size are solved at once, see
+        is_solved. ARRAYS has the shape (count, grid_size, grid_size).
+        Returns a boolean array with one element per grid.
+        """
 
-        # Check for the values in the row.
-        for new_col_no in range(grid_size):
-            yield row_no, new_col_no
+        arrays = numpy.asarray(arrays)
+        count, grid_size, _ = arrays.shape
+        block_size = math.isqrt(grid_size)
 
-        # Check for the values in the column.
-        for new_row_no in range(grid_size):
-            yield new_row_no, col_no
+        # Lay every row, column and block of every grid out as a row of UNITS.
+        blocks = arrays.reshape(count, block_size, block_size, block_size, block_size)
+        blocks = blocks.transpose(0, 1, 3, 2, 4).reshape(count, grid_size, grid_size)
+        units = numpy.concatenate((arrays, arrays.transpose(0, 2, 1), blocks), axis=1)
+        units.sort(axis=2)
 
-        # Check for the values in the block.
-        for new_row_no in range(row_no // block_size * block_size,
-                                row_no // block_size * block_size + block_size):
-            for new_col_no in range(col_no // block_size * block_size,
-                                    col_no // block_size * block_size + block_size):
-                yield new_row_no, new_col_no
+        if not only_valid:
+            # A sorted unit of a solved grid holds every digit exactly once.
+            return (units == numpy.arange(1, grid_size + 1, dtype=units.dtype)).all(axis=(1, 2))
+
+        # The numbers other than zero may not repeat in a sorted unit.
+        repeated = (units[:, :, 1:] == units[:, :, :-1]) & (units[:, :, 1:] != 0)
+        return ~repeated.any(axis=(1, 2))
+
+    @staticmethod
+    def get_adjacent_squares(
+            square: (int, int),
+            block_size: int) -> tuple[tuple[int, int], ...]:
+
+        """
+        Return the list of adjacent squares, the squares that share a row,
+        column or block with SQUARE. SQUARE itself is not included.
+        """
+
+        return get_grid_tables(block_size).peer_squares[square]
 
     # -- ~*~Magic~*~ methods --
     def __repr__(self) -> str:
@@ -206,6 +588,10 @@ class SudokuGrid:
 
         self.array[[a, b], :] = self.array[[b, a], :]
         self.candidates[[a, b], :] = self.candidates[[b, a], :]
+        self.row_masks[[a, b]] = self.row_masks[[b, a]]
+
+        if a // self.block_size != b // self.block_size:
+            self._generate_unit_masks()
 
     def _swap_cols(self, a: int, b: int) -> None:
         """
@@ -216,6 +602,46 @@ class SudokuGrid:
 
         self.array[:, [a, b]] = self.array[:, [b, a]]
         self.candidates[:, [a, b]] = self.candidates[:, [b, a]]
+        self.col_masks[[a, b]] = self.col_masks[[b, a]]
+
+        if a // self.block_size != b // self.block_size:
+            self._generate_unit_masks()
+
+    def _generate_unit_masks(self) -> None:
+        """
+        Regenerates the row, column and block masks from the grid, in place.
+        """
+
+        bits = self.tables.digit_bits[self.array]
+
+        numpy.bitwise_or.reduce(bits, axis=1, out=self.row_masks)
+        numpy.bitwise_or.reduce(bits, axis=0, out=self.col_masks)
+        numpy.bitwise_or.reduce(
+            bits.reshape(self.block_size, self.block_size, self.block_size, self.block_size),
+            axis=(1, 3),
+            out=self.block_masks.reshape(self.block_size, self.block_size))
+
+    def _get_block_no(self, square: (int, int)) -> int:
+        """
+        Returns the index of the block a square belongs to, counting the
+        blocks in row-major order.
+        """
+
+        row_no, col_no = square
+        return self.tables.block_of[row_no * self.grid_size + col_no]
+
+    def _get_available_mask(self, square: (int, int)) -> int:
+        """
+        Returns the bitmask of all available values for a square.
+        Checks for the immediate consequences.
+
+        NOTE: The square should be empty.
+        """
+
+        row_no, col_no = square
+        used = int(self.row_masks[row_no]) | int(self.col_masks[col_no]) | int(self.block_masks[self._get_block_no(square)])
+
+        return self.full_mask & ~used
 
     def _is_available(self, square: (int, int), number: int) -> bool:
         """
@@ -226,12 +652,7 @@ class SudokuGrid:
         NOTE: The square should be empty.
         """
 
-        # Check for all of the adjacent cells.
-        for adjacent in SudokuGrid.get_adjacent_squares(square, self.block_size):
-            if self.array[adjacent] == number:
-                return False
-
-        return True
+        return bool(self._get_available_mask(square) >> (number - 1) & 1)
 
     def _get_available(self, square: (int, int)) -> set[int]:
         """
@@ -241,24 +662,272 @@ class SudokuGrid:
         NOTE: The square should be empty.
         """
 
-        available = {i + 1 for i in range(self.grid_size) if self._is_available(square, i + 1)}
-
-        return available
+        return set(_digits(int(self.candidates[square])))
 
-    def _update_candidates(self, square: typing.Tuple[int, int]) -> int:
+    def _update_candidates(self, square: typing.Tuple[int, int]) -> list[tuple[int, int]]:
         """
-        Updates the candidates table after a square has been altered.
+        Updates the masks after a square has been filled.
+        Returns the adjacent squares the value was removed from.
         """
 
-        value = self.array[square]
+        value = int(self.array[square])
 
         assert value > 0, "square should contain something"
 
-        for adjacent in SudokuGrid.get_adjacent_squares(square, self.block_size):
+        bit = 1 << (value - 1)
+        row_no, col_no = square
+        candidates = self.candidates
+        updated = []
+
+        self.row_masks[row_no] |= bit
+        self.col_masks[col_no] |= bit
+        self.block_masks[self._get_block_no(square)] |= bit
+        candidates[square] = 0
+
+        # Filled squares have no candidates, so they are skipped too.
+        for adjacent in self.tables.peer_squares[square]:
+            available = int(candidates[adjacent])
+
+            if available & bit:
+                candidates[adjacent] = available ^ bit
+                updated.append(adjacent)
+
+        return updated
+
+    def _place(self, square: (int, int), value: int, trail: None | list = None) -> None:
+        """
+        Fills an empty square and updates the masks.
+        If TRAIL is given, records what changed on it so that _undo can
+        revert it.
+        """
+
+        available = int(self.candidates[square])
+
+        self.array[square] = value
+        updated = self._update_candidates(square)
+
+        if trail is not None:
+            trail.append((square, available, updated))
+
+    def _undo(self, trail: list, mark: int) -> None:
+        """
+        Reverts the calls to _place recorded on TRAIL since it had MARK
+        entries, in the reverse order.
+        """
+
+        while len(trail) > mark:
+            square, available, updated = trail.pop()
+
+            bit = 1 << (int(self.array[square]) - 1)
+            row_no, col_no = square
+
+            self.array[square] = 0
+            self.row_masks[row_no] &= self.full_mask ^ bit
+            self.col_masks[col_no] &= self.full_mask ^ bit
+            self.block_masks[self._get_block_no(square)] &= self.full_mask ^ bit
+            self.candidates[square] = available
+
+            for adjacent in updated:
+                self.candidates[adjacent] |= bit
+
+    def _clear(self, square: (int, int)) -> None:
+        """
+        Empties a filled square and updates the masks.
+        """
+
+        bit = 1 << (int(self.array[square]) - 1)
+        row_no, col_no = square
+
+        self.array[square] = 0
+        self.row_masks[row_no] &= self.full_mask ^ bit
+        self.col_masks[col_no] &= self.full_mask ^ bit
+        self.block_masks[self._get_block_no(square)] &= self.full_mask ^ bit
+        self.candidates[square] = self._get_available_mask(square)
+
+        # The removed digit may become available again in the adjacent
+        # squares, unless it is still used by one of their other units.
+        for adjacent in self.tables.peer_squares[square]:
             if self.array[adjacent] != 0:
                 continue
 
-            self.candidates[*adjacent, value - 1] = False
+            self.candidates[adjacent] = self._get_available_mask(adjacent)
+
+    def _to_exact_cover(self) -> tuple[DancingLinks, list[int]]:
+        """
+        Generates the exact cover matrix of the empty squares of the grid.
+
+        The columns are the constraints the filled squares do not satisfy
+        yet: every empty square needs a value, and every row, column and
+        block needs each of its missing digits once. There is a row for every
+        candidate of every empty square, so the candidates restrict the
+        matrix.
+        Returns the matrix and the list mapping its rows to placements,
+        index * grid_size + digit - 1 placing DIGIT on the square with the
+        flat index INDEX.
+        """
+
+        grid_size = self.grid_size
+        cell_count = grid_size * grid_size
+
+        if not self.is_solved(only_valid=True):
+            # The filled squares already break the rules, use a matrix with
+            # a column no row can cover.
+            return DancingLinks(1, []), []
+
+        empty = numpy.flatnonzero(self.array == 0).tolist()
+        candidates = self.candidates.ravel().tolist()
+        block_of = self.tables.block_of.tolist()
+
+        # Number the columns of the unsatisfied constraints. Columns no row
+        # covers have to be there too, to make the matrix unsolvable.
+        columns = {index: column for column, index in enumerate(empty)}
+        for offset, masks in enumerate((self.row_masks, self.col_masks, self.block_masks)):
+            for unit_no, mask in enumerate(masks.tolist()):
+                for digit in _digits(self.full_mask ^ mask):
+                    columns[(offset + 1) * cell_count + unit_no * grid_size + digit - 1] = len(columns)
+
+        rows = []
+        row_ids = []
+        for index in empty:
+            row_no, col_no = divmod(index, grid_size)
+
+            for digit in _digits(candidates[index]):
+                rows.append([
+                    columns[index],
+                    columns[cell_count + row_no * grid_size + digit - 1],
+                    columns[2 * cell_count + col_no * grid_size + digit - 1],
+                    columns[3 * cell_count + block_of[index] * grid_size + digit - 1],
+                ])
+                row_ids.append(index * grid_size + digit - 1)
+
+        return DancingLinks(len(columns), rows), row_ids
+
+    def _from_exact_cover(self, rows: list[int], row_ids: list[int]) -> typing.Self:
+        """
+        Generates a solved grid from an exact cover solution of the grid.
+        """
+
+        grid = SudokuGrid(self.block_size)
+        grid.array = self.array.copy()
+
+        for row in rows:
+            index, digit = divmod(row_ids[row], self.grid_size)
+            grid.array.flat[index] = digit + 1
+
+        grid.generate_candidates()
+
+        return grid
+
+    def _synced_copy(self) -> typing.Self:
+        """
+        Generates a copy of the grid with the masks rebuilt from the array,
+        for the solvers, which trust the masks.
+        """
+
+        grid = SudokuGrid(self.block_size)
+        grid.array = self.array.copy()
+        grid.generate_candidates()
+
+        return grid
+
+    def _has_conflicts(self) -> bool:
+        """
+        Checks if a digit is given twice in a row, a column or a block, from
+        the array alone: a unit without repeated digits has as many digits in
+        its mask as filled squares.
+        """
+
+        values = self.array.ravel()[self.tables.units]
+        masks = numpy.bitwise_or.reduce(self.tables.digit_bits[values], axis=1)
+
+        return bool((numpy.bitwise_count(masks) != numpy.count_nonzero(values, axis=1)).any())
+
+    def _search(self, limit: int) -> tuple[int, None | numpy.ndarray]:
+        """
+        Backtracking engine of try_solve and try_solve_ms.
+        Searches for solutions in place, on an explicit stack instead of
+        recursing. Every change is recorded on a trail and reverted when the
+        search backtracks over it, so the memory use does not depend on the
+        depth of the search.
+        Stops at LIMIT solutions. Returns the number of solutions found and
+        the array of the first one. The grid is left as it was.
+        A grid whose givens conflict has no solution, like for the DLX
+        engine, which has no row for a digit already used by a unit.
+        """
+
+        if self._has_conflicts():
+            return 0, None
+
+        trail = []
+        # Every frame is a guessed square, the mask of the digits not tried
+        # on it yet and the length of the trail before the guess.
+        stack = []
+        total = 0
+        solution = None
+
+        consistent = self.solve_all_single_candidate(trail) >= 0
+
+        while True:
+            if consistent:
+                _, lowest_entropy_squares = self.get_lowest_entropy_squares()
+
+                if lowest_entropy_squares:
+                    square = lowest_entropy_squares.pop()
+                    stack.append([square, int(self.candidates[square]), len(trail)])
+                else:
+                    total += 1
+                    if solution is None:
+                        solution = self.array.copy()
+                    if total == limit:
+                        break
+
+            # Roll back to the deepest guess that still has digits to try.
+            while stack:
+                square, remaining, mark = stack[-1]
+                self._undo(trail, mark)
+
+                if remaining:
+                    break
+
+                stack.pop()
+            else:
+                break
+
+            digit = remaining & -remaining
+            stack[-1][1] = remaining ^ digit
+
+            self._place(square, digit.bit_length(), trail)
+            consistent = self.solve_all_single_candidate(trail) >= 0
+
+        self._undo(trail, 0)
+
+        return total, solution
+
+    def _has_other_solution(self, square: (int, int), value: int, engine: None | str = None) -> bool:
+        """
+        Checks if the grid has a solution where the empty SQUARE is not
+        VALUE. Stops at the first one found.
+        ENGINE selects the solver, see try_solve.
+        """
+
+        bit = 1 << (value - 1)
+        available = int(self.candidates[square])
+
+        if not available & ~bit:
+            return False
+
+        # Take VALUE out of the candidates of the square while searching,
+        # every other square keeps the state left by the previous removals.
+        self.candidates[square] = available & ~bit
+        try:
+            if (engine or get_default_engine(self.block_size)) == ENGINE_BACKTRACK:
+                # _search leaves the grid as it found it.
+                return self._search(1)[0] > 0
+
+            matrix, _ = self._to_exact_cover()
+            return matrix.find_first() is not None
+        finally:
+            self.candidates[square] = available
 
     # -- Public methods --
     def copy(self) -> typing.Self:
@@ -269,29 +938,35 @@ class SudokuGrid:
         obj = SudokuGrid(self.block_size)
         obj.array = self.array.copy()
         obj.candidates = self.candidates.copy()
+        obj.row_masks = self.row_masks.copy()
+        obj.col_masks = self.col_masks.copy()
+        obj.block_masks = self.block_masks.copy()
         return obj
 
-    def shuffle(self) -> None:
+    def shuffle(self, rng: None | int | random.Random | numpy.random.Generator = None) -> None:
         """
         Shuffles the rows and columns of the grid to generate a (almost) random
         board.
+        RNG is a seed or a random number generator, see get_random.
         """
 
+        rng = get_random(rng)
+
         # Shuffle the rows inside blocks.
         for row_block_no in range(self.block_size):
             for row_no in range(row_block_no * self.block_size, row_block_no * self.block_size + self.block_size):
-                chosen_one = random.randrange(row_block_no * self.block_size, row_block_no * self.block_size + self.block_size)
+                chosen_one = rng.randrange(row_block_no * self.block_size, row_block_no * self.block_size + self.block_size)
                 self._swap_rows(row_no, chosen_one)
 
         # Shuffle the columns inside blocks.
         for col_block_no in range(self.block_size):
             for col_no in range(col_block_no * self.block_size, col_block_no * self.block_size + self.block_size):
-                chosen_one = random.randrange(col_block_no * self.block_size, col_block_no * self.block_size + self.block_size)
+                chosen_one = rng.randrange(col_block_no * self.block_size, col_block_no * self.block_size + self.block_size)
                 self._swap_cols(col_no, chosen_one)
 
         # Shuffle the row blocks.
         for row_block_no in range(self.block_size):
-            chosen_one = random.randrange(0, self.block_size)
+            chosen_one = rng.randrange(0, self.block_size)
             for i in range(self.block_size):
                 row_no = row_block_no * self.block_size + i
                 new_row_no = chosen_one * self.block_size + i
@@ -299,7 +974,7 @@ class SudokuGrid:
 
         # Shuffle the column blocks.
         for col_block_no in range(self.block_size):
-            chosen_one = random.randrange(0, self.block_size)
+            chosen_one = rng.randrange(0, self.block_size)
             for i in range(self.block_size):
                 col_no = col_block_no * self.block_size + i
                 new_col_no = chosen_one * self.block_size + i
@@ -312,46 +987,121 @@ class SudokuGrid:
         If ONLY_VALID is True, does not check for the empty squares.
         """
 
-        # Check for the rows.
-        for row_no in range(self.grid_size):
-            seen = set()
-            for col_no in range(self.grid_size):
-                number = self.array[row_no][col_no]
+        return bool(SudokuGrid.is_solved_batch(self.array[numpy.newaxis], only_valid)[0])
 
-                if (not only_valid and number == 0) or number in seen:
-                    return False
+    def to_bytes(self) -> bytes:
+        """
+        Returns the binary notation for the sudoku board: a byte for the block
+        size, followed by the cells row by row, packed on as few bits as the
+        values need. A 9x9 grid takes 4 bits a cell, 42 bytes in total.
+        """
 
-                if number != 0:
-                    seen.add(number)
+        cell_bits = _cell_bits(self.grid_size)
+        shifts = numpy.arange(cell_bits - 1, -1, -1, dtype=numpy.uint8)
+        bits = (self.array.reshape(-1, 1) >> shifts) & 1
 
-        # Check for the columns.
-        for col_no in range(self.grid_size):
-            seen = set()
-            for row_no in range(self.grid_size):
-                number = self.array[row_no][col_no]
+        return bytes([self.block_size]) + numpy.packbits(bits.ravel()).tobytes()
 
-                if (not only_valid and number == 0) or number in seen:
-                    return False
+    def canonical_form(self) -> typing.Self:
+        """
+        Returns the representative of the grid under the Sudoku symmetries:
+        transposition, the permutations of the bands and of the rows inside
+        them, the same for the stacks and the columns, and the relabeling of
+        the digits. Isomorphic grids, like the ones shuffle gives, have the
+        same canonical form. It is the grid with the lexicographically
+        smallest rows, the digits labeled in the order they first appear.
+
+        The rows of the result are chosen one at a time, keeping only the
+        transformations that give the smallest rows so far. All of them are
+        tried at once with numpy, for every column permutation.
+
+        Grids with blocks larger than CANONICAL_MAX_BLOCK_SIZE have too many
+        column permutations, only transposition and relabeling are used for
+        them.
+        """
 
-                if number != 0:
-                    seen.add(number)
+        grid_size = self.grid_size
+        grids = numpy.stack([self.array, self.array.T])
 
-        # Check for the blocks.
-        for row_block_no in range(self.block_size):
-            for col_block_no in range(self.block_size):
-                seen = set()
-                for row_no in range(row_block_no * self.block_size, row_block_no * self.block_size + self.block_size):
-                    for col_no in range(col_block_no * self.block_size, col_block_no * self.block_size + self.block_size):
-                        number = self.array[row_no][col_no]
+        if self.block_size > CANONICAL_MAX_BLOCK_SIZE:
+            flat = grids.reshape(2, -1)
+            labels = _relabel(flat, numpy.zeros((2, grid_size + 1), dtype=flat.dtype), numpy.ones(2, dtype=flat.dtype))
+            best = min(range(2), key=lambda transposed: labels[transposed].tolist())
 
-                        if (not only_valid and number == 0) or number in seen:
-                            return False
+            grid = SudokuGrid(self.block_size)
+            grid.array[:] = labels[best].reshape(grid_size, grid_size)
+            grid.generate_candidates()
+            return grid
+
+        col_perms = get_line_permutations(self.block_size)
+        band_of = numpy.arange(grid_size) // self.block_size
 
-                        if number != 0:
-                            seen.add(number)
+        # The transformations still in the race, as the transposition, the
+        # column permutation, the rows used, the bands used, the band of the
+        # last row and the labels of the digits.
+        transposed = numpy.repeat(numpy.arange(2), len(col_perms))
+        col_perm = numpy.tile(numpy.arange(len(col_perms)), 2)
+        used_rows = numpy.zeros(len(col_perm), dtype=numpy.int64)
+        used_bands = numpy.zeros(len(col_perm), dtype=numpy.int64)
+        last_band = numpy.zeros(len(col_perm), dtype=numpy.intp)
+        labels = numpy.zeros((len(col_perm), grid_size + 1), dtype=self.array.dtype)
+        next_labels = numpy.ones(len(col_perm), dtype=self.array.dtype)
 
-        # All checks succeeded, return True.
-        return True
+        result = numpy.empty((grid_size, grid_size), dtype=self.array.dtype)
+
+        for row_no in range(grid_size):
+            # Every transformation continues with every row it may put next:
+            # a row of an unused band at the start of a band, else an unused
+            # row of the same band.
+            choices = []
+            for source_row in range(grid_size):
+                if row_no % self.block_size == 0:
+                    allowed = (used_bands >> band_of[source_row]) & 1 == 0
+                else:
+                    allowed = (last_band == band_of[source_row]) & ((used_rows >> source_row) & 1 == 0)
+
+                choices.append(numpy.nonzero(allowed)[0])
+
+            parents = numpy.concatenate(choices)
+            rows = numpy.repeat(numpy.arange(grid_size), [len(choice) for choice in choices])
+
+            values = numpy.take_along_axis(grids[transposed[parents], rows], col_perms[col_perm[parents]], axis=1)
+            row_labels = labels[parents]
+            row_next_labels = next_labels[parents]
+            values = _relabel(values, row_labels, row_next_labels)
+
+            # Keep the transformations giving the smallest row.
+            keys = numpy.zeros(len(values), dtype=numpy.int64)
+            for col_no in range(grid_size):
+                keys = keys * (grid_size + 1) + values[:, col_no]
+            best = numpy.nonzero(keys == keys.min())[0]
+
+            result[row_no] = values[best[0]]
+
+            rows = rows[best]
+            parents = parents[best]
+            transposed = transposed[parents]
+            col_perm = col_perm[parents]
+            used_rows = used_rows[parents] | (1 << rows)
+            used_bands = used_bands[parents] | (1 << band_of[rows])
+            last_band = band_of[rows]
+            labels = row_labels[best]
+            next_labels = row_next_labels[best]
+
+        grid = SudokuGrid(self.block_size)
+        grid.array[:] = result
+        grid.generate_candidates()
+        return grid
+
+    def canonical_hash(self) -> bytes:
+        """
+        Returns the hash of the canonical form, the same for all of the
+        isomorphic grids. Used to keep the stored puzzles unique, and can be
+        used as the cache key of results that do not change under the
+        symmetries, like the number of solutions or the difficulty.
+        """
+
+        return puzzle_hash(self.canonical_form().to_bytes())
 
     def generate_empty_cells(self) -> typing.Generator[tuple[int, int], None, None]:
         """
@@ -378,79 +1128,65 @@ class SudokuGrid:
         Generates the list of squares that has the lowest amount of entropy.
         """
 
-        lowest_entropy = self.grid_size
-        lowest_entropy_squares = set()
+        empty = self.array == 0
 
-        # Find the lowest entropy squares.
-        for square in self.generate_empty_cells():
-            available = self._get_available(square)
-
-            if len(available) > lowest_entropy:
-                continue
+        if not empty.any():
+            return self.grid_size, set()
 
-            if len(available) < lowest_entropy:
-                lowest_entropy = len(available)
-                lowest_entropy_squares.clear()
-
-            lowest_entropy_squares.add(square)
+        # Find the lowest entropy squares.
+        entropy = numpy.bitwise_count(self.candidates)
+        lowest_entropy = int(entropy[empty].min())
+        row_nos, col_nos = numpy.nonzero(empty & (entropy == lowest_entropy))
 
-        return lowest_entropy, lowest_entropy_squares
+        return lowest_entropy, set(zip(row_nos.tolist(), col_nos.tolist()))
 
     def generate_candidates(self) -> numpy.ndarray:
         """
-        Generates the candidates array.
+        Generates the candidates array and the unit masks from the grid.
+        The existing arrays are reused, no new grid sized arrays are kept.
         """
 
-        self.candidates = numpy.zeros((self.grid_size, self.grid_size, self.grid_size), dtype='bool')
+        self._generate_unit_masks()
 
-        for square in self.generate_empty_cells():
-            if self.array[square] != 0:
-                continue
+        # Every digit used by the row, the column or the block of an empty
+        # square is not a candidate of it, filled squares have no candidates.
+        numpy.bitwise_or(self.row_masks[:, numpy.newaxis], self.col_masks[numpy.newaxis, :], out=self.candidates)
+        numpy.bitwise_or(self.candidates, self.block_masks[self.tables.block_grid], out=self.candidates)
+        numpy.bitwise_xor(self.candidates, self.full_mask, out=self.candidates)
+        numpy.copyto(self.candidates, 0, where=self.array != 0)
 
-            for avail in self._get_available(square):
-                self.candidates[*square, avail - 1] = True
+        return self.candidates
 
-    def try_solve(self) -> None | typing.Self:
+    def try_solve(self, engine: None | str = None) -> None | typing.Self:
         """
-        Tries to solve a grid using backtracking.
+        Tries to solve a grid.
         If the grid is not completely filled and can not be solved, will
-        return None and will try to solve some of the grid.
+        return None.
         If the grid is not completely filled and can be solved, will return
         the solution.
 
-        NOTE: If the grid is completely filled but not solved, will still
-              return a half solution.
+        ENGINE selects the solver, ENGINE_BACKTRACK or ENGINE_DLX. If it is
+        None, the default engine of the block size is used.
         """
 
-        copy = self.copy()
-
-        if copy.solve_all_single_candidate() < 0:
-            return None
-
-        _, lowest_entropy_squares = copy.get_lowest_entropy_squares()
-        if not lowest_entropy_squares:
-            return copy
-
-        square = lowest_entropy_squares.pop()
-
-        for available in copy._get_available(square):
-            candidates_copy = copy.candidates.copy()
-            copy.array[square] = available
-            copy._update_candidates(square)
-
-            solution = copy.try_solve()
+        if (engine or get_default_engine(self.block_size)) == ENGINE_BACKTRACK:
+            total, solution = self._synced_copy()._search(1)
+            if not total:
+                return None
 
-            if solution is not None:
-                return solution
-
-            copy.array[square] = 0
-            copy.candidates = candidates_copy
+            grid = SudokuGrid(self.block_size)
+            grid.array = solution
+            grid.generate_candidates()
+            return grid
 
-        return None
+        grid = self._synced_copy()
+        matrix, row_ids = grid._to_exact_cover()
+        rows = matrix.find_first()
+        return None if rows is None else grid._from_exact_cover(rows, row_ids)
 
-    def try_solve_ms(self) -> int:
+    def try_solve_ms(self, engine: None | str = None) -> int:
         """
-        Tries to solve a grid using backtracking.
+        Tries to solve a grid.
         Will not alter the grid.
         If the grid is not completely filled and can not be solved, will
         return 0.
@@ -459,86 +1195,84 @@ class SudokuGrid:
         If the grid is not completely filled and more than one solutions, will
         return 2.
 
-        NOTE: If the grid is completely filled, will return 1 no matter the
-              number of solutions.
+        ENGINE selects the solver, see try_solve.
         """
 
-        copy = self.copy()
-
-        if copy.solve_all_single_candidate() < 0:
-            return 0
+        if (engine or get_default_engine(self.block_size)) == ENGINE_BACKTRACK:
+            return self._synced_copy()._search(2)[0]
 
-        _, lowest_entropy_squares = copy.get_lowest_entropy_squares()
-        if not lowest_entropy_squares:
-            return True
+        return self.count_solutions(2)
 
-        square = lowest_entropy_squares.pop()
-        found_one_solution = False
-
-        for available in copy._get_available(square):
-            candidates_copy = copy.candidates.copy()
-            copy.array[square] = available
-            copy._update_candidates(square)
-
-            solutions = copy.try_solve_ms()
+    def count_solutions(self, limit: int = -1) -> int:
+        """
+        Counts the solutions of the grid using the DLX engine.
+        Stops at LIMIT solutions, unless it is -1.
+        """
 
-            copy.array[square] = 0
-            copy.candidates = candidates_copy
+        return self._synced_copy()._to_exact_cover()[0].count(limit)
 
-            if solutions == 1 and found_one_solution or solutions == 2:
-                return 2
+    def generate_solutions(self) -> typing.Generator[typing.Self, None, None]:
+        """
+        Returns the list of all of the solutions of the grid, using the DLX
+        engine.
+        """
 
-            if solutions == 1:
-                found_one_solution = True
+        grid = self._synced_copy()
+        matrix, row_ids = grid._to_exact_cover()
+        return (grid._from_exact_cover(rows, row_ids) for rows in matrix.enumerate())
 
-        return 1 if found_one_solution else 0
+    def try_solve_classify(
+            self,
+            solution: numpy.ndarray,
+            rng: None | int | random.Random | numpy.random.Generator = None) -> int:
 
-    def try_solve_classify(self, solution: numpy.ndarray) -> int:
         """
         Tries to solve and classify a grid.
         Returns the difficulty level of a grid.
         The difficulty is calculated by counting the number of required
         assumptions on average to solve.
+        RNG is a seed or a random number generator, see get_random.
         """
 
-        copy = self.copy()
-
-        # Try to solve all of the single candidate solutions, if there are no
-        # possible solutions return immediately.
-        if copy.solve_all_single_candidate() < 0:
-            return -1
-
-        lowest_entropy, lowest_entropy_squares = copy.get_lowest_entropy_squares()
-
-        if not lowest_entropy_squares:
-            return 0
-
-        # After a call to solve_all_single_candidate, the lowest entropy can not be 0 or 1.
-        assert lowest_entropy >= 2
+        rng = get_random(rng)
+        copy = self._synced_copy()
+        assumptions = 0
 
-        # Start making assumptions on one of the lowest entropy squares.
-        square = random.choice(list(lowest_entropy_squares))
-        copy_copy = copy.copy()
+        while True:
+            # Try to solve all of the single candidate solutions, if there are
+            # no possible solutions return immediately.
+            if copy.solve_all_single_candidate() < 0:
+                return -1
 
-        copy_copy.array[square] = solution[square]
-        copy_copy._update_candidates(square)
+            lowest_entropy, lowest_entropy_squares = copy.get_lowest_entropy_squares()
 
-        next_iteration = copy_copy.try_solve_classify(solution)
+            if not lowest_entropy_squares:
+                return assumptions
 
-        if next_iteration >= 0:
-            return next_iteration + 1
+            # After a call to solve_all_single_candidate, the lowest entropy can not be 0 or 1.
+            assert lowest_entropy >= 2
 
-        # None of the available digits solved the puzzle, therefore the puzzle is unsolvable.
-        return -1
+            # Make an assumption on one of the lowest entropy squares, in
+            # place.
+            square = rng.choice(sorted(lowest_entropy_squares))
+            copy._place(square, solution[square])
+            assumptions += 1
 
-    def solve_all_single_candidate(self) -> int:
+    def solve_all_single_candidate(self, trail: None | list = None) -> int:
         """
         Solve all of the single candidate squares.
         Returns -1 if the grid is unsolvable.
         Returns >=0 if the grid MAY BE solvable, the number of solved squares.
+        If TRAIL is given, the changes are recorded on it, see _place.
         """
 
-        squares = set(SudokuGrid.generate_squares(self.block_size))
+        # Only the empty squares with at most one candidate can be solved right
+        # away, the others can only get there after an adjacent square is
+        # solved, and are checked then.
+        candidates = self.candidates
+        row_nos, col_nos = numpy.nonzero((self.array == 0) & (candidates & (candidates - 1) == 0))
+
+        squares = set(zip(row_nos.tolist(), col_nos.tolist()))
         total = 0
 
         while squares:
@@ -547,16 +1281,15 @@ class SudokuGrid:
             if self.array[square] != 0:
                 continue
 
-            available = self._get_available(square)
+            available = int(self.candidates[square])
 
-            if not len(available):
+            if not available:
                 return -1
 
-            if len(available) == 1:
-                self.array[square] = available.pop()
-                self._update_candidates(square)
+            if available & (available - 1) == 0:
+                self._place(square, available.bit_length(), trail)
                 total += 1
-                squares.update(SudokuGrid.get_adjacent_squares(square, self.block_size))
+                squares.update(self.tables.peer_squares[square])
 
         return total
 
@@ -566,10 +1299,4 @@ class SudokuGrid:
         Returns the linear notation for the sudoku board.
         """
 
-        result = f'{self.block_size}:'
-
-        for row_no in range(self.grid_size):
-            for col_no in range(self.grid_size):
-                result += f'{self.array[row_no, col_no]},'
-
-        return result[:-1]
+        return f'{self.block_size}:' + ','.join(map(str, self.array.ravel().tolist()))
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from firebase_admin import initialize_app, _apps
@@ -5,9 +6,13 @@ from firebase_admin import credentials
 import json
 
 from app.core.settings import settings
+from app.core.database import async_engine
+from app.services.LeaderboardIndexService import get_leaderboard_index_service
+from app.services.ExecutorService import get_executor_service
 
 from app.middlewares import (
   FirebaseAuthMiddleware,
+  DatabaseSessionMiddleware,
 )
 
 from app.routers import (
@@ -21,7 +26,16 @@ cred = credentials.Certificate(json_cred)
 if not _apps:
   initialize_app(cred)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # The leaderboards are loaded in the background, they are read from the
+  # database until then.
+  get_leaderboard_index_service().start()
+  yield
+  await async_engine.dispose()
+  get_executor_service().shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
   "*",
@@ -36,6 +50,7 @@ app.add_middleware(
 )
 
 app.add_middleware(FirebaseAuthMiddleware)
+app.add_middleware(DatabaseSessionMiddleware)
 
 app.include_router(user_router)
 app.include_router(sudoku_router)
@@ -0,0 +1,23 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.database import async_session_scope
+
+class DatabaseSessionMiddleware:
+  """
+  Gives every request its own AsyncSessionLocal session, closed once the
+  response is sent, see async_session_scope.
+
+  A plain ASGI middleware rather than a BaseHTTPMiddleware, so the session
+  also covers the streamed responses.
+  """
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    async with async_session_scope():
+      await self.app(scope, receive, send)
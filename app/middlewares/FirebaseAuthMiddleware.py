@@ -1,10 +1,14 @@
 import traceback
 from typing import Optional
 
-from fastapi import Request
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from firebase_admin import auth
 
+from app.libs.bounded_executor import ExecutorFull
+from app.services.ExecutorService import get_executor_service
+
 class FirebaseAuthMiddleware(BaseHTTPMiddleware):
 
   def __init__(self, app):
@@ -20,7 +24,10 @@ class FirebaseAuthMiddleware(BaseHTTPMiddleware):
         request.state.firebase_user_id = firebaseUserId
 
       return await call_next(request)
-    
+
+    except ExecutorFull as e:
+      # Too many tokens are being verified, the client may try again.
+      return JSONResponse({"detail": str(e)}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
     except Exception as e:
       traceback.print_exc()
       return Exception("Error in FirebaseAuthMiddleware")
@@ -33,8 +40,12 @@ class FirebaseAuthMiddleware(BaseHTTPMiddleware):
       return None
 
     try:
-      decoded_token = auth.verify_id_token(token)
+      # Fetches the public keys of Firebase when they expire, so it runs on
+      # the blocking executor.
+      decoded_token = await get_executor_service().run_blocking(auth.verify_id_token, token)
       return decoded_token['uid']
+    except ExecutorFull:
+      raise
     except Exception as e:
       if 'Token expired' in str(e):
         raise Exception("Firebase token session timeout.")
@@ -1 +1,2 @@
 from .FirebaseAuthMiddleware import FirebaseAuthMiddleware
+from .DatabaseSessionMiddleware import DatabaseSessionMiddleware
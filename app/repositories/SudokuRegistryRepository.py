@@ -2,14 +2,18 @@
 SudokuEntriesRepository.py is a class that contains all the methods that are used to interact with the database, for the SudokuEntries table.
 """
 
-from typing import Optional, List, Tuple
+from typing import Iterator, Optional, List, Tuple
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timezone
+from sqlalchemy import Row, select, update
+from sqlalchemy.sql.expression import func
 
 from app.entities.User import User
 from app.entities.Sudoku import Sudoku
 from app.entities.SudokuRegistry import SudokuRegistry
-from app.dependencies.database import database
+from app.entities.SudokuLeaderboard import SudokuLeaderboard, PERIODS, PERIOD_ALL_TIME, ALL_TIME_START, LEADERBOARD_SIZE, get_period_start
+from app.core.database import get_async_session
+from app.dependencies.database import database, async_database
 
 from app.schemes.SudokuLeaderboard import UserRecordsElement
 
@@ -19,8 +23,20 @@ class SudokuRegistryRepository:
     self.db = db
 
   def create_sudoku_registry(self, user_id: UUID, sudoku_id: UUID, solving_time: float, is_applicable: bool) -> SudokuRegistry:
-    sudoku_registry = SudokuRegistry(user_id=user_id, sudoku_id=sudoku_id, solving_time=solving_time, is_applicable=is_applicable)
+    """
+    Stores an entry, and adds it to the leaderboards of its difficulty in the
+    same transaction if it is applicable.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    difficulty = self.db.scalar(select(Sudoku.difficulty).where(Sudoku.id == sudoku_id))
+    sudoku_registry = SudokuRegistry(user_id=user_id, sudoku_id=sudoku_id, difficulty=difficulty, solving_time=solving_time, is_applicable=is_applicable, created_at=now)
     self.db.add(sudoku_registry)
+
+    if is_applicable:
+      self.db.flush()
+      for period in PERIODS:
+        self.__add_to_leaderboard(sudoku_registry, difficulty, period, get_period_start(period, now))
+
     self.db.commit()
     self.db.refresh(sudoku_registry)
     return sudoku_registry
@@ -41,56 +57,237 @@ class SudokuRegistryRepository:
     return self.db.query(SudokuRegistry).filter(SudokuRegistry.sudoku_id == sudoku_id).all()
 
   def delete_sudoku_registry(self, sudoku_registry: SudokuRegistry) -> None:
+    """
+    Deletes an entry, and refills the leaderboards of the current periods it
+    was in from the registry. The leaderboards of the past periods are only
+    waiting to be dropped, see __add_to_leaderboard.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    leaderboards = self.db.query(SudokuLeaderboard.difficulty, SudokuLeaderboard.period, SudokuLeaderboard.period_start).filter(SudokuLeaderboard.sudoku_registry_id == sudoku_registry.id).all()
+    self.db.query(SudokuLeaderboard).filter(SudokuLeaderboard.sudoku_registry_id == sudoku_registry.id).delete(synchronize_session=False)
     self.db.delete(sudoku_registry)
+    self.db.flush()
+
+    for difficulty, period, period_start in leaderboards:
+      if period_start == get_period_start(period, now):
+        self.__rebuild_leaderboard(difficulty, period, period_start)
+
     self.db.commit()
 
-  def get_leaderboard(self, difficulty: int, last_time: datetime, limit: int = 20) -> List[SudokuRegistry]:
-    return self.db.query(SudokuRegistry).join(Sudoku).filter(Sudoku.difficulty == difficulty).filter(SudokuRegistry.created_at > last_time).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).limit(limit).all()
-
-  def get_all_time_leaderboard(self, difficulty: int, limit: int = 20) -> List[SudokuRegistry]:
-    return self.db.query(SudokuRegistry).join(Sudoku).filter(Sudoku.difficulty == difficulty).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).limit(limit).all()
-
-  def get_user_place_in_leaderboard(self, user_id: UUID, difficulty: int, last_time: datetime) -> Optional[Tuple[SudokuRegistry, int]]:
-    leaderboard = self.db.query(SudokuRegistry).join(Sudoku).filter(Sudoku.difficulty == difficulty).filter(SudokuRegistry.created_at > last_time).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).all()
-    user_place = 1
-    for entry in leaderboard:
-      if entry.user_id == user_id:
-        return entry, user_place
-      user_place += 1
-    return None
-
-  def get_user_place_in_all_time_leaderboard(self, user_id: UUID, difficulty: int) -> Optional[Tuple[SudokuRegistry, int]]:
-    leaderboard = self.db.query(SudokuRegistry).join(Sudoku).filter(Sudoku.difficulty == difficulty).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).all()
-    user_place = 1
-    for entry in leaderboard:
-      if entry.user_id == user_id:
-        return entry, user_place
-      user_place += 1
-    return None
-
-  def get_broken_record_user_if_any(self, difficulty: int, user_id: UUID, solving_time: float, limit: int = 20) -> Optional[User]:
-    """
-    Checks if the given solving time is breaking any records in the leaderboard.
-    If so, returns the user who's record is broken.
-    Checks only the last `limit` entries.
-    Checks if the user is not breaking his own record.
-    """
-    leaderboard = self.db.query(SudokuRegistry).join(Sudoku).filter(Sudoku.difficulty == difficulty).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).limit(limit).all()
-    for entry in leaderboard:
-      if entry.solving_time > solving_time and entry.user_id != user_id:
-        return entry.user
-    return None
+  def refresh_difficulties(self) -> None:
+    """
+    Copies the difficulty of the puzzles onto their entries again, after the
+    puzzles were moved to other difficulties, and refills the leaderboards
+    of the current periods from the registry.
+    """
+    difficulty = select(Sudoku.difficulty).where(Sudoku.id == SudokuRegistry.sudoku_id).scalar_subquery()
+    self.db.execute(update(SudokuRegistry).where(SudokuRegistry.difficulty != difficulty).values(difficulty=difficulty).execution_options(synchronize_session=False))
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    self.db.query(SudokuLeaderboard).delete(synchronize_session=False)
+    for difficulty in self.db.scalars(select(SudokuRegistry.difficulty).distinct()).all():
+      for period in PERIODS:
+        self.__rebuild_leaderboard(difficulty, period, get_period_start(period, now))
+
+    self.db.commit()
+
+  def __leaderboard(self, difficulty: int, period: str, period_start: datetime):
+    return self.db.query(SudokuLeaderboard).filter(SudokuLeaderboard.difficulty == difficulty).filter(SudokuLeaderboard.period == period).filter(SudokuLeaderboard.period_start == period_start)
+
+  def __add_to_leaderboard(self, sudoku_registry: SudokuRegistry, difficulty: int, period: str, period_start: datetime) -> None:
+    """
+    Adds an entry to a leaderboard if it makes it in, and drops the entries
+    pushed out, and the leaderboards of the past periods.
+    """
+    if period != PERIOD_ALL_TIME:
+      self.db.query(SudokuLeaderboard).filter(SudokuLeaderboard.period == period).filter(SudokuLeaderboard.period_start < period_start).delete(synchronize_session=False)
+
+    leaderboard = self.__leaderboard(difficulty, period, period_start)
+    size, worst_time = leaderboard.with_entities(func.count(SudokuLeaderboard.id), func.max(SudokuLeaderboard.solving_time)).one()
+    # The earlier entry keeps its place on a tie.
+    if size >= LEADERBOARD_SIZE and sudoku_registry.solving_time >= worst_time:
+      return
+
+    self.db.add(SudokuLeaderboard(
+      difficulty=difficulty,
+      period=period,
+      period_start=period_start,
+      sudoku_registry_id=sudoku_registry.id,
+      user_id=sudoku_registry.user_id,
+      solving_time=sudoku_registry.solving_time,
+    ))
+    self.db.flush()
+
+    if size >= LEADERBOARD_SIZE:
+      # The latest of the entries tied for the last place goes.
+      pushed_out = leaderboard.with_entities(SudokuLeaderboard.id).join(SudokuRegistry, SudokuRegistry.id == SudokuLeaderboard.sudoku_registry_id).order_by(SudokuLeaderboard.solving_time.desc(), SudokuRegistry.created_at.desc()).limit(size + 1 - LEADERBOARD_SIZE).all()
+      self.db.query(SudokuLeaderboard).filter(SudokuLeaderboard.id.in_([row.id for row in pushed_out])).delete(synchronize_session=False)
+
+  def __rebuild_leaderboard(self, difficulty: int, period: str, period_start: datetime) -> None:
+    """
+    Fills the leaderboard of a current period again with the best entries of
+    the registry.
+    """
+    self.__leaderboard(difficulty, period, period_start).delete(synchronize_session=False)
+
+    entries = self.db.query(SudokuRegistry.id, SudokuRegistry.user_id, SudokuRegistry.solving_time).filter(SudokuRegistry.difficulty == difficulty).filter(SudokuRegistry.is_applicable == True)
+    if period != PERIOD_ALL_TIME:
+      entries = entries.filter(SudokuRegistry.created_at >= period_start)
+
+    for sudoku_registry_id, user_id, solving_time in entries.order_by(SudokuRegistry.solving_time, SudokuRegistry.created_at).limit(LEADERBOARD_SIZE):
+      self.db.add(SudokuLeaderboard(
+        difficulty=difficulty,
+        period=period,
+        period_start=period_start,
+        sudoku_registry_id=sudoku_registry_id,
+        user_id=user_id,
+        solving_time=solving_time,
+      ))
+
+  def get_leaderboard(self, difficulty: int, period: str, period_start: datetime, limit: int = LEADERBOARD_SIZE) -> List[Tuple[str, UUID, float]]:
+    """
+    Returns the username, user id and solving time of the best entries, read
+    with a single query.
+    """
+    rows = self.db.execute(
+      select(User.username, SudokuLeaderboard.user_id, SudokuLeaderboard.solving_time)
+      .join(User, User.id == SudokuLeaderboard.user_id)
+      .join(SudokuRegistry, SudokuRegistry.id == SudokuLeaderboard.sudoku_registry_id)
+      .where(SudokuLeaderboard.difficulty == difficulty)
+      .where(SudokuLeaderboard.period == period)
+      .where(SudokuLeaderboard.period_start == period_start)
+      .order_by(SudokuLeaderboard.solving_time, SudokuRegistry.created_at)
+      .limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+  def get_user_place_in_leaderboard(self, user_id: UUID, difficulty: int, last_time: datetime) -> Optional[Tuple[float, int]]:
+    return self.__get_user_place(user_id, difficulty, last_time)
+
+  def get_user_place_in_all_time_leaderboard(self, user_id: UUID, difficulty: int) -> Optional[Tuple[float, int]]:
+    return self.__get_user_place(user_id, difficulty)
+
+  def __get_user_place(self, user_id: UUID, difficulty: int, last_time: Optional[datetime] = None) -> Optional[Tuple[float, int]]:
+    """
+    Returns the best solving time of the user in the leaderboard since
+    LAST_TIME, or of all time, with its place, 1 plus the number of entries
+    with a better time. Both are computed by the database.
+    """
+    entries = select(func.count()).select_from(SudokuRegistry).where(SudokuRegistry.difficulty == difficulty).where(SudokuRegistry.is_applicable == True)
+    if last_time is not None:
+      entries = entries.where(SudokuRegistry.created_at >= last_time)
+
+    best_time = self.db.scalar(entries.with_only_columns(func.min(SudokuRegistry.solving_time)).where(SudokuRegistry.user_id == user_id))
+    if best_time is None:
+      return None
+
+    better_entries = self.db.scalar(entries.where(SudokuRegistry.solving_time < best_time))
+    return best_time, better_entries + 1
+
+  def get_broken_record_user_if_any(self, difficulty: int, user_id: UUID, solving_time: float) -> Optional[Row]:
+    """
+    Checks if the given solving time is breaking any records in the all time
+    leaderboard. If so, returns the id, username and email of the user whose
+    record is broken. Checks if the user is not breaking his own record.
+    """
+    return self.db.execute(
+      select(User.id, User.username, User.email)
+      .join(SudokuLeaderboard, SudokuLeaderboard.user_id == User.id)
+      .where(SudokuLeaderboard.difficulty == difficulty)
+      .where(SudokuLeaderboard.period == PERIOD_ALL_TIME)
+      .where(SudokuLeaderboard.period_start == ALL_TIME_START)
+      .where(SudokuLeaderboard.solving_time > solving_time)
+      .where(SudokuLeaderboard.user_id != user_id)
+      .order_by(SudokuLeaderboard.solving_time)
+      .limit(1)
+    ).first()
+
+  def stream_leaderboard_entries(self, since: Optional[datetime] = None, batch_size: int = 10000) -> Iterator[Tuple[int, float, datetime, UUID, UUID, str]]:
+    """
+    Yields the difficulty, solving time, creation time, id, user id and
+    username of the applicable entries, created since SINCE if given,
+    fetched BATCH_SIZE rows at a time.
+    """
+    columns = (SudokuRegistry.difficulty, SudokuRegistry.solving_time, SudokuRegistry.created_at, SudokuRegistry.id, SudokuRegistry.user_id)
+    if since is None:
+      query = select(*columns, User.username).join(User, User.id == SudokuRegistry.user_id)
+    else:
+      # A few recent entries, their usernames are looked up one by one
+      # instead of hashing every user.
+      username = select(User.username).where(User.id == SudokuRegistry.user_id).scalar_subquery()
+      query = select(*columns, username).where(SudokuRegistry.created_at >= since)
+    query = query.where(SudokuRegistry.is_applicable == True).execution_options(yield_per=batch_size)
+
+    for row in self.db.execute(query):
+      yield tuple(row)
+
+  def count_leaderboard_entries(self) -> dict[int, int]:
+    """
+    Returns the number of applicable entries, by difficulty.
+    """
+    rows = self.db.execute(select(SudokuRegistry.difficulty, func.count(SudokuRegistry.id)).where(SudokuRegistry.is_applicable == True).group_by(SudokuRegistry.difficulty))
+    return {difficulty: count for difficulty, count in rows}
 
   def get_user_records(self, user_id: UUID, difficulty: int, limit: int = 20) -> List[UserRecordsElement]:
-    user_records = self.db.query(SudokuRegistry).join(Sudoku).filter(Sudoku.difficulty == difficulty).filter(SudokuRegistry.user_id == user_id).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).limit(limit).all()
+    user_records = self.db.query(SudokuRegistry.sudoku_id, SudokuRegistry.solving_time).filter(SudokuRegistry.difficulty == difficulty).filter(SudokuRegistry.user_id == user_id).filter(SudokuRegistry.is_applicable == True).order_by(SudokuRegistry.solving_time).limit(limit).all()
     records = []
-    for entry in user_records:
+    for sudoku_id, solving_time in user_records:
       records.append(UserRecordsElement(
-        puzzle_id=entry.sudoku_id,
-        solving_time=entry.solving_time
+        puzzle_id=sudoku_id,
+        solving_time=solving_time
       ))
     return records
 
 
+class AsyncSudokuRegistryRepository:
+  """
+  SudokuRegistryRepository on an AsyncSession, for the request handlers, see
+  AsyncUserRepository. The streams of the leaderboard index are left to
+  SudokuRegistryRepository, they run in the background.
+  """
+
+  def __init__(self, db: async_database):
+    self.db = db
+
+  async def __run(self, method, *args):
+    return await get_async_session(self.db).run_sync(lambda session: method(SudokuRegistryRepository(session), *args))
+
+  async def create_sudoku_registry(self, user_id: UUID, sudoku_id: UUID, solving_time: float, is_applicable: bool) -> SudokuRegistry:
+    return await self.__run(SudokuRegistryRepository.create_sudoku_registry, user_id, sudoku_id, solving_time, is_applicable)
+
+  async def save_sudoku_registry(self, sudoku_registry: SudokuRegistry) -> SudokuRegistry:
+    return await self.__run(SudokuRegistryRepository.save_sudoku_registry, sudoku_registry)
+
+  async def get_sudoku_registry_by_id(self, sudoku_registry_id: UUID) -> Optional[SudokuRegistry]:
+    return await self.__run(SudokuRegistryRepository.get_sudoku_registry_by_id, sudoku_registry_id)
+
+  async def get_sudoku_registries_by_user_id(self, user_id: UUID) -> List[SudokuRegistry]:
+    return await self.__run(SudokuRegistryRepository.get_sudoku_registries_by_user_id, user_id)
+
+  async def get_sudoku_registries_by_sudoku_id(self, sudoku_id: UUID) -> List[SudokuRegistry]:
+    return await self.__run(SudokuRegistryRepository.get_sudoku_registries_by_sudoku_id, sudoku_id)
+
+  async def delete_sudoku_registry(self, sudoku_registry: SudokuRegistry) -> None:
+    await self.__run(SudokuRegistryRepository.delete_sudoku_registry, sudoku_registry)
+
+  async def get_leaderboard(self, difficulty: int, period: str, period_start: datetime, limit: int = LEADERBOARD_SIZE) -> List[Tuple[str, UUID, float]]:
+    return await self.__run(SudokuRegistryRepository.get_leaderboard, difficulty, period, period_start, limit)
+
+  async def get_user_place_in_leaderboard(self, user_id: UUID, difficulty: int, last_time: datetime) -> Optional[Tuple[float, int]]:
+    return await self.__run(SudokuRegistryRepository.get_user_place_in_leaderboard, user_id, difficulty, last_time)
+
+  async def get_user_place_in_all_time_leaderboard(self, user_id: UUID, difficulty: int) -> Optional[Tuple[float, int]]:
+    return await self.__run(SudokuRegistryRepository.get_user_place_in_all_time_leaderboard, user_id, difficulty)
+
+  async def get_broken_record_user_if_any(self, difficulty: int, user_id: UUID, solving_time: float) -> Optional[Row]:
+    return await self.__run(SudokuRegistryRepository.get_broken_record_user_if_any, difficulty, user_id, solving_time)
+
+  async def get_user_records(self, user_id: UUID, difficulty: int, limit: int = 20) -> List[UserRecordsElement]:
+    return await self.__run(SudokuRegistryRepository.get_user_records, user_id, difficulty, limit)
+
+
 def get_sudoku_registry_repository(db: database) -> SudokuRegistryRepository:
   return SudokuRegistryRepository(db)
+
+def get_async_sudoku_registry_repository(db: async_database) -> AsyncSudokuRegistryRepository:
+  return AsyncSudokuRegistryRepository(db)
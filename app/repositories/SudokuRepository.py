@@ -2,40 +2,320 @@
 SudokuRepository.py is a class that contains all the methods that are used to interact with the database, for the Sudoku table.
 """
 
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.sql.expression import func
-from typing import Optional
-from uuid import UUID
+from typing import Iterator, Optional
+from uuid import UUID, uuid4
+import random
 
 from app.entities.Sudoku import Sudoku
-from app.dependencies.database import database
+from app.entities.SudokuSequence import SudokuSequence
+from app.core.settings import settings
+from app.libs.lru_cache import LRUCache
+from app.libs.sudoku_grid import SudokuGrid, bytes_to_linear_notation, linear_notation_to_bytes, puzzle_hash
+from app.core.database import get_async_session
+from app.dependencies.database import database, async_database
+
+# How many random numbers get_random_sudoku_by_difficulty draws before
+# falling back to the next numbered puzzle, a number only misses when a
+# puzzle is deleted in between.
+RANDOM_TRIES = 3
+
+class CachedSudoku:
+  """
+  A copy of a Sudoku row, detached from any session so it can be shared
+  between requests and threads. The puzzles never change once stored.
+  GRID and SOLUTION are parsed once, they must not be modified.
+  SOLUTION is None for the puzzles stored before the solutions were.
+  """
+
+  __slots__ = ("id", "difficulty", "puzzle_data", "grid", "solution")
+
+  def __init__(self, id: UUID, difficulty: int, puzzle_data: bytes, solution_data: Optional[bytes]):
+    self.id = id
+    self.difficulty = difficulty
+    self.puzzle_data = puzzle_data
+    self.grid = SudokuGrid.from_bytes(puzzle_data)
+    self.solution = SudokuGrid.from_bytes(solution_data) if solution_data is not None else None
+
+  @property
+  def linear_notation(self) -> str:
+    return bytes_to_linear_notation(self.puzzle_data)
+
+
+# The puzzles read by id, shared by the repositories of this process. Each
+# worker process keeps its own, a puzzle deleted in an other one is only
+# dropped as it ages out.
+puzzle_cache = LRUCache(settings.PUZZLE_CACHE_SIZE)
 
 class SudokuRepository:
   def __init__(self, db: database):
     self.db = db
 
-  def create_sudoku(self, difficulty: int, puzzle_data: str) -> Sudoku:
-    sudoku = Sudoku(difficulty=difficulty, puzzle_data=puzzle_data)
+  def __dialect(self):
+    return postgresql if self.db.get_bind().dialect.name == "postgresql" else sqlite
+
+  def __allocate_sequence_nos(self, difficulty: int, count: int) -> int:
+    """
+    Reserves COUNT sequence numbers for the puzzles of a difficulty and
+    returns the first one. The counter row stays locked until the commit, so
+    concurrent inserts can not take the same numbers, and a rollback gives
+    the numbers back.
+    """
+
+    statement = self.__dialect().insert(SudokuSequence).values(difficulty=difficulty, last_sequence_no=count)
+    statement = statement.on_conflict_do_update(
+      index_elements=[SudokuSequence.difficulty],
+      set_={"last_sequence_no": SudokuSequence.last_sequence_no + count},
+    ).returning(SudokuSequence.last_sequence_no)
+
+    return self.db.execute(statement).scalar_one() - count + 1
+
+  def create_sudoku(self, difficulty: int, linear_notation: str) -> Sudoku:
+    sudoku = Sudoku.from_linear_notation(difficulty, linear_notation)
+    sudoku.sequence_no = self.__allocate_sequence_nos(difficulty, 1)
     self.db.add(sudoku)
     self.db.commit()
     self.db.refresh(sudoku)
     return sudoku
 
+  def create_sudokus(self, difficulty: int, puzzles: list[tuple[str, bytes, bytes]]) -> int:
+    return self.insert_sudokus([
+      (linear_notation, difficulty, canonical_hash, solution_data)
+      for linear_notation, canonical_hash, solution_data in puzzles
+    ])
+
+  def insert_sudokus(self, puzzles: list[tuple[str, int, bytes, bytes]]) -> int:
+    """
+    Bulk inserts (linear notation, difficulty, canonical hash, solution in
+    binary notation) tuples, skipping the puzzles that are already stored or
+    isomorphic to a stored one. Returns the number of puzzles inserted.
+
+    The inserted puzzles are numbered afterwards, in the same transaction, so
+    the skipped ones leave no gaps in the sequence numbers.
+    """
+
+    if not puzzles:
+      return 0
+
+    rows = []
+    for linear_notation, difficulty, canonical_hash, solution_data in puzzles:
+      puzzle_data = linear_notation_to_bytes(linear_notation)
+      rows.append({
+        "id": uuid4(),
+        "difficulty": difficulty,
+        "puzzle_data": puzzle_data,
+        "puzzle_hash": puzzle_hash(puzzle_data),
+        "canonical_hash": canonical_hash,
+        "solution_data": solution_data,
+      })
+
+    # Without a conflict target, a row clashing on either unique hash is
+    # skipped.
+    statement = self.__dialect().insert(Sudoku).on_conflict_do_nothing().returning(Sudoku.id, Sudoku.difficulty)
+    inserted = {}
+    for row in self.db.execute(statement, rows):
+      inserted.setdefault(row.difficulty, []).append(row.id)
+
+    # The counters are locked in the same order by every insert, so two
+    # inserts can not wait on each other.
+    numbering = Sudoku.__table__.update().where(Sudoku.id == bindparam("_id")).values(sequence_no=bindparam("_sequence_no"))
+    for difficulty in sorted(inserted):
+      ids = inserted[difficulty]
+      first = self.__allocate_sequence_nos(difficulty, len(ids))
+      self.db.execute(numbering, [{"_id": sudoku_id, "_sequence_no": first + offset} for offset, sudoku_id in enumerate(ids)])
+
+    self.db.commit()
+    return sum(len(ids) for ids in inserted.values())
+
+  def stream_sudokus(self, difficulty: Optional[int] = None, batch_size: int = 1000) -> Iterator[tuple[int, bytes]]:
+    """
+    Yields the difficulty and the binary notation of the stored puzzles,
+    fetched BATCH_SIZE rows at a time from a server side cursor, so the
+    table is never fully in memory.
+    """
+
+    query = select(Sudoku.difficulty, Sudoku.puzzle_data).execution_options(yield_per=batch_size)
+    if difficulty is not None:
+      query = query.where(Sudoku.difficulty == difficulty)
+
+    for row in self.db.execute(query):
+      yield row.difficulty, row.puzzle_data
+
+  def stream_sudoku_grades(self, batch_size: int = 1000) -> Iterator[tuple[UUID, int, bytes]]:
+    """
+    Yields the id, the difficulty and the binary notation of every stored
+    puzzle, for grading them again, see stream_sudokus.
+    """
+
+    query = select(Sudoku.id, Sudoku.difficulty, Sudoku.puzzle_data).execution_options(yield_per=batch_size)
+
+    for row in self.db.execute(query):
+      yield row.id, row.difficulty, bytes(row.puzzle_data)
+
+  def set_difficulties(self, difficulties: list[tuple[UUID, int]]) -> None:
+    """
+    Moves puzzles to other difficulties, from (id, difficulty) tuples, and
+    numbers the puzzles of every difficulty again, in the order they were
+    created, like the migration that added Sudoku.sequence_no did. Every
+    puzzle may get an other number, so nothing should insert or delete
+    puzzles in the meantime.
+    """
+
+    # The numbers are cleared first, the unique index is checked row by row.
+    self.db.execute(update(Sudoku).values(sequence_no=None).execution_options(synchronize_session=False))
+
+    if difficulties:
+      moving = Sudoku.__table__.update().where(Sudoku.id == bindparam("_id")).values(difficulty=bindparam("_difficulty"))
+      self.db.execute(moving, [{"_id": sudoku_id, "_difficulty": difficulty} for sudoku_id, difficulty in difficulties])
+
+    numbered = select(
+      Sudoku.id,
+      func.row_number().over(partition_by=Sudoku.difficulty, order_by=(Sudoku.created_at, Sudoku.id)).label("sequence_no"),
+    ).subquery()
+    self.db.execute(
+      update(Sudoku)
+      .where(Sudoku.id == numbered.c.id)
+      .values(sequence_no=numbered.c.sequence_no)
+      .execution_options(synchronize_session=False)
+    )
+
+    self.db.execute(delete(SudokuSequence))
+    self.db.execute(insert(SudokuSequence).from_select(
+      ["difficulty", "last_sequence_no"],
+      select(Sudoku.difficulty, func.max(Sudoku.sequence_no)).group_by(Sudoku.difficulty),
+    ))
+
+    self.db.commit()
+    # The cached copies hold the old difficulties.
+    puzzle_cache.clear()
+
   def save_sudoku(self, sudoku: Sudoku) -> Sudoku:
     self.db.add(sudoku)
     self.db.commit()
     self.db.refresh(sudoku)
     return sudoku
 
-  def get_sudoku_by_id(self, sudoku_id: UUID) -> Optional[Sudoku]:
-    return self.db.query(Sudoku).filter(Sudoku.id == sudoku_id).first()
+  def get_sudoku_by_id(self, sudoku_id: UUID) -> Optional[CachedSudoku]:
+    """
+    Returns a puzzle from the puzzle cache, reading it from the database on a
+    miss. Unknown ids are not cached.
+    """
+
+    sudoku_id = UUID(str(sudoku_id))
+    sudoku = puzzle_cache.get(sudoku_id)
+    if sudoku is not None:
+      return sudoku
+
+    row = self.db.execute(
+      select(Sudoku.difficulty, Sudoku.puzzle_data, Sudoku.solution_data).where(Sudoku.id == sudoku_id)
+    ).first()
+    if row is None:
+      return None
+
+    sudoku = CachedSudoku(
+      sudoku_id,
+      row.difficulty,
+      bytes(row.puzzle_data),
+      bytes(row.solution_data) if row.solution_data is not None else None,
+    )
+    puzzle_cache.put(sudoku_id, sudoku)
+    return sudoku
 
   def get_random_sudoku_by_difficulty(self, difficulty: int) -> Optional[Sudoku]:
-    return self.db.query(Sudoku).filter(Sudoku.difficulty == difficulty).order_by(func.random()).first()
+    """
+    Picks a puzzle of a difficulty uniformly at random. The puzzles are
+    numbered without gaps, see Sudoku.sequence_no, so a random number is
+    drawn and looked up with the (difficulty, sequence_no) index instead of
+    sorting every puzzle of the difficulty.
+    """
+
+    for _ in range(RANDOM_TRIES):
+      last_sequence_no = self.db.scalar(
+        select(SudokuSequence.last_sequence_no).where(SudokuSequence.difficulty == difficulty)
+      )
+      if not last_sequence_no:
+        return None
+
+      sudoku = self.db.query(Sudoku).filter(
+        Sudoku.difficulty == difficulty, Sudoku.sequence_no == random.randint(1, last_sequence_no)
+      ).first()
+      if sudoku is not None:
+        return sudoku
+
+    # Every draw missed, take the puzzle with the next number instead,
+    # wrapping around to the first one, still a lookup in the index.
+    numbered = self.db.query(Sudoku).filter(Sudoku.difficulty == difficulty, Sudoku.sequence_no.is_not(None)).order_by(Sudoku.sequence_no)
+    return numbered.filter(Sudoku.sequence_no >= random.randint(1, last_sequence_no)).first() or numbered.first()
 
   def delete_sudoku(self, sudoku: Sudoku) -> None:
+    """
+    Deletes a puzzle, and gives its sequence number to the last puzzle of
+    its difficulty, so the numbers stay without gaps.
+    """
+
+    sudoku_id, difficulty, sequence_no = sudoku.id, sudoku.difficulty, sudoku.sequence_no
     self.db.delete(sudoku)
+    self.db.flush()
+
+    if sequence_no is not None:
+      last_sequence_no = self.db.execute(
+        update(SudokuSequence)
+        .where(SudokuSequence.difficulty == difficulty)
+        .values(last_sequence_no=SudokuSequence.last_sequence_no - 1)
+        .returning(SudokuSequence.last_sequence_no)
+        .execution_options(synchronize_session=False)
+      ).scalar_one() + 1
+
+      if sequence_no != last_sequence_no:
+        self.db.execute(
+          update(Sudoku)
+          .where(Sudoku.difficulty == difficulty, Sudoku.sequence_no == last_sequence_no)
+          .values(sequence_no=sequence_no)
+          .execution_options(synchronize_session=False)
+        )
+
     self.db.commit()
+    puzzle_cache.pop(sudoku_id)
+
+
+class AsyncSudokuRepository:
+  """
+  SudokuRepository on an AsyncSession, for the request handlers, see
+  AsyncUserRepository. The bulk inserts and the streams are left to
+  SudokuRepository, they run in the background.
+  """
+
+  def __init__(self, db: async_database):
+    self.db = db
+
+  async def __run(self, method, *args):
+    return await get_async_session(self.db).run_sync(lambda session: method(SudokuRepository(session), *args))
+
+  async def create_sudoku(self, difficulty: int, linear_notation: str) -> Sudoku:
+    return await self.__run(SudokuRepository.create_sudoku, difficulty, linear_notation)
+
+  async def save_sudoku(self, sudoku: Sudoku) -> Sudoku:
+    return await self.__run(SudokuRepository.save_sudoku, sudoku)
+
+  async def get_sudoku_by_id(self, sudoku_id: UUID) -> Optional[CachedSudoku]:
+    # A hit does not need the session.
+    sudoku = puzzle_cache.get(UUID(str(sudoku_id)))
+    if sudoku is not None:
+      return sudoku
+
+    return await self.__run(SudokuRepository.get_sudoku_by_id, sudoku_id)
+
+  async def get_random_sudoku_by_difficulty(self, difficulty: int) -> Optional[Sudoku]:
+    return await self.__run(SudokuRepository.get_random_sudoku_by_difficulty, difficulty)
+
+  async def delete_sudoku(self, sudoku: Sudoku) -> None:
+    await self.__run(SudokuRepository.delete_sudoku, sudoku)
 
 
 def get_sudoku_repository(db: database) -> SudokuRepository:
   return SudokuRepository(db)
+
+def get_async_sudoku_repository(db: async_database) -> AsyncSudokuRepository:
+  return AsyncSudokuRepository(db)
@@ -5,7 +5,8 @@ from typing import Optional
 from uuid import UUID
 
 from app.entities.User import User
-from app.dependencies.database import database
+from app.core.database import get_async_session
+from app.dependencies.database import database, async_database
 
 
 class UserRepository:
@@ -39,5 +40,40 @@ class UserRepository:
     return self.db.query(User).filter(User.username == username).first() is not None
 
 
+class AsyncUserRepository:
+  """
+  UserRepository on an AsyncSession, for the request handlers. The queries
+  are the ones of UserRepository, run with AsyncSession.run_sync, so they are
+  awaited without blocking the event loop.
+  """
+
+  def __init__(self, db: async_database):
+    self.db = db
+
+  async def __run(self, method, *args):
+    return await get_async_session(self.db).run_sync(lambda session: method(UserRepository(session), *args))
+
+  async def create_user(self, firebase_id: str, username: str, email: str) -> User:
+    return await self.__run(UserRepository.create_user, firebase_id, username, email)
+
+  async def save_user(self, user: User) -> User:
+    return await self.__run(UserRepository.save_user, user)
+
+  async def get_user_by_id(self, user_id: UUID) -> Optional[User]:
+    return await self.__run(UserRepository.get_user_by_id, user_id)
+
+  async def get_user_by_firebase_id(self, firebase_id: str) -> Optional[User]:
+    return await self.__run(UserRepository.get_user_by_firebase_id, firebase_id)
+
+  async def delete_user(self, user: User) -> None:
+    await self.__run(UserRepository.delete_user, user)
+
+  async def is_username_taken(self, username: str) -> bool:
+    return await self.__run(UserRepository.is_username_taken, username)
+
+
 def get_user_repository(db: database) -> UserRepository:
   return UserRepository(db)
+
+def get_async_user_repository(db: async_database) -> AsyncUserRepository:
+  return AsyncUserRepository(db)
@@ -9,6 +9,7 @@ from app.schemes.SudokuLeaderboard import (
 )
 from app.entities import Sudoku
 from app.dependencies.sudoku_registry_service import sudoku_registry_service
+from app.libs.bounded_executor import ExecutorFull
 
 
 router = APIRouter(
@@ -26,7 +27,9 @@ async def get_leaderboard_today(request: Request, difficulty: int, sudoku_regist
     firebase_user_id = request.state.firebase_user_id
     if firebase_user_id is None:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
-    return sudoku_registry_service.get_leaderboard_today(difficulty, firebase_user_id)
+    return await sudoku_registry_service.get_leaderboard_today(difficulty, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -41,7 +44,9 @@ async def get_leaderboard_week(request: Request, difficulty: int, sudoku_registr
     firebase_user_id = request.state.firebase_user_id
     if firebase_user_id is None:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
-    return sudoku_registry_service.get_leaderboard_week(difficulty, firebase_user_id)
+    return await sudoku_registry_service.get_leaderboard_week(difficulty, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -56,7 +61,9 @@ async def get_leaderboard_month(request: Request, difficulty: int, sudoku_regist
     firebase_user_id = request.state.firebase_user_id
     if firebase_user_id is None:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
-    return sudoku_registry_service.get_leaderboard_month(difficulty, firebase_user_id)
+    return await sudoku_registry_service.get_leaderboard_month(difficulty, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -71,7 +78,9 @@ async def get_leaderboard_all_time(request: Request, difficulty: int, sudoku_reg
     firebase_user_id = request.state.firebase_user_id
     if firebase_user_id is None:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
-    return sudoku_registry_service.get_leaderboard_all_time(difficulty, firebase_user_id)
+    return await sudoku_registry_service.get_leaderboard_all_time(difficulty, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -86,7 +95,9 @@ async def get_user_records(request: Request, difficulty: int, sudoku_registry_se
     firebase_user_id = request.state.firebase_user_id
     if firebase_user_id is None:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
-    return sudoku_registry_service.get_user_records(firebase_user_id, difficulty)
+    return await sudoku_registry_service.get_user_records(firebase_user_id, difficulty)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -105,7 +116,9 @@ async def submit_sudoku(request: Request, submit_sudoku_request: SubmitSudokuReq
     solving_time = submit_sudoku_request.solving_time
     is_applicable = submit_sudoku_request.is_applicable
     user_solution = submit_sudoku_request.user_solution
-    return sudoku_registry_service.submit_sudoku(firebase_user_id, sudoku_id, solving_time, is_applicable, user_solution)
+    return await sudoku_registry_service.submit_sudoku(firebase_user_id, sudoku_id, solving_time, is_applicable, user_solution)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
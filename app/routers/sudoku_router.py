@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Request
+from fastapi import APIRouter, HTTPException, status, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
 import traceback
 
+from uuid import UUID
+
 from app.schemes.Sudoku import (
   GetSudokuResponse,
   ValidateSudokuResponse,
+  PopulateJobResponse,
+  PopulateJobsResponse,
+  ImportPuzzlesResponse,
+  ExecutorsResponse,
 )
+from app.libs.puzzle_io import FORMATS, FORMAT_LINEAR
 from app.entities import Sudoku
+from app.repositories.SudokuRepository import CachedSudoku
 from app.dependencies.sudoku_service import sudoku_service
+from app.libs.bounded_executor import ExecutorFull
 
 
 router = APIRouter(
@@ -21,12 +32,14 @@ router = APIRouter(
 )
 async def get_random_sudoku_by_difficulty(difficulty: int, sudoku_service: sudoku_service):
   try:
-    puzzle: Sudoku = sudoku_service.get_random_sudoku_by_difficulty(difficulty)
+    puzzle: Sudoku = await sudoku_service.get_random_sudoku_by_difficulty(difficulty)
     return GetSudokuResponse(
-      puzzle_data=puzzle.puzzle_data,
+      puzzle_data=puzzle.linear_notation,
       puzzle_id=puzzle.id,
       difficulty=difficulty,
     )
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -38,25 +51,131 @@ async def get_random_sudoku_by_difficulty(difficulty: int, sudoku_service: sudok
 )
 async def get_sudoku_by_id(puzzle_id: str, sudoku_service: sudoku_service):
   try:
-    puzzle: Sudoku = sudoku_service.get_sudoku_by_id(puzzle_id)
+    puzzle: CachedSudoku = await sudoku_service.get_sudoku_by_id(puzzle_id)
     return GetSudokuResponse(
-      puzzle_data=puzzle.puzzle_data,
+      puzzle_data=puzzle.linear_notation,
       puzzle_id=puzzle.id,
       difficulty=puzzle.difficulty,
     )
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @router.post(
-  "/populate/{difficulty}/{count}"
+  "/populate/{difficulty}/{count}",
+  response_model=PopulateJobResponse,
+  status_code=status.HTTP_202_ACCEPTED,
 )
 async def populate_sudoku(request: Request, difficulty: int, count: int, sudoku_service: sudoku_service):
   try:
     firebase_user_id = request.state.firebase_user_id
-    sudoku_service.populate_sudoku_registry(difficulty, count, firebase_user_id)
-    return "Success"
+    return await sudoku_service.populate_sudoku_registry(difficulty, count, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    traceback.print_exc()
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get(
+  "/populate/jobs",
+  response_model=PopulateJobsResponse,
+)
+async def get_populate_jobs(request: Request, sudoku_service: sudoku_service):
+  try:
+    firebase_user_id = request.state.firebase_user_id
+    return await sudoku_service.get_populate_jobs(firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    traceback.print_exc()
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get(
+  "/populate/jobs/{job_id}",
+  response_model=PopulateJobResponse,
+)
+async def get_populate_job(request: Request, job_id: UUID, sudoku_service: sudoku_service):
+  try:
+    firebase_user_id = request.state.firebase_user_id
+    return await sudoku_service.get_populate_job(job_id, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    traceback.print_exc()
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post(
+  "/populate/jobs/{job_id}/cancel",
+  response_model=PopulateJobResponse,
+)
+async def cancel_populate_job(request: Request, job_id: UUID, sudoku_service: sudoku_service):
+  try:
+    firebase_user_id = request.state.firebase_user_id
+    return await sudoku_service.cancel_populate_job(job_id, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    traceback.print_exc()
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get(
+  "/executors",
+  response_model=ExecutorsResponse,
+)
+async def get_executor_stats(request: Request, sudoku_service: sudoku_service):
+  try:
+    firebase_user_id = request.state.firebase_user_id
+    return await sudoku_service.get_executor_stats(firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    traceback.print_exc()
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post(
+  "/import",
+  response_model=ImportPuzzlesResponse,
+)
+async def import_puzzles(request: Request, file: UploadFile, sudoku_service: sudoku_service):
+  try:
+    firebase_user_id = request.state.firebase_user_id
+    return await sudoku_service.import_puzzles(file.file, firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    traceback.print_exc()
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get(
+  "/export",
+)
+async def export_puzzles(
+  request: Request,
+  sudoku_service: sudoku_service,
+  format: Literal[FORMATS] = FORMAT_LINEAR,
+  difficulty: Optional[int] = None,
+):
+  try:
+    firebase_user_id = request.state.firebase_user_id
+    lines = await sudoku_service.export_puzzles(format, difficulty, firebase_user_id)
+    return StreamingResponse(
+      lines,
+      media_type="text/plain",
+      headers={"Content-Disposition": "attachment; filename=puzzles.txt"},
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
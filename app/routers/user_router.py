@@ -8,6 +8,7 @@ from app.schemes.User import (
   UserUpdateResponse,
 )
 from app.dependencies.user_service import user_service
+from app.libs.bounded_executor import ExecutorFull
 
 router = APIRouter(
   prefix="/v1/user",
@@ -33,6 +34,8 @@ async def createUser(
       username,
       email,
     )
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -54,6 +57,8 @@ async def updateUser(
       firebase_user_id,
       username,
     )
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -67,7 +72,9 @@ async def am_i_admin(
 ):
   try:
     firebase_user_id = request.state.firebase_user_id
-    return user_service.am_i_admin(firebase_user_id)
+    return await user_service.am_i_admin(firebase_user_id)
+  except ExecutorFull as e:
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
   except Exception as e:
     traceback.print_exc()
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
\ No newline at end of file
@@ -1,4 +1,6 @@
 from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 
@@ -11,3 +13,54 @@ class GetSudokuResponse:
 @dataclass
 class ValidateSudokuResponse:
   is_correct: bool
+
+@dataclass
+class PopulateJobResponse:
+  job_id: UUID
+  status: str
+  difficulty: int
+  count: int
+  inserted: int
+  generated: int
+  rejected: dict[int, int]
+  duplicates: int
+  reserved: int
+  from_reserve: int
+  reserve_sizes: dict[int, int]
+  puzzles_per_second: float
+  generated_per_second: float
+  error: Optional[str]
+  created_at: datetime
+  started_at: Optional[datetime]
+  finished_at: Optional[datetime]
+
+@dataclass
+class PopulateJobsResponse:
+  jobs: list[PopulateJobResponse]
+
+@dataclass
+class ImportPuzzlesResponse:
+  read: int
+  inserted: int
+  duplicates: int
+  errors: dict[str, int]
+  difficulties: dict[int, int]
+  seconds: float
+  puzzles_per_second: float
+
+@dataclass
+class ExecutorStatsResponse:
+  name: str
+  max_workers: int
+  max_queue: int
+  in_flight: int
+  queued: int
+  max_queued: int
+  submitted: int
+  completed: int
+  failed: int
+  rejected: int
+
+@dataclass
+class ExecutorsResponse:
+  executors: list[ExecutorStatsResponse]
@@ -0,0 +1,75 @@
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable
+import multiprocessing
+import os
+
+from app.core.settings import settings
+from app.libs.bounded_executor import BoundedExecutor
+from app.schemes.Sudoku import ExecutorsResponse, ExecutorStatsResponse
+
+
+class ExecutorService:
+  """
+  The executors shared by the requests of this process, so the blocking and
+  CPU bound work runs off the event loop, on a bounded number of workers:
+
+  - blocking, a thread pool for the blocking calls, like the Firebase and
+    Brevo APIs,
+  - solver, a process pool for the solver and the puzzle generation.
+
+  A slow email or a hard solve only holds its own worker, and a full queue
+  turns the next tasks away with ExecutorFull instead of piling them up.
+
+  The bulk jobs on the solver, the puzzle generation and import, keep at
+  most bulk_workers tasks on it, so a worker and the whole queue are left
+  to the requests.
+  """
+
+  def __init__(self):
+    self.blocking = BoundedExecutor(
+      "blocking",
+      lambda workers: ThreadPoolExecutor(workers, thread_name_prefix="blocking"),
+      settings.BLOCKING_WORKERS,
+      settings.BLOCKING_QUEUE_SIZE,
+    )
+    # The workers are spawned instead of forked, see generate_puzzles.
+    self.solver = BoundedExecutor(
+      "solver",
+      lambda workers: ProcessPoolExecutor(workers, multiprocessing.get_context("spawn")),
+      settings.SOLVER_WORKERS or os.cpu_count() or 1,
+      settings.SOLVER_QUEUE_SIZE,
+    )
+    self.bulk_workers = max(1, self.solver.max_workers - 1)
+
+  async def run_blocking(self, fn: Callable, *args: Any) -> Any:
+    return await self.blocking.run(fn, *args)
+
+  def spawn_blocking(self, fn: Callable, *args: Any) -> Future:
+    """
+    Runs a blocking call in the background, see BoundedExecutor.spawn.
+    """
+    return self.blocking.spawn(fn, *args)
+
+  async def run_solver(self, fn: Callable, *args: Any) -> Any:
+    """
+    Runs FN in a worker process, it must be picklable, like a function of a
+    module, and so must be its arguments and its result.
+    """
+    return await self.solver.run(fn, *args)
+
+  def get_stats(self) -> ExecutorsResponse:
+    return ExecutorsResponse(executors=[
+      ExecutorStatsResponse(**vars(executor.stats()))
+      for executor in (self.blocking, self.solver)
+    ])
+
+  def shutdown(self) -> None:
+    self.blocking.shutdown()
+    self.solver.shutdown()
+
+
+@lru_cache
+def get_executor_service() -> ExecutorService:
+  """Returns a cached instance of ExecutorService."""
+  return ExecutorService()
@@ -0,0 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from uuid import UUID
+import threading
+import time
+import traceback
+
+from app.repositories.SudokuRegistryRepository import get_sudoku_registry_repository, SudokuRegistryRepository
+from app.dependencies.database import database
+from app.core.database import SessionLocal
+from app.core.settings import settings
+from app.entities.SudokuLeaderboard import PERIOD_TODAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_ALL_TIME, LEADERBOARD_SIZE, get_period_start
+from app.entities.SudokuRegistry import SudokuRegistry
+from app.libs.leaderboard_index import LeaderboardIndex, Leaderboard, make_entry
+
+
+# How far back the consistency check looks for the entries submitted through
+# an other process, before the previous check, for the transactions that
+# were still open.
+CATCH_UP_MARGIN = timedelta(minutes=5)
+
+
+class LeaderboardIndexService:
+  """
+  Keeps the leaderboards in memory, see LeaderboardIndex, so they are read
+  without going to the database.
+
+  The index is loaded from sudoku_registry in the background at startup,
+  and checked against it every LEADERBOARD_INDEX_CHECK_INTERVAL seconds: the
+  entries submitted through an other process are added, and the index is
+  loaded again if the counts still differ. The leaderboards of a period are
+  read from sudoku_registry in the background too when it rolls over.
+  Until the index or the leaderboards asked for are loaded, or if the index
+  is disabled, is_ready is False and the callers use the repository. A load
+  that failed is tried again after LEADERBOARD_INDEX_CHECK_INTERVAL seconds.
+  """
+
+  def __init__(self, sudoku_registry_repository: SudokuRegistryRepository):
+    self.__sudoku_registry_repository = sudoku_registry_repository
+    self.__index = LeaderboardIndex()
+    self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="leaderboard-index")
+    self.__lock = threading.Lock()
+    self.__busy = False
+    self.__checked_at = 0.0
+    self.__failed_at: Optional[float] = None
+    self.__synced_at: Optional[datetime] = None
+
+  def __submit(self, task) -> None:
+    # One load or check at a time, the others are skipped.
+    with self.__lock:
+      if self.__busy:
+        return
+      self.__busy = True
+
+    self.__executor.submit(self.__run, task)
+
+  def __run(self, task) -> None:
+    try:
+      task()
+      self.__failed_at = None
+    except Exception:
+      traceback.print_exc()
+      self.__failed_at = time.monotonic()
+    finally:
+      self.__checked_at = time.monotonic()
+      with self.__lock:
+        self.__busy = False
+      # The session of this thread is not closed by a request.
+      SessionLocal.remove()
+
+  def __entries(self, since: Optional[datetime] = None):
+    return (
+      (difficulty, make_entry(solving_time, created_at, registry_id, user_id), username)
+      for difficulty, solving_time, created_at, registry_id, user_id, username
+      in self.__sudoku_registry_repository.stream_leaderboard_entries(since=since)
+    )
+
+  @staticmethod
+  def __period_starts() -> dict[str, datetime]:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return {period: get_period_start(period, now) for period in (PERIOD_TODAY, PERIOD_WEEK, PERIOD_MONTH)}
+
+  def __load(self) -> None:
+    synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    self.__index.replace(self.__entries())
+    self.__synced_at = synced_at
+    self.__roll(force=True)
+
+  def __roll(self, force: bool = False) -> None:
+    # Only the entries of the new periods are read.
+    for period, start in self.__period_starts().items():
+      if force or not self.__index.has_period(period, start):
+        self.__index.replace_period(period, start, self.__entries(since=start))
+
+  def __check(self) -> None:
+    synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    for difficulty, solving_time, created_at, registry_id, user_id, username in self.__sudoku_registry_repository.stream_leaderboard_entries(since=self.__synced_at - CATCH_UP_MARGIN):
+      self.__index.add(difficulty, make_entry(solving_time, created_at, registry_id, user_id), username)
+
+    counts = self.__sudoku_registry_repository.count_leaderboard_entries()
+    sizes = {difficulty: size for difficulty, size in self.__index.sizes().items() if size}
+    if counts != sizes:
+      print(f"Leaderboard index out of sync, {sizes} entries instead of {counts}, loading it again...")
+      self.__load()
+    else:
+      self.__synced_at = synced_at
+      self.__roll()
+
+  def start(self) -> None:
+    """
+    Loads the index in the background.
+    """
+    if settings.LEADERBOARD_INDEX:
+      self.__submit(self.__load)
+
+  def wait(self) -> None:
+    """
+    Waits for the load or check in progress, if any.
+    """
+    self.__executor.submit(lambda: None).result()
+
+  def is_ready(self, period: str = PERIOD_ALL_TIME, period_start: Optional[datetime] = None) -> bool:
+    """
+    Checks if the leaderboards of PERIOD since PERIOD_START can be read from
+    the index, and starts loading what is missing, or a consistency check if
+    one is due.
+    """
+    if not settings.LEADERBOARD_INDEX:
+      return False
+
+    now = time.monotonic()
+    interval = float(settings.LEADERBOARD_INDEX_CHECK_INTERVAL)
+    retry = self.__failed_at is None or now - self.__failed_at > interval
+
+    if not self.__index.loaded:
+      if retry:
+        self.__submit(self.__load)
+      return False
+
+    if period != PERIOD_ALL_TIME and not self.__index.has_period(period, period_start):
+      if retry:
+        self.__submit(self.__roll)
+      return False
+
+    if now - self.__checked_at > interval:
+      self.__submit(self.__check)
+
+    return True
+
+  def add(self, difficulty: int, sudoku_registry: SudokuRegistry, username: str) -> None:
+    if not sudoku_registry.is_applicable:
+      return
+
+    entry = make_entry(sudoku_registry.solving_time, sudoku_registry.created_at, sudoku_registry.id, sudoku_registry.user_id)
+    self.__index.add(difficulty, entry, username)
+
+  def remove(self, sudoku_registry_id: UUID) -> None:
+    self.__index.remove(sudoku_registry_id)
+
+  def rename_user(self, user_id: UUID, username: str) -> None:
+    self.__index.rename(user_id, username)
+
+  def get_leaderboard(self, difficulty: int, period: str, period_start: datetime, limit: int = LEADERBOARD_SIZE) -> list[tuple[str, UUID, float]]:
+    """
+    Returns the username, user id and solving time of the best entries, see
+    SudokuRegistryRepository.get_leaderboard.
+    """
+    usernames = self.__index.usernames
+    entries = self.__index.read(difficulty, period, self.__start(period, period_start), lambda board: board.top(limit))
+    return [(usernames.get(user_id), user_id, solving_time) for solving_time, _, _, user_id in entries]
+
+  def get_user_place(self, user_id: UUID, difficulty: int, period: str, period_start: datetime) -> Optional[tuple[float, int]]:
+    """
+    Returns the best solving time of a user with its place, see
+    SudokuRegistryRepository.get_user_place_in_leaderboard.
+    """
+    place = self.__index.read(difficulty, period, self.__start(period, period_start), lambda board: board.place(user_id))
+    if place is None:
+      return None
+
+    entry, rank = place
+    return entry[0], rank
+
+  def get_broken_record_user_id(self, difficulty: int, user_id: UUID, solving_time: float, limit: int = LEADERBOARD_SIZE) -> Optional[UUID]:
+    """
+    See SudokuRegistryRepository.get_broken_record_user_if_any.
+    """
+    def find(board: Leaderboard) -> Optional[UUID]:
+      for entry_time, _, _, entry_user_id in board.entries.islice(0, limit):
+        if entry_time > solving_time and entry_user_id != user_id:
+          return entry_user_id
+      return None
+
+    return self.__index.read(difficulty, PERIOD_ALL_TIME, None, find)
+
+  @staticmethod
+  def __start(period: str, period_start: datetime) -> Optional[datetime]:
+    return None if period == PERIOD_ALL_TIME else period_start
+
+
+@lru_cache
+def get_leaderboard_index_service() -> LeaderboardIndexService:
+  """Returns a cached instance of LeaderboardIndexService."""
+  return LeaderboardIndexService(get_sudoku_registry_repository(database))
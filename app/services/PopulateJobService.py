@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+from uuid import UUID, uuid4
+import threading
+import time
+import traceback
+
+from app.repositories.SudokuRepository import get_sudoku_repository, SudokuRepository
+from app.dependencies.database import database
+from app.core.database import SessionLocal
+from app.core.settings import settings
+from app.services.ExecutorService import get_executor_service, ExecutorService
+from app.libs.puzzle_generator import generate_puzzles, GenerationStats, PuzzleReserve
+from app.schemes.Sudoku import PopulateJobResponse
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+
+class PopulateJob:
+  """
+  A request to add COUNT puzzles of DIFFICULTY to the database, run in the
+  background by PopulateJobService.
+  """
+
+  def __init__(self, difficulty: int, count: int, reserve: PuzzleReserve):
+    self.id = uuid4()
+    self.difficulty = difficulty
+    self.count = count
+    self.status = JOB_QUEUED
+    self.inserted = 0
+    self.error: Optional[str] = None
+    self.stats = GenerationStats()
+    self.stop = threading.Event()
+    self.reserve = reserve
+    self.created_at = datetime.now(timezone.utc)
+    self.started_at: Optional[datetime] = None
+    self.finished_at: Optional[datetime] = None
+    self.__started = 0.0
+    self.__finished = 0.0
+
+  def start(self) -> None:
+    self.status = JOB_RUNNING
+    self.started_at = datetime.now(timezone.utc)
+    self.__started = time.perf_counter()
+
+  def finish(self, status: str) -> None:
+    self.status = status
+    self.finished_at = datetime.now(timezone.utc)
+    self.__finished = time.perf_counter()
+
+  def elapsed(self) -> float:
+    if self.started_at is None:
+      return 0.0
+
+    return (self.__finished if self.finished_at else time.perf_counter()) - self.__started
+
+  def to_response(self) -> PopulateJobResponse:
+    elapsed = self.elapsed()
+
+    return PopulateJobResponse(
+      job_id=self.id,
+      status=self.status,
+      difficulty=self.difficulty,
+      count=self.count,
+      inserted=self.inserted,
+      generated=self.stats.generated,
+      rejected=dict(self.stats.rejected),
+      duplicates=self.stats.duplicates,
+      reserved=self.stats.reserved,
+      from_reserve=self.stats.from_reserve,
+      reserve_sizes=self.reserve.sizes(),
+      puzzles_per_second=self.inserted / elapsed if elapsed else 0.0,
+      generated_per_second=self.stats.generated / elapsed if elapsed else 0.0,
+      error=self.error,
+      created_at=self.created_at,
+      started_at=self.started_at,
+      finished_at=self.finished_at,
+    )
+
+
+class PopulateJobService:
+  """
+  Keeps the populate jobs of this process and runs them one at a time on a
+  background thread, every job already takes the share of the solver
+  executor left to the bulk jobs, see ExecutorService.
+  The puzzles generated for an other difficulty are kept in a reserve shared
+  by the jobs.
+  """
+
+  def __init__(self, sudoku_repository: SudokuRepository, executor_service: ExecutorService):
+    self.__sudoku_repository = sudoku_repository
+    self.__executor_service = executor_service
+    self.__jobs: dict[UUID, PopulateJob] = {}
+    self.__reserve = PuzzleReserve(settings.GENERATOR_RESERVE_SIZE)
+    self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="populate")
+
+  def __run(self, job: PopulateJob) -> None:
+    # Cancelled while queued.
+    if job.stop.is_set():
+      return
+
+    job.start()
+    batch = []
+
+    try:
+      for batch in generate_puzzles(
+        job.difficulty,
+        job.count,
+        workers=self.__executor_service.bulk_workers,
+        batch_size=settings.GENERATOR_BATCH_SIZE,
+        stats=job.stats,
+        stop=job.stop,
+        reserve=job.reserve,
+        executor=self.__executor_service.solver,
+      ):
+        job.inserted += self.__sudoku_repository.create_sudokus(job.difficulty, batch)
+        batch = []
+
+      job.finish(JOB_CANCELLED if job.stop.is_set() else JOB_COMPLETED)
+
+    except Exception as e:
+      traceback.print_exc()
+      job.error = str(e)
+      job.finish(JOB_FAILED)
+
+      # The batch that could not be inserted, maybe taken from the reserve,
+      # is kept for the next job.
+      for puzzle in batch:
+        job.reserve.put(job.difficulty, puzzle)
+
+    finally:
+      # The session of this thread is not closed by a request.
+      SessionLocal.remove()
+
+  def submit(self, difficulty: int, count: int) -> PopulateJob:
+    job = PopulateJob(difficulty, count, self.__reserve)
+    self.__jobs[job.id] = job
+    self.__executor.submit(self.__run, job)
+    return job
+
+  def get_job(self, job_id: UUID) -> PopulateJob:
+    job = self.__jobs.get(job_id)
+
+    if job is None:
+      raise Exception("Job not found")
+
+    return job
+
+  def get_jobs(self) -> list[PopulateJob]:
+    return sorted(self.__jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+  def cancel(self, job_id: UUID) -> PopulateJob:
+    job = self.get_job(job_id)
+    job.stop.set()
+
+    # A queued job is dropped when its turn comes.
+    if job.status == JOB_QUEUED:
+      job.finish(JOB_CANCELLED)
+
+    return job
+
+
+@lru_cache
+def get_populate_job_service() -> PopulateJobService:
+  """Returns a cached instance of PopulateJobService."""
+  return PopulateJobService(get_sudoku_repository(database), get_executor_service())
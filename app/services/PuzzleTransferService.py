@@ -0,0 +1,115 @@
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+import time
+
+from app.repositories.SudokuRepository import SudokuRepository
+from app.repositories.SudokuRegistryRepository import SudokuRegistryRepository
+from app.core.database import SessionFactory
+from app.core.settings import settings
+from app.libs.bounded_executor import BoundedExecutor
+from app.libs.sudoku_grid import SudokuGrid
+from app.libs.puzzle_io import import_puzzles, regrade_puzzles, format_line, ImportStats, FORMATS, FORMAT_LINEAR
+from app.schemes.Sudoku import ImportPuzzlesResponse
+
+
+class PuzzleTransferService:
+  """
+  Loads puzzle files into the database and dumps the database into puzzle
+  files, streaming both ways. Used by the admin endpoints and by app.cli,
+  which also grades the stored puzzles again with it.
+
+  Both run on threads of their own, the blocking executor or the ones of a
+  streaming response, so they open a session of their own instead of the
+  scoped one, which would stay attached to the thread.
+  """
+
+  def import_puzzles(self, lines: Iterable[str | bytes], workers: Optional[int] = None, executor: Optional[BoundedExecutor] = None) -> ImportPuzzlesResponse:
+    """
+    Imports the puzzles of LINES, checked on EXECUTOR with at most WORKERS
+    tasks on it, or on a process pool of its own, of GENERATOR_WORKERS
+    processes by default, see puzzle_io.import_puzzles.
+    """
+    stats = ImportStats()
+    started = time.perf_counter()
+
+    with SessionFactory() as session:
+      sudoku_repository = SudokuRepository(session)
+
+      for puzzles in import_puzzles(
+        lines,
+        workers=workers or settings.GENERATOR_WORKERS,
+        chunk_size=settings.GENERATOR_BATCH_SIZE,
+        stats=stats,
+        executor=executor,
+      ):
+        inserted = sudoku_repository.insert_sudokus(puzzles)
+        stats.inserted += inserted
+        stats.duplicates += len(puzzles) - inserted
+
+    elapsed = time.perf_counter() - started
+
+    return ImportPuzzlesResponse(
+      read=stats.read,
+      inserted=stats.inserted,
+      duplicates=stats.duplicates,
+      errors=stats.errors,
+      difficulties=stats.difficulties,
+      seconds=elapsed,
+      puzzles_per_second=stats.inserted / elapsed if elapsed else 0.0,
+    )
+
+  def regrade_puzzles(self, workers: Optional[int] = None) -> tuple[int, dict[tuple[int, int], int]]:
+    """
+    Grades every stored puzzle again with get_difficulty, on WORKERS
+    processes, GENERATOR_WORKERS by default, and moves the ones whose
+    difficulty changed, see SudokuRepository.set_difficulties. Returns the
+    number of puzzles graded and the number of puzzles moved, by (old
+    difficulty, new difficulty).
+    """
+    graded = 0
+    moved = {}
+    difficulties = []
+
+    with SessionFactory() as session:
+      for puzzles in regrade_puzzles(
+        SudokuRepository(session).stream_sudoku_grades(),
+        workers=workers or settings.GENERATOR_WORKERS,
+        chunk_size=settings.GENERATOR_BATCH_SIZE,
+      ):
+        graded += len(puzzles)
+        for sudoku_id, old_difficulty, difficulty in puzzles:
+          if difficulty != old_difficulty:
+            moved[old_difficulty, difficulty] = moved.get((old_difficulty, difficulty), 0) + 1
+            difficulties.append((sudoku_id, difficulty))
+
+    with SessionFactory() as session:
+      if difficulties:
+        SudokuRepository(session).set_difficulties(difficulties)
+      # Also done when nothing moved, in case a previous run stopped in
+      # between.
+      SudokuRegistryRepository(session).refresh_difficulties()
+
+    return graded, moved
+
+  def export_puzzles(self, format: str = FORMAT_LINEAR, difficulty: Optional[int] = None) -> Iterator[str]:
+    if format not in FORMATS:
+      raise ValueError(f"Unknown format, expected one of {', '.join(FORMATS)}")
+
+    return self.__export_lines(format, difficulty)
+
+  def __export_lines(self, format: str, difficulty: Optional[int]) -> Iterator[str]:
+    with SessionFactory() as session:
+      for _, puzzle_data in SudokuRepository(session).stream_sudokus(difficulty):
+        grid = SudokuGrid.from_bytes(bytes(puzzle_data))
+
+        # Grids that do not fit the format are left out.
+        if format != FORMAT_LINEAR and grid.block_size != 3:
+          continue
+
+        yield format_line(grid, format) + "\n"
+
+
+@lru_cache
+def get_puzzle_transfer_service() -> PuzzleTransferService:
+  """Returns a cached instance of PuzzleTransferService."""
+  return PuzzleTransferService()
@@ -4,68 +4,79 @@ from typing import Optional
 from uuid import UUID
 import os
 
-from app.repositories.SudokuRegistryRepository import get_sudoku_registry_repository, SudokuRegistryRepository
-from app.repositories.UserRepository import get_user_repository, UserRepository
-
-from app.dependencies.database import database
+from app.repositories.SudokuRegistryRepository import get_async_sudoku_registry_repository, AsyncSudokuRegistryRepository
+from app.repositories.UserRepository import get_async_user_repository, AsyncUserRepository
+from app.services.LeaderboardIndexService import get_leaderboard_index_service, LeaderboardIndexService
+from app.services.SudokuService import get_sudoku_service
+from app.services.ExecutorService import get_executor_service, ExecutorService
+
+from app.entities.SudokuLeaderboard import PERIOD_TODAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_ALL_TIME, get_period_start
+from app.dependencies.database import async_database
 from app.dependencies.sudoku_service import sudoku_service
 from app.schemes.SudokuLeaderboard import SudokuLeaderboardResponse, SudokuLeaderboardElement, SubmitSudokuResponse, UserRecordsResponse, UserRecordsElement
 from app.utils.EmailUtil import EmailUtil
+from app.libs.bounded_executor import ExecutorFull
 from app.core.settings import settings
 
 
 class SudokuRegistryService:
-  def __init__(self, sudoku_registry_repository: SudokuRegistryRepository, user_repository: UserRepository, sudoku_service: sudoku_service):
+  def __init__(self, sudoku_registry_repository: AsyncSudokuRegistryRepository, user_repository: AsyncUserRepository, sudoku_service: sudoku_service, leaderboard_index_service: LeaderboardIndexService, executor_service: ExecutorService):
     self.__sudoku_registry_repository = sudoku_registry_repository
     self.__user_repository = user_repository
     self.__sudoku_service = sudoku_service
+    self.__leaderboard_index_service = leaderboard_index_service
+    self.__executor_service = executor_service
 
-  def get_leaderboard_today(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
-    beginning_of_today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    return self.get_leaderboard(difficulty, firebase_user_id, beginning_of_today)
+  async def get_leaderboard_today(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
+    return await self.get_leaderboard(difficulty, firebase_user_id, PERIOD_TODAY)
 
-  def get_leaderboard_week(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
-    beginning_of_week = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    beginning_of_week = beginning_of_week.replace(day=beginning_of_week.day - min(beginning_of_week.weekday(), beginning_of_week.day - 1))
-    return self.get_leaderboard(difficulty, firebase_user_id, beginning_of_week)
+  async def get_leaderboard_week(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
+    return await self.get_leaderboard(difficulty, firebase_user_id, PERIOD_WEEK)
 
-  def get_leaderboard_month(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
-    beginning_of_month = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    beginning_of_month = beginning_of_month.replace(day=1)
-    return self.get_leaderboard(difficulty, firebase_user_id, beginning_of_month)
+  async def get_leaderboard_month(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
+    return await self.get_leaderboard(difficulty, firebase_user_id, PERIOD_MONTH)
 
-  def get_leaderboard_all_time(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
-    return self.get_leaderboard(difficulty, firebase_user_id)
+  async def get_leaderboard_all_time(self, difficulty: int, firebase_user_id: str) -> SudokuLeaderboardResponse:
+    return await self.get_leaderboard(difficulty, firebase_user_id, PERIOD_ALL_TIME)
 
-  def get_leaderboard(self, difficulty: int, firebase_user_id: str, beginning_time: Optional[datetime] = None) -> SudokuLeaderboardResponse:
-    user = self.__user_repository.get_user_by_firebase_id(firebase_user_id)
+  async def get_leaderboard(self, difficulty: int, firebase_user_id: str, period: str = PERIOD_ALL_TIME) -> SudokuLeaderboardResponse:
+    user = await self.__user_repository.get_user_by_firebase_id(firebase_user_id)
     if not user:
       raise Exception("User not found")
     user_id = user.id
 
-    if not beginning_time:
-      leaderboard_data = self.__sudoku_registry_repository.get_all_time_leaderboard(difficulty)
+    period_start = get_period_start(period, datetime.now(timezone.utc).replace(tzinfo=None))
+
+    if self.__leaderboard_index_service.is_ready(period, period_start):
+      leaderboard_data = self.__leaderboard_index_service.get_leaderboard(difficulty, period, period_start)
     else:
-      leaderboard_data = self.__sudoku_registry_repository.get_leaderboard(difficulty, beginning_time)
-  
+      # The leaderboards are kept up to date as the entries are submitted,
+      # see SudokuRegistryRepository.create_sudoku_registry.
+      leaderboard_data = await self.__sudoku_registry_repository.get_leaderboard(difficulty, period, period_start)
+
     leaderboard = []
-    user_rank = 1
+    user_rank = len(leaderboard_data) + 1
     user_solving_time = -1
-    for entry in leaderboard_data:
-      if entry.user_id == user_id:
-        user_solving_time = entry.solving_time
+    for rank, (user_name, entry_user_id, solving_time) in enumerate(leaderboard_data, start=1):
+      if entry_user_id == user_id and user_solving_time < 0:
+        user_rank = rank
+        user_solving_time = solving_time
       leaderboard.append(SudokuLeaderboardElement(
-        user_name=entry.user.username,
-        rank=user_rank,
-        solving_time=entry.solving_time
+        user_name=user_name,
+        rank=rank,
+        solving_time=solving_time
       ))
-      user_rank += 1
 
     if user_solving_time < 0:
-      user_leaderboard_elemet = self.__sudoku_registry_repository.get_user_place_in_all_time_leaderboard(user_id, difficulty)
-      if user_leaderboard_elemet:
-        user_solving_time = user_leaderboard_elemet[0].solving_time
-        user_rank = user_leaderboard_elemet[1]
+      if self.__leaderboard_index_service.is_ready(period, period_start):
+        user_place = self.__leaderboard_index_service.get_user_place(user_id, difficulty, period, period_start)
+      else:
+        if period == PERIOD_ALL_TIME:
+          user_place = await self.__sudoku_registry_repository.get_user_place_in_all_time_leaderboard(user_id, difficulty)
+        else:
+          user_place = await self.__sudoku_registry_repository.get_user_place_in_leaderboard(user_id, difficulty, period_start)
+      if user_place:
+        user_solving_time, user_rank = user_place
 
     return SudokuLeaderboardResponse(
       leaderboard=leaderboard,
@@ -73,25 +84,33 @@ class SudokuRegistryService:
       user_solving_time=user_solving_time
     )
 
-  def get_user_records(self, firebase_user_id: str, difficulty: int) -> UserRecordsResponse:
-    user = self.__user_repository.get_user_by_firebase_id(firebase_user_id)
+  async def get_user_records(self, firebase_user_id: str, difficulty: int) -> UserRecordsResponse:
+    user = await self.__user_repository.get_user_by_firebase_id(firebase_user_id)
     if not user:
       raise Exception("User not found")
     user_id = user.id
 
-    user_records = self.__sudoku_registry_repository.get_user_records(user_id, difficulty)
+    user_records = await self.__sudoku_registry_repository.get_user_records(user_id, difficulty)
 
     return UserRecordsResponse(
       records=user_records
     )
 
+  async def delete_sudoku_registry(self, sudoku_registry_id: UUID) -> None:
+    sudoku_registry = await self.__sudoku_registry_repository.get_sudoku_registry_by_id(sudoku_registry_id)
+    if not sudoku_registry:
+      raise Exception("Sudoku registry not found")
+
+    await self.__sudoku_registry_repository.delete_sudoku_registry(sudoku_registry)
+    self.__leaderboard_index_service.remove(sudoku_registry_id)
+
 
-  def submit_sudoku(self, firebase_user_id: str, sudoku_id: UUID, solving_time: float, is_applicable: bool, user_solution: str) -> SubmitSudokuResponse:
-    user = self.__user_repository.get_user_by_firebase_id(firebase_user_id)
+  async def submit_sudoku(self, firebase_user_id: str, sudoku_id: UUID, solving_time: float, is_applicable: bool, user_solution: str) -> SubmitSudokuResponse:
+    user = await self.__user_repository.get_user_by_firebase_id(firebase_user_id)
     if not user:
       raise Exception("User not found")
     user_id = user.id
-    is_solution_correct = self.__sudoku_service.validate_sudoku(sudoku_id, user_solution)
+    is_solution_correct = await self.__sudoku_service.validate_sudoku(sudoku_id, user_solution)
     if not is_solution_correct and settings.DEVELOPMENT == False:
       return SubmitSudokuResponse(
         is_correct=False,
@@ -100,32 +119,48 @@ class SudokuRegistryService:
 
     # if is_applicable & registry places in a better place, send email to user which was placed lower
     if is_applicable:
-      sudoku = self.__sudoku_service.get_sudoku_by_id(sudoku_id)
-      broken_record_user = self.__sudoku_registry_repository.get_broken_record_user_if_any(sudoku.difficulty, user_id, solving_time)
+      sudoku = await self.__sudoku_service.get_sudoku_by_id(sudoku_id)
+      if self.__leaderboard_index_service.is_ready():
+        broken_record_user_id = self.__leaderboard_index_service.get_broken_record_user_id(sudoku.difficulty, user_id, solving_time)
+        broken_record_user = await self.__user_repository.get_user_by_id(broken_record_user_id) if broken_record_user_id else None
+      else:
+        broken_record_user = await self.__sudoku_registry_repository.get_broken_record_user_if_any(sudoku.difficulty, user_id, solving_time)
 
       if broken_record_user and settings.DEVELOPMENT == False:
-        email_to_send = broken_record_user.email
-        current_dir = os.path.dirname(__file__)
-        parent_dir = os.path.dirname(current_dir)
-        template_path = os.path.join(parent_dir, "assets/new_record/new_record.html")
+        # Sent in the background, the submission does not wait for the Brevo
+        # API, and is not failed by it.
+        try:
+          self.__executor_service.spawn_blocking(self.__send_new_record_email, broken_record_user.email)
+        except ExecutorFull:
+          print(f"Blocking executor full, new record email to {broken_record_user.email} not sent")
 
-        html_content = EmailUtil.read_from_html(template_path)
-        EmailUtil.send_email(email_to_send, settings.MAIL_SENDER, "New Record in Leaderboard!", html_content)
 
-
-    new_registry = self.__sudoku_registry_repository.create_sudoku_registry(user_id, sudoku_id, solving_time, is_applicable)
+    new_registry = await self.__sudoku_registry_repository.create_sudoku_registry(user_id, sudoku_id, solving_time, is_applicable)
+    if is_applicable:
+      self.__leaderboard_index_service.add(sudoku.difficulty, new_registry, user.username)
 
     return SubmitSudokuResponse(
       is_correct=True,
       message="Solution is correct"
     )
 
+  @staticmethod
+  def __send_new_record_email(email_to_send: str) -> None:
+    current_dir = os.path.dirname(__file__)
+    parent_dir = os.path.dirname(current_dir)
+    template_path = os.path.join(parent_dir, "assets/new_record/new_record.html")
+
+    html_content = EmailUtil.read_from_html(template_path)
+    EmailUtil.send_email(email_to_send, settings.MAIL_SENDER, "New Record in Leaderboard!", html_content)
+
 
 @lru_cache
-def get_sudoku_registry_service(database: database, sudoku_service: sudoku_service) -> SudokuRegistryService:
+def get_sudoku_registry_service() -> SudokuRegistryService:
   """Returns a cached instance of SudokuRegistryService."""
   return SudokuRegistryService(
-    get_sudoku_registry_repository(database),
-    get_user_repository(database),
-    sudoku_service,
+    get_async_sudoku_registry_repository(async_database),
+    get_async_user_repository(async_database),
+    get_sudoku_service(),
+    get_leaderboard_index_service(),
+    get_executor_service(),
   )
@@ -1,77 +1,124 @@
 from functools import lru_cache
+from typing import Iterable, Iterator, Optional
 from uuid import UUID
+import numpy
 
-from app.repositories.SudokuRepository import get_sudoku_repository, SudokuRepository
+from app.repositories.SudokuRepository import get_async_sudoku_repository, AsyncSudokuRepository
 from app.dependencies.user_service import user_service
-from app.dependencies.database import database
-from app.libs.sudoku_grid import SudokuGrid
+from app.dependencies.database import async_database
+from app.libs.bounded_executor import ExecutorFull
+from app.libs.sudoku_grid import SudokuGrid, solve_bytes
+from app.schemes.Sudoku import PopulateJobResponse, PopulateJobsResponse, ImportPuzzlesResponse, ExecutorsResponse
 from app.services.UserService import UserService, get_user_service
+from app.services.PopulateJobService import PopulateJobService, get_populate_job_service
+from app.services.PuzzleTransferService import PuzzleTransferService, get_puzzle_transfer_service
+from app.services.ExecutorService import ExecutorService, get_executor_service
 
 
 class SudokuService:
-    def __init__(self, sudoku_repository: SudokuRepository, user_service: user_service):
+    def __init__(
+        self,
+        sudoku_repository: AsyncSudokuRepository,
+        user_service: user_service,
+        populate_job_service: PopulateJobService,
+        puzzle_transfer_service: PuzzleTransferService,
+        executor_service: ExecutorService,
+    ):
         self.__sudoku_repository = sudoku_repository
         self.__user_service = user_service
+        self.__populate_job_service = populate_job_service
+        self.__puzzle_transfer_service = puzzle_transfer_service
+        self.__executor_service = executor_service
 
-    def get_random_sudoku_by_difficulty(self, difficulty: int):
-        return self.__sudoku_repository.get_random_sudoku_by_difficulty(difficulty)
+    async def get_random_sudoku_by_difficulty(self, difficulty: int):
+        return await self.__sudoku_repository.get_random_sudoku_by_difficulty(difficulty)
 
-    def get_sudoku_by_id(self, sudoku_id: UUID):
-        return self.__sudoku_repository.get_sudoku_by_id(sudoku_id)
+    async def get_sudoku_by_id(self, sudoku_id: UUID):
+        return await self.__sudoku_repository.get_sudoku_by_id(sudoku_id)
 
-    def populate_sudoku_registry(
-        self, difficulty: int, count: int, firebase_user_id: str
-    ):
-        print(type(self.__user_service))
-        user = self.__user_service.getUserByFirebaseId(firebase_user_id)
+    async def __check_admin(self, firebase_user_id: str) -> None:
+        user = await self.__user_service.getUserByFirebaseId(firebase_user_id)
         if user is None:
             raise Exception("User not found")
-        if self.__user_service.am_i_admin(firebase_user_id) is False:
+        if await self.__user_service.am_i_admin(firebase_user_id) is False:
             raise Exception("Access denied")
 
-        while count > 0:
-            # create sudoku and save it to the database
-            grid = SudokuGrid.generate_unique_puzzle()
-            solution = grid.try_solve()
-
-            if solution is None:
-                print(".try_solve returned None, ignoring...")
-                print(
-                    "This might indicate some problems with the sudoku board generation or solving algorithms"
-                )
-                print(grid)
-                print(f"Linear notation: '{grid.linear_notation}'")
-                continue
-
-            required_assumptions = grid.try_solve_classify(solution.array)
-
-            if required_assumptions < 0:
-                print("Got difficulty score < 0, ignoring...")
-                print(
-                    "This might indicate some problems with the sudoku board classification algorithms"
-                )
-                print(grid)
-                print(f"Linear notation: '{grid.linear_notation}'")
-                continue
-
-            if (
-                difficulty == 0
-                and not 0 <= required_assumptions < 3
-                or difficulty == 1
-                and not 3 <= required_assumptions < 6
-                or difficulty == 2
-                and not 6 <= required_assumptions
-            ):
-                continue
-
-            self.__sudoku_repository.create_sudoku(difficulty, grid.linear_notation)
-
-            count -= 1
-
-    def validate_sudoku(self, puzzle_id: str, solution: str) -> bool:
+    async def populate_sudoku_registry(
+        self, difficulty: int, count: int, firebase_user_id: str
+    ) -> PopulateJobResponse:
+        await self.__check_admin(firebase_user_id)
+
+        # The puzzles are generated in the background, the job can be
+        # followed with get_populate_job.
+        return self.__populate_job_service.submit(difficulty, count).to_response()
+
+    async def get_populate_job(self, job_id: UUID, firebase_user_id: str) -> PopulateJobResponse:
+        await self.__check_admin(firebase_user_id)
+        return self.__populate_job_service.get_job(job_id).to_response()
+
+    async def get_populate_jobs(self, firebase_user_id: str) -> PopulateJobsResponse:
+        await self.__check_admin(firebase_user_id)
+        return PopulateJobsResponse(
+            jobs=[job.to_response() for job in self.__populate_job_service.get_jobs()]
+        )
+
+    async def cancel_populate_job(self, job_id: UUID, firebase_user_id: str) -> PopulateJobResponse:
+        await self.__check_admin(firebase_user_id)
+        return self.__populate_job_service.cancel(job_id).to_response()
+
+    async def get_executor_stats(self, firebase_user_id: str) -> ExecutorsResponse:
+        await self.__check_admin(firebase_user_id)
+        return self.__executor_service.get_stats()
+
+    async def import_puzzles(
+        self, lines: Iterable[str | bytes], firebase_user_id: str
+    ) -> ImportPuzzlesResponse:
+        await self.__check_admin(firebase_user_id)
+        # The import is CPU and database bound, it runs on the blocking
+        # executor instead of the event loop, and checks the lines on the
+        # share of the solver executor left to the bulk jobs.
+        return await self.__executor_service.run_blocking(
+            self.__puzzle_transfer_service.import_puzzles,
+            lines,
+            self.__executor_service.bulk_workers,
+            self.__executor_service.solver,
+        )
+
+    async def export_puzzles(
+        self, format: str, difficulty: Optional[int], firebase_user_id: str
+    ) -> Iterator[str]:
+        await self.__check_admin(firebase_user_id)
+        return self.__puzzle_transfer_service.export_puzzles(format, difficulty)
+
+    async def __get_solution(self, puzzle_id: UUID) -> Optional[numpy.ndarray]:
+        # The puzzle comes from the puzzle cache, with its solution.
+        sudoku = await self.__sudoku_repository.get_sudoku_by_id(puzzle_id)
+        if sudoku is None:
+            return None
+
+        if sudoku.solution is None:
+            # Puzzles stored before the solutions were, solved once on the
+            # solver executor and kept with the cached puzzle.
+            solution_data = await self.__executor_service.run_solver(solve_bytes, sudoku.puzzle_data)
+            if solution_data is None:
+                return None
+            sudoku.solution = SudokuGrid.from_bytes(solution_data)
+
+        return sudoku.solution.array
+
+    async def validate_sudoku(self, puzzle_id: UUID, solution: str) -> bool:
         try:
+            expected = await self.__get_solution(UUID(str(puzzle_id)))
+            if expected is None:
+                return False
+
+            # The solution is unique, so the submission must be equal to it.
             grid = SudokuGrid.from_linear_notation(solution)
-            return grid.is_solved()
+            return bool(numpy.array_equal(grid.array, expected))
+
+        except ExecutorFull:
+            # The solution was not checked, it is not wrong.
+            raise
 
         except Exception:
             return False
@@ -80,4 +127,10 @@ class SudokuService:
 @lru_cache
 def get_sudoku_service() -> SudokuService:
     """Returns a cached instance of SudokuService."""
-    return SudokuService(get_sudoku_repository(database), get_user_service())
+    return SudokuService(
+        get_async_sudoku_repository(async_database),
+        get_user_service(),
+        get_populate_job_service(),
+        get_puzzle_transfer_service(),
+        get_executor_service(),
+    )
@@ -2,17 +2,19 @@ from functools import lru_cache
 
 from app.entities.User import User
 
-from app.repositories.UserRepository import get_user_repository, UserRepository
-from app.dependencies.database import database
+from app.repositories.UserRepository import get_async_user_repository, AsyncUserRepository
+from app.services.LeaderboardIndexService import get_leaderboard_index_service, LeaderboardIndexService
+from app.dependencies.database import async_database
 from app.schemes.User import UserCreateResponse, UserUpdateResponse
 
 
 class UserService:
-  def __init__(self, user_repository: UserRepository):
+  def __init__(self, user_repository: AsyncUserRepository, leaderboard_index_service: LeaderboardIndexService):
     self.__user_repository = user_repository
+    self.__leaderboard_index_service = leaderboard_index_service
 
-  def getUserByFirebaseId(self, firebase_id: str) -> User:
-    user = self.__user_repository.get_user_by_firebase_id(firebase_id)
+  async def getUserByFirebaseId(self, firebase_id: str) -> User:
+    user = await self.__user_repository.get_user_by_firebase_id(firebase_id)
 
     if not user:
       raise Exception('User not found')
@@ -20,33 +22,34 @@ class UserService:
     return user
 
   async def createUser(self, firebase_id: str, username: str, email: str) -> UserCreateResponse:
-    user = self.__user_repository.get_user_by_firebase_id(firebase_id)
+    user = await self.__user_repository.get_user_by_firebase_id(firebase_id)
 
     if not user:
-      self.__user_repository.create_user(firebase_id, username, email)
+      await self.__user_repository.create_user(firebase_id, username, email)
 
     return UserCreateResponse(message='User created successfully')
 
   async def updateUser(self, requesterFirebaseAuthId: str, username: str) -> UserCreateResponse:
-    user = self.getUserByFirebaseId(requesterFirebaseAuthId)
+    user = await self.getUserByFirebaseId(requesterFirebaseAuthId)
 
     if username.strip() == '':
       raise Exception('Username cannot be empty')
 
-    if self.__user_repository.is_username_taken(username):
+    if await self.__user_repository.is_username_taken(username):
       raise Exception('Username is already taken')
 
     user.username = username
     await self.__user_repository.save_user(user)
+    self.__leaderboard_index_service.rename_user(user.id, username)
 
     return UserUpdateResponse(message='User updated successfully')
 
-  def am_i_admin(self, firebase_user_id: str) -> bool:
-    user = self.__user_repository.get_user_by_firebase_id(firebase_user_id)
+  async def am_i_admin(self, firebase_user_id: str) -> bool:
+    user = await self.__user_repository.get_user_by_firebase_id(firebase_user_id)
 
     return user.role == 1
 
 @lru_cache
 def get_user_service() -> UserService:
   """Returns a cached instance of UserService."""
-  return UserService(get_user_repository(database))
+  return UserService(get_async_user_repository(async_database), get_leaderboard_index_service())
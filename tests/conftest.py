@@ -0,0 +1,50 @@
+import os
+
+import pytest
+import pytest_asyncio
+
+# The settings are read when the app is imported, the engines of the app are
+# not used by the tests.
+for name, value in (('DATABASE_URL', 'sqlite://'), ('FIREBASE_AUTH_CREDENTIAL', '{}'), ('BREVO_API_KEY', ''), ('MAIL_SENDER', '')):
+  os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def db(tmp_path):
+  """
+  A session on a new SQLite database with every table.
+  """
+  from sqlalchemy import create_engine
+  from sqlalchemy.orm import Session
+
+  from app.core.database import Base
+  import app.entities
+
+  engine = create_engine(f'sqlite:///{tmp_path}/test.db')
+  Base.metadata.create_all(engine)
+
+  with Session(engine) as session:
+    yield session
+
+  engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_db(tmp_path):
+  """
+  An AsyncSession on a new SQLite database with every table, through
+  aiosqlite.
+  """
+  from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+  from app.core.database import Base, get_async_database_url
+  import app.entities
+
+  engine = create_async_engine(get_async_database_url(f'sqlite:///{tmp_path}/test.db'))
+  async with engine.begin() as connection:
+    await connection.run_sync(Base.metadata.create_all)
+
+  async with AsyncSession(engine, expire_on_commit=False) as session:
+    yield session
+
+  await engine.dispose()
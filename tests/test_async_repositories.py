@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.database import get_async_database_url
+from app.entities.SudokuLeaderboard import PERIOD_ALL_TIME, ALL_TIME_START
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.repositories.SudokuRegistryRepository import AsyncSudokuRegistryRepository
+from app.repositories.SudokuRepository import AsyncSudokuRepository, puzzle_cache
+from app.repositories.UserRepository import AsyncUserRepository
+
+
+def test_get_async_database_url():
+  assert get_async_database_url('postgresql://u:p@host/db') == 'postgresql+asyncpg://u:p@host/db'
+  assert get_async_database_url('postgres://u:p@host/db') == 'postgresql+asyncpg://u:p@host/db'
+  assert get_async_database_url('postgresql+psycopg2://host/db') == 'postgresql+asyncpg://host/db'
+  assert get_async_database_url('sqlite:///file.db') == 'sqlite+aiosqlite:///file.db'
+
+
+@pytest.mark.asyncio
+async def test_async_repositories(async_db):
+  users = AsyncUserRepository(async_db)
+  sudokus = AsyncSudokuRepository(async_db)
+  registries = AsyncSudokuRegistryRepository(async_db)
+  puzzle_cache.clear()
+
+  first = await users.create_user('firebase1', 'first', 'first@example.com')
+  second = await users.create_user('firebase2', 'second', 'second@example.com')
+  assert (await users.get_user_by_firebase_id('firebase1')).id == first.id
+  assert await users.is_username_taken('second')
+  assert not await users.is_username_taken('third')
+
+  puzzle = SudokuGrid.generate_unique_puzzle(3, rng=get_random(1))
+  sudoku = await sudokus.create_sudoku(1, puzzle.linear_notation)
+  assert (await sudokus.get_random_sudoku_by_difficulty(1)).id == sudoku.id
+  assert (await sudokus.get_sudoku_by_id(sudoku.id)).linear_notation == puzzle.linear_notation
+  assert await sudokus.get_random_sudoku_by_difficulty(2) is None
+
+  await registries.create_sudoku_registry(first.id, sudoku.id, 30.0, True)
+  await registries.create_sudoku_registry(second.id, sudoku.id, 20.0, True)
+
+  assert await registries.get_leaderboard(1, PERIOD_ALL_TIME, ALL_TIME_START) == [
+    ('second', second.id, 20.0),
+    ('first', first.id, 30.0),
+  ]
+  assert await registries.get_user_place_in_all_time_leaderboard(first.id, 1) == (30.0, 2)
+  assert (await registries.get_broken_record_user_if_any(1, first.id, 10.0)).id == second.id
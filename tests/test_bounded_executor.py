@@ -0,0 +1,64 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+from app.libs.bounded_executor import BoundedExecutor, ExecutorFull
+
+
+def make_executor(max_workers: int, max_queue: int) -> BoundedExecutor:
+  return BoundedExecutor('test', lambda workers: concurrent.futures.ThreadPoolExecutor(workers), max_workers, max_queue)
+
+
+def test_bounded_executor_rejects_when_full():
+  executor = make_executor(1, 1)
+  release = threading.Event()
+
+  running = executor.submit(release.wait)
+  queued = executor.submit(pow, 2, 10)
+  with pytest.raises(ExecutorFull):
+    executor.submit(pow, 2, 10)
+
+  stats = executor.stats()
+  assert (stats.in_flight, stats.queued, stats.max_queued, stats.rejected) == (2, 1, 1, 1)
+
+  release.set()
+  assert running.result() is True
+  assert queued.result() == 1024
+
+  stats = executor.stats()
+  assert (stats.in_flight, stats.queued, stats.submitted, stats.completed, stats.failed) == (0, 0, 2, 2, 0)
+  executor.shutdown()
+
+
+def test_bounded_executor_blocks_when_asked():
+  executor = make_executor(1, 0)
+  release = threading.Event()
+  executor.submit(release.wait)
+
+  submitted = threading.Event()
+  def submit():
+    executor.submit(pow, 2, 3, block=True)
+    submitted.set()
+
+  thread = threading.Thread(target=submit)
+  thread.start()
+  assert not submitted.wait(0.1)
+
+  release.set()
+  thread.join(5)
+  assert submitted.is_set()
+  executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_run():
+  executor = make_executor(2, 2)
+  assert await executor.run(pow, 3, 2) == 9
+
+  with pytest.raises(ZeroDivisionError):
+    await executor.run(divmod, 1, 0)
+
+  stats = executor.stats()
+  assert (stats.completed, stats.failed) == (1, 1)
+  executor.shutdown()
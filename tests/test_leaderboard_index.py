@@ -0,0 +1,74 @@
+import datetime
+import uuid
+
+import pytest
+
+from app.libs.leaderboard_index import LeaderboardIndex, make_entry
+
+
+def test_leaderboard_index():
+  users = [uuid.uuid4() for _ in range(3)]
+  now = datetime.datetime(2026, 10, 17, 12)
+  index = LeaderboardIndex()
+
+  index.replace([
+    (0, make_entry(30.0, now - datetime.timedelta(days=3), uuid.uuid4(), users[0]), 'a'),
+    (0, make_entry(20.0, None, uuid.uuid4(), users[1]), 'b'),
+    (1, make_entry(10.0, now, uuid.uuid4(), users[0]), 'a'),
+  ])
+  assert index.loaded
+  assert index.sizes() == {0: 2, 1: 1}
+
+  entry = make_entry(25.0, now, uuid.uuid4(), users[2])
+  assert index.add(0, entry, 'c')
+  assert not index.add(0, entry, 'c')
+
+  top = index.read(0, 'alltime', None, lambda board: board.top(20))
+  assert [solving_time for solving_time, _, _, _ in top] == [20.0, 25.0, 30.0]
+  assert index.read(0, 'alltime', None, lambda board: board.place(users[0]))[1] == 3
+
+  # Only the entries since the start of the period count, the leaderboards
+  # of a period are read from the database when it starts.
+  today = now.replace(hour=0)
+  with pytest.raises(LookupError):
+    index.read(0, 'today', today, len)
+  index.replace_period('today', today, [
+    (0, make_entry(25.0, now, top[1][2], users[2]), 'c'),
+    (0, make_entry(30.0, now - datetime.timedelta(days=3), top[2][2], users[0]), 'a'),
+  ])
+  assert index.has_period('today', today)
+  assert index.read(0, 'today', today, lambda board: board.place(users[2]))[1] == 1
+  assert index.read(0, 'today', today, lambda board: board.place(users[0])) is None
+
+  index.add(0, make_entry(5.0, now, uuid.uuid4(), users[0]), 'a')
+  assert index.read(0, 'today', today, lambda board: board.place(users[0]))[1] == 1
+  assert not index.has_period('today', today + datetime.timedelta(days=1))
+
+  # A removed entry leaves every leaderboard.
+  best = index.read(0, 'today', today, lambda board: board.place(users[0]))[0]
+  assert index.remove(best[2])
+  assert not index.remove(best[2])
+  assert index.read(0, 'today', today, lambda board: board.place(users[0])) is None
+  assert index.read(0, 'alltime', None, lambda board: board.place(users[0]))[0][0] == 30.0
+  assert index.sizes() == {0: 3, 1: 1}
+
+
+def test_changes_during_a_replace_are_kept():
+  users = [uuid.uuid4() for _ in range(2)]
+  now = datetime.datetime(2026, 10, 17, 12)
+  index = LeaderboardIndex()
+  index.replace([])
+
+  removed = make_entry(10.0, now, uuid.uuid4(), users[0])
+  added = make_entry(20.0, now, uuid.uuid4(), users[1])
+  index.add(0, removed, 'a')
+
+  def entries():
+    yield 0, removed, 'a'
+    index.remove(removed[2])
+    index.add(0, added, 'b')
+    yield 0, make_entry(30.0, now, uuid.uuid4(), users[0]), 'a'
+
+  index.replace_period('today', now.replace(hour=0), entries())
+  top = index.read(0, 'today', now.replace(hour=0), lambda board: board.top(20))
+  assert [solving_time for solving_time, _, _, _ in top] == [20.0, 30.0]
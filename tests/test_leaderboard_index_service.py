@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app.core.settings import settings
+from app.entities.SudokuLeaderboard import PERIOD_TODAY, PERIOD_ALL_TIME, get_period_start
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.repositories.SudokuRegistryRepository import SudokuRegistryRepository, AsyncSudokuRegistryRepository
+from app.repositories.SudokuRepository import SudokuRepository
+from app.repositories.UserRepository import UserRepository, AsyncUserRepository
+from app.services.LeaderboardIndexService import LeaderboardIndexService
+from app.services.SudokuRegistryService import SudokuRegistryService
+
+
+@pytest.fixture
+def index_settings(monkeypatch):
+  monkeypatch.setattr(settings, 'LEADERBOARD_INDEX', True)
+  monkeypatch.setattr(settings, 'LEADERBOARD_INDEX_CHECK_INTERVAL', 3600)
+  return settings
+
+
+def setup(db):
+  users = [UserRepository(db).create_user(f'firebase{i}', f'user{i}', f'user{i}@example.com') for i in range(3)]
+  sudoku = SudokuRepository(db).create_sudoku(1, SudokuGrid.generate_unique_puzzle(2, rng=get_random(0)).linear_notation)
+  return users, sudoku.id
+
+
+def index_service(db) -> LeaderboardIndexService:
+  # The index is loaded in a thread of its own, with a session of its own.
+  return LeaderboardIndexService(SudokuRegistryRepository(scoped_session(sessionmaker(db.get_bind()))))
+
+
+def test_load_is_tried_again(db, index_settings):
+  users, sudoku_id = setup(db)
+  SudokuRegistryRepository(db).create_sudoku_registry(users[0].id, sudoku_id, 5.0, True)
+  service = index_service(db)
+  repository = service._LeaderboardIndexService__sudoku_registry_repository
+
+  def fail(since=None):
+    raise RuntimeError('database down')
+
+  stream = repository.stream_leaderboard_entries
+  repository.stream_leaderboard_entries = fail
+  service.start()
+  service.wait()
+  repository.stream_leaderboard_entries = stream
+
+  # Not before the retry interval.
+  assert not service.is_ready()
+  service.wait()
+  assert not service.is_ready()
+
+  index_settings.LEADERBOARD_INDEX_CHECK_INTERVAL = 0
+  assert not service.is_ready()
+  service.wait()
+  assert service.is_ready()
+  assert [solving_time for _, _, solving_time in service.get_leaderboard(1, PERIOD_ALL_TIME, None)] == [5.0]
+
+
+def test_check_catches_up_and_reloads(db, index_settings):
+  users, sudoku_id = setup(db)
+  registries = SudokuRegistryRepository(db)
+  first = registries.create_sudoku_registry(users[0].id, sudoku_id, 5.0, True)
+  service = index_service(db)
+  service.start()
+  service.wait()
+
+  now = datetime.now(timezone.utc).replace(tzinfo=None)
+  today = get_period_start(PERIOD_TODAY, now)
+  assert service.is_ready(PERIOD_TODAY, today)
+
+  # Entries submitted through an other process are caught up with.
+  registries.create_sudoku_registry(users[1].id, sudoku_id, 4.0, True)
+  index_settings.LEADERBOARD_INDEX_CHECK_INTERVAL = 0
+  assert service.is_ready()
+  service.wait()
+  assert [solving_time for _, _, solving_time in service.get_leaderboard(1, PERIOD_TODAY, today)] == [4.0, 5.0]
+
+  # Deleted ones make the counts differ, and the index is loaded again.
+  registries.delete_sudoku_registry(registries.get_sudoku_registry_by_id(first.id))
+  assert service.is_ready()
+  service.wait()
+  assert [solving_time for _, _, solving_time in service.get_leaderboard(1, PERIOD_TODAY, today)] == [4.0]
+  assert service.get_user_place(users[0].id, 1, PERIOD_ALL_TIME, None) is None
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_falls_back_to_the_repository(db, async_db, index_settings):
+  users, sudoku_id = setup(db)
+  registries = SudokuRegistryRepository(db)
+  for user, solving_time in zip(users, (7.0, 3.0, 5.0)):
+    registries.create_sudoku_registry(user.id, sudoku_id, solving_time, True)
+
+  index = index_service(db)
+  service = SudokuRegistryService(AsyncSudokuRegistryRepository(async_db), AsyncUserRepository(async_db), None, index, None)
+
+  # The index is not loaded yet, the leaderboard is read from the database.
+  index_settings.LEADERBOARD_INDEX = False
+  from_repository = await service.get_leaderboard_today(1, 'firebase0')
+  assert [element.solving_time for element in from_repository.leaderboard] == [3.0, 5.0, 7.0]
+  assert from_repository.user_rank == 3
+
+  index_settings.LEADERBOARD_INDEX = True
+  assert not index.is_ready()
+  index.wait()
+  assert index.is_ready(PERIOD_TODAY, get_period_start(PERIOD_TODAY, datetime.now(timezone.utc).replace(tzinfo=None)))
+  assert await service.get_leaderboard_today(1, 'firebase0') == from_repository
+
+  # A deleted entry leaves both.
+  await service.delete_sudoku_registry(registries.get_sudoku_registries_by_user_id(users[1].id)[0].id)
+  from_index = await service.get_leaderboard_today(1, 'firebase0')
+  assert [element.solving_time for element in from_index.leaderboard] == [5.0, 7.0]
+  index_settings.LEADERBOARD_INDEX = False
+  assert await service.get_leaderboard_today(1, 'firebase0') == from_index
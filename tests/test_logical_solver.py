@@ -0,0 +1,33 @@
+import random
+
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.libs.logical_solver import LogicalSolver, rate, GRADE_EASY, GRADE_GUESSING
+
+
+def test_rating_is_deterministic():
+  random.seed(4)
+  for _ in range(5):
+    grid = SudokuGrid.generate_unique_puzzle()
+    rating = rate(grid)
+
+    assert rating.grade == rate(grid.copy()).grade
+    assert rating.techniques == rate(grid.copy()).techniques
+    assert rating.solved == (rating.grade != GRADE_GUESSING)
+
+
+def test_solver_finds_the_solution():
+  grid = SudokuGrid.generate_non_unique_puzzle(3, 20, rng=get_random(8))
+  solver = LogicalSolver(grid)
+  rating = solver.solve()
+
+  assert rating.solved and rating.grade == GRADE_EASY
+  assert solver.values == grid.try_solve().array.ravel().tolist()
+
+
+def test_x_wing():
+  # Solving this puzzle requires an X-Wing on the digit 1.
+  grid = SudokuGrid.from_linear_notation('3:' + ','.join('100000569492056108056109240009640801064010000218035604040500016905061402621000005'))
+  rating = rate(grid)
+
+  assert rating.solved
+  assert 'x_wing' in rating.techniques
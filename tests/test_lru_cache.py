@@ -0,0 +1,19 @@
+from app.libs.lru_cache import LRUCache
+
+
+def test_lru_cache():
+  cache = LRUCache(2)
+  cache.put('a', 1)
+  cache.put('b', 2)
+
+  # Reading 'a' makes 'b' the least recently used.
+  assert cache.get('a') == 1
+  cache.put('c', 3)
+  assert cache.get('b') is None
+  assert cache.get('c') == 3
+  assert len(cache) == 2
+  assert (cache.hits, cache.misses) == (2, 1)
+
+  cache.pop('a')
+  assert cache.get('a', 0) == 0
+  assert len(cache) == 1
@@ -0,0 +1,76 @@
+import concurrent.futures
+
+import pytest
+
+from app.libs.bounded_executor import BoundedExecutor
+from app.libs.puzzle_generator import generate_puzzles, generate_targeted_puzzles, GenerationStats, PuzzleReserve
+from app.libs.sudoku_grid import SudokuGrid
+from app.libs.logical_solver import rate, GRADE_HARD
+
+
+def test_generate_puzzles():
+  batches = list(generate_puzzles(0, 5, workers=2, batch_size=2, block_size=2, seed=0))
+  assert [len(batch) for batch in batches] == [2, 2, 1]
+
+  puzzles = [puzzle for batch in batches for puzzle in batch]
+  assert len({puzzle[1] for puzzle in puzzles}) == 5
+
+  for linear_notation, canonical_hash, solution_data in puzzles:
+    grid = SudokuGrid.from_linear_notation(linear_notation)
+    assert grid.try_solve_ms() == 1
+    assert grid.canonical_hash() == canonical_hash
+    assert (grid.try_solve().array == SudokuGrid.from_bytes(solution_data).array).all()
+
+
+def test_generate_targeted_puzzles():
+  assert generate_targeted_puzzles(0, 7) == generate_targeted_puzzles(0, 7)
+
+  for seed in range(5):
+    puzzles = generate_targeted_puzzles(0, seed)
+    assert 0 in [grade for grade, _ in puzzles]
+
+    for grade, (linear_notation, _, _) in puzzles:
+      grid = SudokuGrid.from_linear_notation(linear_notation)
+      assert grid.try_solve_ms() == 1
+      assert min(rate(grid).grade, GRADE_HARD) == grade
+
+
+def test_reserve():
+  reserve = PuzzleReserve()
+  stats = GenerationStats()
+  list(generate_puzzles(1, 3, workers=1, seed=0, stats=stats, reserve=reserve))
+  assert stats.reserved == sum(reserve.sizes().values()) > 0
+
+  difficulty = next(difficulty for difficulty, size in reserve.sizes().items() if size)
+  expected = reserve.sizes()[difficulty]
+  stats = GenerationStats()
+  puzzles = [puzzle for batch in generate_puzzles(difficulty, expected, workers=1, stats=stats, reserve=reserve) for puzzle in batch]
+  assert stats.from_reserve == len(puzzles) == expected
+  assert reserve.sizes()[difficulty] == 0
+
+
+def test_generate_puzzles_on_a_shared_executor():
+  # WORKERS is the share of the executor, its queue is left to the other
+  # work.
+  executor = BoundedExecutor('test', lambda workers: concurrent.futures.ThreadPoolExecutor(workers), 1, 2)
+  batches = list(generate_puzzles(0, 3, workers=1, block_size=2, seed=0, executor=executor))
+  executor.shutdown()
+
+  assert sum(len(batch) for batch in batches) == 3
+  assert executor.stats().max_queued == 0
+
+
+def test_reserve_is_given_back_on_failure():
+  reserve = PuzzleReserve()
+  puzzles = [('puzzle%d' % i, b'hash%d' % i, b'solution') for i in range(3)]
+  for puzzle in puzzles:
+    reserve.put(1, puzzle)
+
+  # Block size 0 can not be generated, the first task fails after the
+  # puzzles of the reserve were accepted.
+  executor = BoundedExecutor('test', lambda workers: concurrent.futures.ThreadPoolExecutor(workers), 1, 2)
+  with pytest.raises(Exception):
+    list(generate_puzzles(1, 5, workers=1, batch_size=10, block_size=0, reserve=reserve, executor=executor))
+  executor.shutdown()
+
+  assert sorted(reserve.take(1, 10)) == sorted(puzzles)
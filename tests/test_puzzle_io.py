@@ -0,0 +1,62 @@
+import concurrent.futures
+
+from app.libs.puzzle_io import (
+  parse_line, format_line, check_line, import_puzzles, regrade_puzzles, ImportStats,
+  FORMAT_LINE, ERROR_FORMAT, ERROR_INVALID, ERROR_NOT_UNIQUE,
+)
+from app.libs.bounded_executor import BoundedExecutor
+from app.libs.sudoku_grid import SudokuGrid
+
+
+PUZZLE = '800000000003600000070090200050007000000045700000100030001000068008500010090000400'
+
+
+def test_parse_and_format():
+  grid = parse_line(PUZZLE.replace('0', '.') + '\n')
+  assert format_line(grid, FORMAT_LINE) == PUZZLE.replace('0', '.')
+  assert parse_line(grid.linear_notation).linear_notation == grid.linear_notation
+  assert parse_line('  ') is None and parse_line('# comment') is None
+
+
+def test_check_line():
+  grid = SudokuGrid.from_linear_notation('3:' + ','.join(PUZZLE))
+  assert check_line(PUZZLE) == ((grid.linear_notation, 2, grid.canonical_hash(), grid.try_solve().to_bytes()), None)
+
+  assert check_line('123')[1] == ERROR_FORMAT
+  # Out of range block sizes and values.
+  assert check_line('3:' + '10,' * 81)[1] == ERROR_FORMAT
+  assert check_line('9:1,2')[1] == ERROR_FORMAT
+  assert check_line('4:' + ','.join(['0'] * 256))[1] == ERROR_FORMAT
+  assert check_line('3:' + ','.join(['-1'] + ['0'] * 80))[1] == ERROR_FORMAT
+  assert check_line('3:' + ','.join(['300'] + ['0'] * 80))[1] == ERROR_FORMAT
+  assert check_line('3:' + ','.join(['0'] * 80))[1] == ERROR_FORMAT
+  assert check_line('11' + '0' * 79)[1] == ERROR_INVALID
+  assert check_line('0' * 81)[1] == ERROR_NOT_UNIQUE
+
+
+def test_import_puzzles():
+  stats = ImportStats()
+  # The last line is the puzzle transposed.
+  lines = [PUZZLE, '', PUZZLE.replace('0', '.'), '0' * 81, ''.join(PUZZLE[col * 9 + row] for row in range(9) for col in range(9))]
+  chunks = list(import_puzzles(lines, workers=1, chunk_size=2, stats=stats))
+
+  assert [puzzle for chunk in chunks for puzzle in chunk] == [check_line(PUZZLE)[0]]
+  assert stats.read == 4 and stats.duplicates == 2
+  assert stats.errors == {ERROR_NOT_UNIQUE: 1}
+
+  # On a shared executor, the chunks are checked on its share of the workers
+  # and leave its queue to the other work.
+  executor = BoundedExecutor('test', lambda workers: concurrent.futures.ThreadPoolExecutor(workers), 1, 2)
+  shared = list(import_puzzles(lines, workers=1, chunk_size=2, executor=executor))
+  executor.shutdown()
+
+  assert shared == chunks
+  assert executor.stats().max_queued == 0 and executor.stats().completed == 3
+
+
+def test_regrade_puzzles():
+  grid = SudokuGrid.from_linear_notation('3:' + ','.join(PUZZLE))
+  puzzles = [(0, 0, grid.to_bytes()), (1, 2, grid.to_bytes()), (2, 0, SudokuGrid.generate_unique_puzzle(2, rng=0).to_bytes())]
+  chunks = list(regrade_puzzles(puzzles, workers=1, chunk_size=2))
+
+  assert sorted(puzzle for chunk in chunks for puzzle in chunk) == [(0, 0, 2), (1, 2, 2), (2, 0, 0)]
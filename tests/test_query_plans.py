@@ -0,0 +1,175 @@
+"""
+Runs the repository queries on a PostgreSQL database seeded with synthetic
+rows, and checks their plans with EXPLAIN ANALYZE: the large tables must not
+be scanned sequentially, and every query must run within the budget.
+
+The database at TEST_DATABASE_URL is migrated and seeded, so it must be a
+scratch one. Skipped if TEST_DATABASE_URL is not set. QUERY_PLAN_ROWS sets the
+number of registry rows, QUERY_PLAN_BUDGET_MS the latency budget.
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+import os
+
+import pytest
+
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+if not TEST_DATABASE_URL:
+  pytest.skip('TEST_DATABASE_URL is not set', allow_module_level=True)
+
+# The app and alembic read the database from DATABASE_URL.
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.entities.Sudoku import Sudoku
+from app.entities.SudokuLeaderboard import PERIOD_ALL_TIME, PERIOD_WEEK, ALL_TIME_START, get_period_start
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.repositories.SudokuRegistryRepository import SudokuRegistryRepository
+from app.repositories.SudokuRepository import SudokuRepository, puzzle_cache
+from app.repositories.UserRepository import UserRepository
+
+
+REGISTRY_ROWS = int(os.environ.get('QUERY_PLAN_ROWS', 2_000_000))
+SUDOKU_ROWS = max(REGISTRY_ROWS // 20, 3)
+USER_ROWS = max(REGISTRY_ROWS // 100, 1)
+BUDGET_MS = float(os.environ.get('QUERY_PLAN_BUDGET_MS', 50))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def engine():
+  command.upgrade(Config(os.path.join(ROOT, 'alembic.ini')), 'head')
+  engine = create_engine(TEST_DATABASE_URL)
+
+  with engine.begin() as connection:
+    connection.execute(text('TRUNCATE sudoku_leaderboard, sudoku_registry, sudoku_sequence, sudoku, users'))
+    connection.execute(text(
+      "INSERT INTO users (id, username, firebase_id, email, role, created_at) "
+      "SELECT gen_random_uuid(), 'user' || i, 'firebase' || i, 'user' || i || '@example.com', 0, now() "
+      "FROM generate_series(1, :count) AS i"
+    ), {'count': USER_ROWS})
+    # Every row holds the same puzzle, which is decoded when read.
+    sudoku = Sudoku.from_linear_notation(0, SudokuGrid.generate_unique_puzzle(3, rng=get_random(0)).linear_notation)
+    connection.execute(text(
+      "INSERT INTO sudoku (id, difficulty, puzzle_data, solution_data, puzzle_hash, canonical_hash, sequence_no, created_at) "
+      "SELECT gen_random_uuid(), i % 3, :puzzle_data, :solution_data, decode(md5(i::text), 'hex'), decode(md5('c' || i), 'hex'), i / 3 + 1, now() "
+      "FROM generate_series(0, :count - 1) AS i"
+    ), {'count': SUDOKU_ROWS, 'puzzle_data': sudoku.puzzle_data, 'solution_data': sudoku.solution_data})
+    connection.execute(text(
+      "INSERT INTO sudoku_sequence (difficulty, last_sequence_no) "
+      "SELECT difficulty, max(sequence_no) FROM sudoku GROUP BY difficulty"
+    ))
+    connection.execute(text(
+      "INSERT INTO sudoku_registry (id, sudoku_id, difficulty, user_id, solving_time, is_applicable, created_at) "
+      "SELECT gen_random_uuid(), s.ids[1 + (i::bigint * 7919) % array_length(s.ids, 1)], s.difficulties[1 + (i::bigint * 7919) % array_length(s.ids, 1)], "
+      "u.ids[1 + (i::bigint * 104729) % array_length(u.ids, 1)], 10 + random() * 1000, random() < 0.8, now() - random() * interval '365 days' "
+      "FROM generate_series(1, :count) AS i, "
+      "(SELECT array_agg(id) AS ids, array_agg(difficulty) AS difficulties FROM sudoku) AS s, (SELECT array_agg(id) AS ids FROM users) AS u"
+    ), {'count': REGISTRY_ROWS})
+
+  # Vacuumed like autovacuum would, so the index only scans do not go to
+  # the table.
+  with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+    connection.execute(text('VACUUM ANALYZE'))
+
+  yield engine
+  engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+  session = Session(engine)
+  yield session
+  session.rollback()
+  session.close()
+
+
+def explain(db: Session, call, forbidden: tuple[str, ...]) -> None:
+  """
+  Runs CALL, and explains every query it runs. Fails if a table of
+  FORBIDDEN is scanned sequentially, or if a query goes over the budget.
+  """
+  statements = []
+
+  def capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith('SELECT'):
+      statements.append((statement, parameters))
+
+  connection = db.connection()
+  event.listen(connection, 'before_cursor_execute', capture)
+  try:
+    result = call()
+    if hasattr(result, '__next__'):
+      list(result)
+  finally:
+    event.remove(connection, 'before_cursor_execute', capture)
+
+  assert statements
+
+  cursor = connection.connection.cursor()
+  for statement, parameters in statements:
+    cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + statement, parameters)
+    plan = cursor.fetchone()[0]
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+    nodes = [plan['Plan']]
+    while nodes:
+      node = nodes.pop()
+      assert not (node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in forbidden), \
+        f"Sequential scan on {node['Relation Name']}:\n{statement}"
+      nodes.extend(node.get('Plans', []))
+
+    assert plan['Execution Time'] <= BUDGET_MS, f"{plan['Execution Time']:.1f}ms over the budget:\n{statement}"
+
+
+@pytest.fixture
+def sample(db):
+  row = db.execute(text(
+    'SELECT r.user_id, r.sudoku_id, s.difficulty FROM sudoku_registry AS r JOIN sudoku AS s ON s.id = r.sudoku_id '
+    'WHERE r.is_applicable LIMIT 1'
+  )).one()
+  firebase_id = db.execute(text('SELECT firebase_id FROM users WHERE id = :id'), {'id': row.user_id}).scalar_one()
+  return row.user_id, row.sudoku_id, row.difficulty, firebase_id
+
+
+def test_sudoku_queries(db, sample):
+  _, sudoku_id, difficulty, _ = sample
+  sudokus = SudokuRepository(db)
+  puzzle_cache.clear()
+
+  explain(db, lambda: sudokus.get_sudoku_by_id(sudoku_id), ('sudoku',))
+  explain(db, lambda: sudokus.get_random_sudoku_by_difficulty(difficulty), ('sudoku',))
+
+
+def test_user_queries(db, sample):
+  user_id, _, _, firebase_id = sample
+  users = UserRepository(db)
+
+  explain(db, lambda: users.get_user_by_id(user_id), ('users',))
+  explain(db, lambda: users.get_user_by_firebase_id(firebase_id), ('users',))
+  explain(db, lambda: users.is_username_taken('user1'), ('users',))
+
+
+def test_registry_queries(db, sample):
+  user_id, sudoku_id, difficulty, _ = sample
+  registries = SudokuRegistryRepository(db)
+  now = datetime.now(timezone.utc).replace(tzinfo=None)
+  week_start = get_period_start(PERIOD_WEEK, now)
+  forbidden = ('sudoku_registry', 'users')
+
+  explain(db, lambda: registries.get_sudoku_registries_by_user_id(user_id), forbidden)
+  explain(db, lambda: registries.get_sudoku_registries_by_sudoku_id(sudoku_id), forbidden)
+  explain(db, lambda: registries.get_user_records(user_id, difficulty), forbidden)
+  explain(db, lambda: registries.get_user_place_in_all_time_leaderboard(user_id, difficulty), forbidden)
+  explain(db, lambda: registries.get_user_place_in_leaderboard(user_id, difficulty, week_start), forbidden)
+  explain(db, lambda: registries.get_leaderboard(difficulty, PERIOD_ALL_TIME, ALL_TIME_START), forbidden)
+  explain(db, lambda: registries.get_broken_record_user_if_any(difficulty, user_id, 500.0), forbidden)
+  explain(db, lambda: registries.stream_leaderboard_entries(since=now - timedelta(minutes=5)), forbidden)
@@ -0,0 +1,181 @@
+import numpy
+import random
+
+from app.libs.sudoku_grid import (
+  SudokuGrid, get_grid_tables, ENGINE_BACKTRACK, ENGINE_DLX,
+  bytes_to_linear_notation, linear_notation_to_bytes, puzzle_hash,
+)
+
+
+def test_grid_tables():
+  for block_size in (2, 3, 4, 5):
+    tables = get_grid_tables(block_size)
+    grid_size = block_size * block_size
+
+    assert get_grid_tables(block_size) is tables
+    assert tables.peers.shape == (grid_size * grid_size, 3 * grid_size - 2 * block_size - 1)
+
+    for index, square in enumerate(tables.squares):
+      peers = tables.peer_squares[square]
+      assert square not in peers
+      assert len(set(peers)) == len(peers)
+      assert all(
+        peer[0] == square[0] or peer[1] == square[1]
+        or (peer[0] // block_size, peer[1] // block_size) == (square[0] // block_size, square[1] // block_size)
+        for peer in peers
+      )
+      assert [tables.squares[peer] for peer in tables.peers[index]] == list(peers)
+
+
+def test_masks_follow_place_and_clear():
+  grid = SudokuGrid.generate_filled()
+  grid._clear((0, 0))
+  grid._clear((4, 4))
+
+  assert grid._get_available((0, 0)) == {int(grid.copy().try_solve().array[0, 0])}
+
+  regenerated = grid.copy()
+  regenerated.generate_candidates()
+  assert (regenerated.candidates == grid.candidates).all()
+  assert (regenerated.row_masks == grid.row_masks).all()
+  assert (regenerated.col_masks == grid.col_masks).all()
+  assert (regenerated.block_masks == grid.block_masks).all()
+
+
+def test_generate_unique_puzzle_is_unique():
+  random.seed(0)
+  for block_size in (2, 3):
+    grid = SudokuGrid.generate_unique_puzzle(block_size)
+    assert grid.try_solve_ms() == 1
+
+    solution = grid.try_solve()
+    assert solution.is_solved()
+    assert (solution.array[grid.array != 0] == grid.array[grid.array != 0]).all()
+
+
+def test_engines_agree():
+  random.seed(1)
+  grid = SudokuGrid.generate_non_unique_puzzle(2, 12)
+
+  solutions = list(grid.generate_solutions())
+  assert all(solution.is_solved() for solution in solutions)
+  assert grid.count_solutions() == len(solutions)
+  assert grid.try_solve_ms(ENGINE_DLX) == grid.try_solve_ms(ENGINE_BACKTRACK) == min(len(solutions), 2)
+
+  hard = SudokuGrid.from_linear_notation('3:' + ','.join('800000000003600000070090200050007000000045700000100030001000068008500010090000400'))
+  assert (hard.try_solve(ENGINE_DLX).array == hard.try_solve(ENGINE_BACKTRACK).array).all()
+
+  # Stopping a search early must leave the matrix usable.
+  matrix, _ = hard._to_exact_cover()
+  assert matrix.find_first() is not None
+  assert matrix.count() == 1
+
+
+def test_engines_agree_on_conflicting_givens():
+  # The two 3s of the last row conflict, but every empty square still has a
+  # candidate.
+  grid = SudokuGrid.from_linear_notation('2:0,0,3,2,3,0,4,1,0,3,2,0,0,3,0,3')
+  assert grid._has_conflicts()
+
+  for engine in (ENGINE_BACKTRACK, ENGINE_DLX):
+    assert grid.try_solve(engine) is None
+    assert grid.try_solve_ms(engine) == 0
+  assert grid.count_solutions() == 0
+
+  # A filled grid that is not solved has no solution either.
+  broken = SudokuGrid.generate_filled()
+  broken.array[0, 0] = broken.array[0, 1]
+  broken.generate_candidates()
+  assert broken.try_solve(ENGINE_BACKTRACK) is None
+  assert broken.try_solve_ms(ENGINE_BACKTRACK) == broken.count_solutions() == 0
+
+
+def test_solvers_resync_masks():
+  grid = SudokuGrid.generate_unique_puzzle(rng=7)
+  solution = grid.try_solve()
+
+  # Write the array directly, leaving the masks of the full grid behind.
+  stale = solution.copy()
+  stale.array[:] = grid.array
+  for engine in (ENGINE_BACKTRACK, ENGINE_DLX):
+    assert numpy.array_equal(stale.try_solve(engine).array, solution.array)
+    assert stale.try_solve_ms(engine) == 1
+  assert stale.count_solutions() == 1
+  assert len(list(stale.generate_solutions())) == 1
+  assert stale.try_solve_classify(solution.array, 0) >= 0
+  assert numpy.array_equal(stale.array, grid.array)
+
+
+def test_is_solved_batch():
+  random.seed(2)
+  solved = SudokuGrid.generate_filled()
+  puzzle = SudokuGrid.generate_non_unique_puzzle()
+
+  broken = solved.copy()
+  broken.array[0, [0, 1]] = broken.array[0, [1, 0]]
+
+  out_of_range = solved.copy()
+  out_of_range.array[0, 0] = 10
+
+  arrays = numpy.stack([solved.array, puzzle.array, broken.array, out_of_range.array])
+  assert SudokuGrid.is_solved_batch(arrays).tolist() == [True, False, False, False]
+  assert SudokuGrid.is_solved_batch(arrays, only_valid=True).tolist() == [True, True, False, True]
+  assert solved.is_solved() and not broken.is_solved() and puzzle.is_solved(only_valid=True)
+
+
+def test_search_restores_grid():
+  random.seed(3)
+  grid = SudokuGrid.generate_non_unique_puzzle(3, 50)
+  copy = grid.copy()
+
+  total, solution = grid._search(2)
+  assert total == 2 and SudokuGrid.is_solved_batch(solution[numpy.newaxis])[0]
+  assert (grid.array == copy.array).all()
+  assert (grid.candidates == copy.candidates).all()
+  assert (grid.block_masks == copy.block_masks).all()
+
+
+def test_generate_batch_is_reproducible():
+  first = SudokuGrid.generate_batch(42, 3, 2)
+  second = SudokuGrid.generate_batch(42, 3, 2)
+  assert [grid.linear_notation for grid in first] == [grid.linear_notation for grid in second]
+
+  rng = random.Random(5)
+  grid = SudokuGrid.generate_unique_puzzle(3, rng=rng)
+  assert grid.linear_notation == SudokuGrid.generate_unique_puzzle(3, rng=5).linear_notation
+  assert grid.try_solve_classify(grid.try_solve().array, 7) == grid.try_solve_classify(grid.try_solve().array, 7)
+
+
+def test_binary_notation():
+  random.seed(4)
+  for block_size in (2, 3, 4):
+    grid = SudokuGrid.generate_non_unique_puzzle(block_size, block_size ** 4 // 2)
+    data = grid.to_bytes()
+
+    assert (SudokuGrid.from_bytes(data).array == grid.array).all()
+    assert bytes_to_linear_notation(data) == grid.linear_notation
+    assert linear_notation_to_bytes(grid.linear_notation) == data
+
+  assert len(data) == 1 + (256 * 5 + 7) // 8
+  assert len(SudokuGrid.generate_filled().to_bytes()) == 42
+  assert len(puzzle_hash(data)) == 16
+
+
+def test_canonical_form():
+  for block_size in (2, 3):
+    grid = SudokuGrid.generate_unique_puzzle(block_size, rng=5)
+    canonical = grid.canonical_form()
+
+    shuffled = grid.copy()
+    shuffled.shuffle(6)
+    shuffled.array = shuffled.array.T.copy()
+    relabel = numpy.array([0] + random.Random(7).sample(range(1, grid.grid_size + 1), grid.grid_size), dtype=grid.array.dtype)
+    shuffled.array = relabel[shuffled.array]
+
+    assert (shuffled.canonical_form().array == canonical.array).all()
+    assert shuffled.canonical_hash() == grid.canonical_hash()
+    assert (canonical.canonical_form().array == canonical.array).all()
+    assert canonical.try_solve_ms() == 1
+
+  other = SudokuGrid.generate_unique_puzzle(3, rng=8)
+  assert other.canonical_hash() != grid.canonical_hash()
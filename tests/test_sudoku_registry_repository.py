@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.entities.SudokuLeaderboard import SudokuLeaderboard, PERIODS, PERIOD_TODAY, PERIOD_ALL_TIME, LEADERBOARD_SIZE, get_period_start
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.repositories.SudokuRegistryRepository import SudokuRegistryRepository
+from app.repositories.SudokuRepository import SudokuRepository
+from app.repositories.UserRepository import UserRepository
+
+
+def setup(db, user_count: int):
+  users = [UserRepository(db).create_user(f'firebase{i}', f'user{i}', f'user{i}@example.com') for i in range(user_count)]
+  sudoku = SudokuRepository(db).create_sudoku(1, SudokuGrid.generate_unique_puzzle(2, rng=get_random(0)).linear_notation)
+  return users, sudoku.id
+
+
+def board(registries: SudokuRegistryRepository, period: str) -> list[tuple[str, float]]:
+  now = datetime.now(timezone.utc).replace(tzinfo=None)
+  return [(username, solving_time) for username, _, solving_time in registries.get_leaderboard(1, period, get_period_start(period, now))]
+
+
+def test_leaderboard_push_out_and_ties(db):
+  users, sudoku_id = setup(db, LEADERBOARD_SIZE + 3)
+  registries = SudokuRegistryRepository(db)
+
+  # Two entries tied for the last place, the first one keeps its place.
+  times = [float(i) for i in range(1, LEADERBOARD_SIZE - 1)] + [30.0, 30.0]
+  for user, solving_time in zip(users, times):
+    registries.create_sudoku_registry(user.id, sudoku_id, solving_time, True)
+  expected = [(f'user{i}', solving_time) for i, solving_time in enumerate(times)]
+
+  for period in PERIODS:
+    assert board(registries, period) == expected
+
+  # Tying the last place does not make it in, a not applicable entry neither.
+  registries.create_sudoku_registry(users[-3].id, sudoku_id, 30.0, True)
+  registries.create_sudoku_registry(users[-3].id, sudoku_id, 0.5, False)
+  assert board(registries, PERIOD_TODAY) == expected
+
+  # A better entry pushes out the latest of the tied entries.
+  registries.create_sudoku_registry(users[-2].id, sudoku_id, 10.5, True)
+  expected = sorted(expected[:-1] + [(f'user{len(users) - 2}', 10.5)], key=lambda entry: entry[1])
+  for period in PERIODS:
+    assert board(registries, period) == expected
+    assert db.scalar(select(SudokuLeaderboard.id).where(SudokuLeaderboard.period == period).limit(1)) is not None
+
+
+def test_leaderboard_rollover(db):
+  users, sudoku_id = setup(db, 2)
+  registries = SudokuRegistryRepository(db)
+  registries.create_sudoku_registry(users[0].id, sudoku_id, 5.0, True)
+
+  # The entries of yesterday's leaderboard.
+  yesterday = get_period_start(PERIOD_TODAY, datetime.now(timezone.utc).replace(tzinfo=None)) - timedelta(days=1)
+  for row in db.scalars(select(SudokuLeaderboard).where(SudokuLeaderboard.period == PERIOD_TODAY)):
+    row.period_start = yesterday
+  db.commit()
+  assert board(registries, PERIOD_TODAY) == []
+
+  registries.create_sudoku_registry(users[1].id, sudoku_id, 8.0, True)
+  assert db.scalar(select(SudokuLeaderboard.id).where(SudokuLeaderboard.period_start == yesterday)) is None
+  assert board(registries, PERIOD_TODAY) == [('user1', 8.0)]
+  assert board(registries, PERIOD_ALL_TIME) == [('user0', 5.0), ('user1', 8.0)]
+
+
+def test_leaderboard_rebuild_after_delete(db):
+  users, sudoku_id = setup(db, LEADERBOARD_SIZE + 1)
+  registries = SudokuRegistryRepository(db)
+  entries = [registries.create_sudoku_registry(user.id, sudoku_id, float(i), True) for i, user in enumerate(users)]
+  assert len(board(registries, PERIOD_TODAY)) == LEADERBOARD_SIZE
+
+  # The entry left out comes back in.
+  registries.delete_sudoku_registry(registries.get_sudoku_registry_by_id(entries[3].id))
+  expected = [(f'user{i}', float(i)) for i in range(len(users)) if i != 3]
+  for period in PERIODS:
+    assert board(registries, period) == expected
+
+  # A leaderboard of a past period is not filled with the later entries.
+  yesterday = get_period_start(PERIOD_TODAY, datetime.now(timezone.utc).replace(tzinfo=None)) - timedelta(days=1)
+  db.add(SudokuLeaderboard(difficulty=1, period=PERIOD_TODAY, period_start=yesterday, sudoku_registry_id=entries[0].id, user_id=users[0].id, solving_time=0.0))
+  db.commit()
+
+  registries.delete_sudoku_registry(registries.get_sudoku_registry_by_id(entries[0].id))
+  assert registries.get_leaderboard(1, PERIOD_TODAY, yesterday) == []
+  assert board(registries, PERIOD_TODAY) == expected[1:]
+
+
+def test_user_place(db):
+  users, sudoku_id = setup(db, 4)
+  registries = SudokuRegistryRepository(db)
+
+  # user0 has several entries, only the best one counts.
+  entries = [
+    registries.create_sudoku_registry(users[0].id, sudoku_id, 9.0, True),
+    registries.create_sudoku_registry(users[0].id, sudoku_id, 4.0, True),
+    registries.create_sudoku_registry(users[1].id, sudoku_id, 3.0, True),
+    registries.create_sudoku_registry(users[1].id, sudoku_id, 1.0, True),
+    registries.create_sudoku_registry(users[2].id, sudoku_id, 4.0, True),
+    registries.create_sudoku_registry(users[3].id, sudoku_id, 0.5, False),
+  ]
+
+  # The places count the better entries, so tied users share their place.
+  assert registries.get_user_place_in_all_time_leaderboard(users[0].id, 1) == (4.0, 3)
+  assert registries.get_user_place_in_all_time_leaderboard(users[2].id, 1) == (4.0, 3)
+  assert registries.get_user_place_in_all_time_leaderboard(users[1].id, 1) == (1.0, 1)
+  assert registries.get_user_place_in_all_time_leaderboard(users[3].id, 1) is None
+  assert registries.get_user_place_in_all_time_leaderboard(users[0].id, 2) is None
+
+  # Only the entries after the start of the window count.
+  start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+  for entry in entries[1:4]:
+    entry.created_at = start - timedelta(hours=1)
+  db.commit()
+
+  assert registries.get_user_place_in_leaderboard(users[0].id, 1, start) == (9.0, 2)
+  assert registries.get_user_place_in_leaderboard(users[2].id, 1, start) == (4.0, 1)
+  assert registries.get_user_place_in_leaderboard(users[1].id, 1, start) is None
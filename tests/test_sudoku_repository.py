@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+
+from app.entities.Sudoku import Sudoku
+from app.entities.SudokuLeaderboard import PERIODS, get_period_start
+from app.entities.SudokuRegistry import SudokuRegistry
+from app.entities.SudokuSequence import SudokuSequence
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.repositories.SudokuRegistryRepository import SudokuRegistryRepository
+from app.repositories.SudokuRepository import SudokuRepository
+from app.repositories.UserRepository import UserRepository
+
+
+def make_puzzles(count: int, seed: int = 0) -> list[tuple[str, int, bytes, bytes]]:
+  rng = get_random(seed)
+  puzzles = []
+  for _ in range(count):
+    grid = SudokuGrid.generate_non_unique_puzzle(2, 8, rng=rng)
+    puzzles.append((grid.linear_notation, 1, grid.canonical_hash(), grid.try_solve().to_bytes()))
+  return puzzles
+
+
+def sequence_nos(db, difficulty: int) -> list[int]:
+  return sorted(db.scalars(select(Sudoku.sequence_no).where(Sudoku.difficulty == difficulty)))
+
+
+def last_sequence_no(db, difficulty: int) -> int:
+  return db.scalar(select(SudokuSequence.last_sequence_no).where(SudokuSequence.difficulty == difficulty))
+
+
+def test_sequence_nos_have_no_gaps(db):
+  sudokus = SudokuRepository(db)
+  puzzles = make_puzzles(12)
+
+  # The duplicates are skipped without using a number.
+  inserted = sudokus.insert_sudokus(puzzles[:8] + puzzles[:4])
+  count = len({canonical_hash for _, _, canonical_hash, _ in puzzles[:8]})
+  assert inserted == count
+  assert sequence_nos(db, 1) == list(range(1, count + 1)) and last_sequence_no(db, 1) == count
+
+  sudoku = sudokus.create_sudoku(1, SudokuGrid.generate_unique_puzzle(2, rng=get_random(1)).linear_notation)
+  assert sudoku.sequence_no == count + 1
+
+  # Deleting from the middle moves the last puzzle into the freed number,
+  # deleting the last one only lowers the counter.
+  for sequence_no in (2, count, 1):
+    sudokus.delete_sudoku(db.scalars(select(Sudoku).where(Sudoku.sequence_no == sequence_no)).one())
+    count = len(sequence_nos(db, 1))
+    assert sequence_nos(db, 1) == list(range(1, count + 1)) and last_sequence_no(db, 1) == count
+
+
+def test_random_sudoku(db):
+  sudokus = SudokuRepository(db)
+  sudokus.insert_sudokus(make_puzzles(6))
+  ids = set(db.scalars(select(Sudoku.id)))
+
+  assert sudokus.get_random_sudoku_by_difficulty(2) is None
+  assert {sudokus.get_random_sudoku_by_difficulty(1).id for _ in range(50)} == ids
+
+  # A number without its puzzle, as if it was deleted in between, falls
+  # back to the next numbered puzzle, wrapping around.
+  db.execute(update(Sudoku).where(Sudoku.sequence_no.not_in((3, 5))).values(sequence_no=None))
+  db.execute(update(SudokuSequence).values(last_sequence_no=8))
+  db.commit()
+  numbered = set(db.scalars(select(Sudoku.id).where(Sudoku.sequence_no.is_not(None))))
+  assert {sudokus.get_random_sudoku_by_difficulty(1).id for _ in range(50)} == numbered
+
+  db.execute(update(Sudoku).values(sequence_no=None))
+  db.commit()
+  assert sudokus.get_random_sudoku_by_difficulty(1) is None
+
+
+def test_set_difficulties(db):
+  sudokus = SudokuRepository(db)
+  sudokus.insert_sudokus(make_puzzles(6))
+  ids = sorted(db.scalars(select(Sudoku.id)))
+  user = UserRepository(db).create_user('firebase', 'user', 'user@example.com')
+  registries = SudokuRegistryRepository(db)
+  registries.create_sudoku_registry(user.id, ids[0], 5.0, True)
+
+  sudokus.set_difficulties([(ids[0], 2), (ids[3], 2)])
+  assert sequence_nos(db, 1) == [1, 2, 3, 4] and last_sequence_no(db, 1) == 4
+  assert sequence_nos(db, 2) == [1, 2] and last_sequence_no(db, 2) == 2
+
+  # The entries follow their puzzles, and so do the leaderboards.
+  registries.refresh_difficulties()
+  assert db.scalar(select(SudokuRegistry.difficulty)) == 2
+  now = datetime.now(timezone.utc).replace(tzinfo=None)
+  for period in PERIODS:
+    assert registries.get_leaderboard(1, period, get_period_start(period, now)) == []
+    assert [username for username, _, _ in registries.get_leaderboard(2, period, get_period_start(period, now))] == ['user']
@@ -0,0 +1,30 @@
+import numpy
+import pytest
+
+from app.libs.sudoku_grid import SudokuGrid, get_random
+from app.repositories.SudokuRepository import AsyncSudokuRepository, puzzle_cache
+from app.services.SudokuService import SudokuService
+
+
+@pytest.mark.asyncio
+async def test_validate_sudoku(async_db):
+  puzzle_cache.clear()
+  sudokus = AsyncSudokuRepository(async_db)
+  service = SudokuService(sudokus, None, None, None, None)
+
+  puzzle = SudokuGrid.generate_unique_puzzle(3, rng=get_random(3))
+  sudoku = await sudokus.create_sudoku(1, puzzle.linear_notation)
+  assert sudoku.solution_data is not None
+  solution = SudokuGrid.from_bytes(sudoku.solution_data)
+
+  # Swapping two digits keeps the grid a valid sudoku, but not the solution
+  # of the puzzle.
+  other = solution.copy()
+  other.array = numpy.choose(other.array, [0, 2, 1, 3, 4, 5, 6, 7, 8, 9]).astype(solution.array.dtype)
+  assert other.is_solved(only_valid=True)
+
+  assert await service.validate_sudoku(sudoku.id, solution.linear_notation)
+  assert await service.validate_sudoku(str(sudoku.id), solution.linear_notation)
+  assert not await service.validate_sudoku(sudoku.id, other.linear_notation)
+  assert not await service.validate_sudoku(sudoku.id, 'not a sudoku')
+  assert not await service.validate_sudoku(sudoku.id, '3:1,2,3')